@@ -0,0 +1,274 @@
+"""
+验证码识别压测：用本地模拟 OCR 服务回放验证码样本，对比帧选择与预处理策略
+
+每个策略模拟若干次登录：下载验证码 -> 识别 -> 提交，识别错误时换一张验证码重试（最多 --max-attempts 次），
+识别部分直接调用 itjcb.recognize_captcha（选帧与多帧合成在 qlkit.ocr_pool.solve_frames 中，设置 fusion 时先识别合成图）与 sjs.recognize_captcha
+输出：每秒识别数、识别正确率、每次成功登录的 OCR 请求数与图片数、每张验证码的上传字节数、识别与登录耗时
+
+用法：
+    python bench/bench_captcha.py                                  # 生成 200 张多帧 GIF 验证码
+    python bench/bench_captcha.py --corpus captchas/               # 回放抓取的样本，文件名以验证码开头，如 AB12_001.gif
+    python bench/bench_captcha.py --strategies itjcb-top1,itjcb-top3 --logins 500 --workers 8 --accuracy 0.8
+    python bench/bench_captcha.py --gif-style occlude --strategies itjcb-template,itjcb-fusion-template   # 多帧合成
+模拟 OCR 的参数（延迟、每张图片耗时、正确率、置信度扰动等）见 mock_ocr.py
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mock_discuz import gif_captcha, jpeg_captcha, random_code
+from mock_ocr import MockOcrServer, add_config_arguments, code_from_name, config_from_args
+from qlkit.captcha import decode_frames, encode_png_base64, rank_frames, to_gray
+from qlkit.metrics import Metrics, summarize
+from qlkit.ocr import OcrCache, create_ocr_client, is_captcha_text
+from qlkit.ocr_local import build_templates, sample_image
+from qlkit.ocr_pool import OcrPool
+
+CONTENT_TYPES = {".gif": "image/gif", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png"}
+
+# 策略名 -> 参数；itjcb 为多帧选择，sjs 为整张图片提交
+STRATEGIES = {
+    "itjcb-all": {"script": "itjcb", "top": 0},
+    "itjcb-top3": {"script": "itjcb", "top": 3},
+    "itjcb-top1": {"script": "itjcb", "top": 1},
+    "itjcb-top3-early": {"script": "itjcb", "top": 3, "concurrency": 1, "min_confidence": 0.8},
+    "itjcb-top3-batch": {"script": "itjcb", "top": 3, "batch": True},
+    "itjcb-top3-gray": {"script": "itjcb", "top": 3, "gray": True},
+    "itjcb-template": {"script": "itjcb", "top": 3, "backend": "template"},  # 进程内模板匹配，模板由全部样本生成（含被测样本，正确率偏乐观）
+    "sjs-raw": {"script": "sjs", "raw_formats": ["jpeg", "png", "gif"]},
+    "sjs-jpeg": {"script": "sjs", "raw_formats": []},  # 统一转为 JPEG（动态图片只保留第一帧）
+    "itjcb-top3-pool": {"script": "itjcb", "top": 3, "pool": True},  # 解码、选帧、编码在识别进程池中进行
+    "itjcb-template-pool": {"script": "itjcb", "top": 3, "backend": "template", "pool": True},
+    "sjs-template": {"script": "sjs", "raw_formats": [], "backend": "template"},
+    "sjs-template-pool": {"script": "sjs", "raw_formats": [], "backend": "template", "pool": True},
+    # 先识别对齐合成后的一张图，无效或置信度不足时再识别前 3 帧
+    "itjcb-fusion": {"script": "itjcb", "top": 3, "fusion": "median"},
+    "itjcb-fusion-min": {"script": "itjcb", "top": 3, "fusion": "min"},
+    "itjcb-fusion-template": {"script": "itjcb", "top": 3, "fusion": "median", "backend": "template"},
+}
+
+
+def load_script(name):
+    """静默导入签到脚本"""
+    sys.path.insert(0, os.path.join(ROOT, name))
+    with contextlib.redirect_stdout(io.StringIO()):
+        return importlib.import_module(name)
+
+
+def load_corpus(directory):
+    """读取样本目录，返回 [(验证码, 图片数据, Content-Type)]"""
+    corpus = []
+    for name in sorted(os.listdir(directory)):
+        code = code_from_name(name)
+        ctype = CONTENT_TYPES.get(os.path.splitext(name)[1].lower())
+        if code and ctype:
+            with open(os.path.join(directory, name), "rb") as f:
+                corpus.append((code, f.read(), ctype))
+    return corpus
+
+
+def synthetic_corpus(samples, kind, frames, style="blur"):
+    corpus = []
+    for _ in range(samples):
+        code = random_code()
+        if kind == "gif":
+            corpus.append((code, gif_captcha(code, frames, style)[0], "image/gif"))
+        else:
+            corpus.append((code, jpeg_captcha(code), "image/jpeg"))
+    return corpus
+
+
+def solve_gray(client, data, top_k):
+    """与 itjcb.recognize_captcha 相同的选帧与取舍，但提交单通道灰度 PNG"""
+    frames = decode_frames(data)
+    gray = np.clip(to_gray(frames) + 0.5, 0, 255).astype(np.uint8)
+    ranked = rank_frames(frames, top_k)
+    results = client.recognize_many(encode_png_base64(gray[i]) for i, _ in ranked)
+    valid = [(r["confidence"], s, r["result"]) for (_, s), r in zip(ranked, results) if r and is_captcha_text(r["result"])]
+    return max(valid)[2] if valid else ""
+
+
+def make_solver(options, modules, ocr_url, template_path=None, pool_workers=0):
+    """
+    按策略配置脚本的 OCR 客户端（及识别进程池），
+    返回 (solve(图片数据, Content-Type) -> 识别结果, 进程池或 None)
+    """
+    module = modules[options["script"]]
+    client_options = {
+        "backend": options.get("backend", "http"),
+        "model": template_path,
+        "concurrency": options.get("concurrency", 4),
+        "min_confidence": options.get("min_confidence"),
+        "batch": options.get("batch", False),
+    }
+    module.ocr_client = create_ocr_client(ocr_url, **client_options)
+    module.ocr_pool = OcrPool(ocr_url, workers=pool_workers, **client_options).start() if options.get("pool") else None
+    if options["script"] == "sjs":
+        module.ocr_cache = OcrCache(0)  # 样本会重复出现，关闭缓存以测量识别本身
+        module.OCR_RAW_FORMATS = options["raw_formats"]
+        return (lambda data, ctype: module.recognize_captcha(data, ctype)), module.ocr_pool
+
+    if options.get("gray"):
+        return (lambda data, ctype: solve_gray(module.ocr_client, data, options["top"])), None
+    module.CAPTCHA_TOP_FRAMES = options["top"]
+    module.CAPTCHA_FUSION = options.get("fusion", "")
+    return (lambda data, ctype: module.recognize_captcha(data)), module.ocr_pool
+
+
+def simulate_login(solve, corpus, max_attempts, site_latency, record):
+    """模拟一次登录：每次尝试换一张验证码；识别为空时不提交直接重试"""
+    started = time.perf_counter()
+    for attempt in range(1, max_attempts + 1):
+        code, data, ctype = random.choice(corpus)
+        time.sleep(site_latency)  # 下载验证码
+        t = time.perf_counter()
+        answer = solve(data, ctype) or ""
+        record(time.perf_counter() - t, answer.lower() == code.lower())
+        if not answer:
+            continue
+        time.sleep(site_latency)  # 提交登录
+        if answer.lower() == code.lower():
+            return True, time.perf_counter() - started, attempt
+    return False, time.perf_counter() - started, max_attempts
+
+
+def run_strategy(name, options, modules, server, corpus, args, template_path=None):
+    solve, ocr_pool = make_solver(options, modules, server.url, template_path, args.pool_workers)
+    metrics = Metrics("captcha_bench", directory="")  # 收集 qlkit 内部的解码、编码、OCR 耗时
+    lock = threading.Lock()
+    solves, logins = [], []
+
+    def record(seconds, correct):
+        with lock:
+            solves.append((seconds, correct))
+
+    def one_login(_):
+        ok, elapsed, attempts = simulate_login(solve, corpus, args.max_attempts, args.site_latency / 1000, record)
+        with lock:
+            logins.append((ok, elapsed, attempts))
+
+    before = dict(server.model.stats)
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=args.workers) as pool:
+        list(pool.map(one_login, range(args.logins)))
+    wall = time.perf_counter() - started
+    if ocr_pool is not None:
+        ocr_pool.close()
+    stats = {k: server.model.stats.get(k, 0) - before.get(k, 0) for k in server.model.stats}
+
+    succeeded = [l for l in logins if l[0]]
+    correct = sum(1 for _, c in solves if c)
+    per_success = max(1, len(succeeded))
+    return {
+        "strategy": name,
+        "options": options,
+        "captchas": len(solves),
+        "solves_per_second": correct / wall,
+        "accuracy": correct / len(solves) if solves else 0.0,
+        "login_success": len(succeeded) / len(logins),
+        "ocr_requests_per_login": stats["requests"] / per_success,
+        "ocr_images_per_login": stats["images"] / per_success,
+        "upload_bytes_per_captcha": stats["bytes"] / max(1, len(solves)),
+        "solve": summarize(s for s, _ in solves),
+        "login": summarize(e for _, e, _ in succeeded),
+        "attempts": summarize(a for _, _, a in succeeded),
+        "phases": metrics.snapshot()["phases"],
+        "wall": wall,
+    }
+
+
+def ms(value):
+    return f"{value * 1000:.0f}" if value is not None else "-"
+
+
+def print_results(results):
+    header = (f"{'策略':<18}{'识别/秒':>8}{'正确率':>8}{'登录成功':>9}{'OCR请求/登录':>13}{'图片/登录':>10}"
+              f"{'上传KB/张':>10}{'识别p50/p95(ms)':>17}{'登录p50/p95(ms)':>17}")
+    print("\n" + header)
+    for r in results:
+        print(f"{r['strategy']:<20}{r['solves_per_second']:>8.1f}{r['accuracy']:>9.1%}{r['login_success']:>9.1%}"
+              f"{r['ocr_requests_per_login']:>13.2f}{r['ocr_images_per_login']:>12.2f}"
+              f"{r['upload_bytes_per_captcha'] / 1024:>12.1f}"
+              f"{ms(r['solve']['p50']) + '/' + ms(r['solve']['p95']):>17}"
+              f"{ms(r['login']['p50']) + '/' + ms(r['login']['p95']):>17}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="验证码识别策略对比")
+    parser.add_argument("--corpus", help="验证码样本目录，文件名以验证码开头；不指定时生成样本")
+    parser.add_argument("--samples", type=int, default=200, help="生成的样本数")
+    parser.add_argument("--kind", choices=["gif", "jpeg"], default="gif", help="生成的样本格式")
+    parser.add_argument("--frames", type=int, default=4, help="生成的 GIF 帧数")
+    parser.add_argument("--gif-style", choices=["blur", "occlude"], default="blur",
+                        help="生成的 GIF 样式：blur 只有一帧清晰，occlude 各帧遮住不同部位")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES), help="要对比的策略，逗号分隔")
+    parser.add_argument("--logins", type=int, default=200, help="每个策略模拟的登录次数")
+    parser.add_argument("--workers", type=int, default=4, help="同时进行的登录数")
+    parser.add_argument("--max-attempts", type=int, default=3, help="每次登录最多尝试的验证码数")
+    parser.add_argument("--site-latency", type=float, default=50, help="下载验证码、提交登录各自的模拟耗时（毫秒）")
+    parser.add_argument("--pool-workers", type=int, default=os.cpu_count() or 2, help="*-pool 策略的识别进程数")
+    parser.add_argument("--seed", type=int, help="随机种子")
+    parser.add_argument("--json", help="将结果写入 JSON 文件")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    names = [s.strip() for s in args.strategies.split(",") if s.strip()]
+    unknown = [n for n in names if n not in STRATEGIES]
+    if unknown:
+        parser.error(f"未知策略: {', '.join(unknown)}，可选: {', '.join(STRATEGIES)}")
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.samples, args.kind, args.frames, args.gif_style)
+    if not corpus:
+        parser.error("样本目录中没有可用的验证码图片")
+    server = MockOcrServer(config_from_args(args)).start()
+    for code, data, _ in corpus:
+        server.model.learn(data, code)
+
+    os.environ.update({
+        "OCR_SERVICE": server.url,
+        "ITJC8_ACCOUNTS": "placeholder:placeholder",
+        "XSJ_ACCOUNTS": "placeholder:placeholder",
+        "QL_STORE_PATH": os.path.join(tempfile.mkdtemp(prefix="ql_bench_"), "sessions.db"),
+    })
+    modules = {script: load_script(script) for script in {STRATEGIES[n]["script"] for n in names}}
+    # 模板按识别时的输入生成：逐帧识别用原始帧，多帧合成用合成图
+    template_paths = {}
+    for fusion in {STRATEGIES[n].get("fusion", "") for n in names if STRATEGIES[n].get("backend") == "template"}:
+        template_paths[fusion] = os.path.join(os.path.dirname(os.environ["QL_STORE_PATH"]), f"templates{fusion}.npz")
+        glyphs, labels = build_templates((sample_image(data, fusion), code) for code, data, _ in corpus)
+        np.savez_compressed(template_paths[fusion], glyphs=glyphs, labels=np.array(labels))
+    print(f"🧪 {len(corpus)} 张验证码样本，{len(names)} 个策略，每个策略 {args.logins} 次登录，并发 {args.workers}，"
+          f"OCR 延迟 {args.ocr_latency:.0f}+{args.per_image:.0f}ms/张，正确率 {args.accuracy:.0%}")
+
+    results = []
+    for name in names:
+        template_path = template_paths.get(STRATEGIES[name].get("fusion", ""))
+        results.append(run_strategy(name, STRATEGIES[name], modules, server, corpus, args, template_path))
+        print(f"   ✅ {name} 完成，用时 {results[-1]['wall']:.1f}s")
+    server.stop()
+
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
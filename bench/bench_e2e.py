@@ -0,0 +1,166 @@
+"""
+端到端压测：在本地模拟站点上运行 sjs / itjcb / rklt 的完整账户流程，统计吞吐量与各阶段耗时
+
+每个站点跑两轮：
+    cold  本地没有 Cookie，全部走登录（含验证码下载、识别、校验）
+    warm  服务端清空签到状态后再跑一次，走 Cookie 签到（可用 --revoke-rate 让部分登录态在服务端失效）
+
+用法：
+    python bench/bench_e2e.py                              # 三个站点各 1000 个账户
+    python bench/bench_e2e.py --sites sjs --accounts 2000 --workers 32 --latency 30 --jitter 20
+    python bench/bench_e2e.py --ocr-accuracy 0.8 --fail-rate 0.02 --json result.json
+    XSJ_OCR_CANDIDATES=1 python bench/bench_e2e.py --sites sjs --ocr-accuracy 0.7 --ocr-confusable 0.8   # 对比只校验识别结果
+    QL_PIPELINE=1 python bench/bench_e2e.py --sites sjs,itjcb --workers 32   # 分阶段登录流水线
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mock_discuz import MockServer, add_config_arguments, config_from_args
+
+# 脚本名 -> (目录/模块名, 模拟站点, 站点地址环境变量)
+FLOWS = {
+    "sjs": ("sjs", "xsijishe", "XSJ_BASE_URL"),
+    "itjcb": ("itjcb", "itjc8", "ITJC8_BASE_URL"),
+    "rklt": ("rklt", "ruike1", "RKLT_BASE_URL"),
+}
+
+
+def load_script(name):
+    """导入签到脚本（模块级代码会读取环境变量并打印信息，这里静默导入）"""
+    sys.path.insert(0, os.path.join(ROOT, name))
+    with contextlib.redirect_stdout(io.StringIO()):
+        return importlib.import_module(name)
+
+
+def run_round(module, accounts, workers):
+    from qlkit import metrics
+    from qlkit.runner import run_accounts
+
+    module.metrics.reset()
+    metrics.activate(module.metrics)
+    pipeline = getattr(module, "login_pipeline", None)
+    if pipeline is not None:
+        pipeline.reset()
+    # 每轮相当于一次独立运行，页面缓存只在单次运行内有效
+    cache = getattr(module, "homepage_cache", None)
+    if cache is not None:
+        cache.invalidate()
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        summary = run_accounts(accounts, module.process_account, workers=workers)
+        elapsed = time.perf_counter() - started
+    module.store.flush()
+    snap = module.metrics.snapshot()
+    if pipeline is not None:
+        snap["pipeline"] = {"enabled": pipeline.enabled, "stages": pipeline.stats()}
+    return summary, elapsed, snap
+
+
+def print_round(script, label, summary, elapsed, snap, server_stats):
+    total = len(summary.results)
+    ok = len(summary.success)
+    print(f"\n▶ {script} [{label}] {ok}/{total} 成功，{elapsed:.2f}s，{total / elapsed:.1f} 账户/秒")
+    phases = sorted(snap["phases"].items(), key=lambda kv: -kv[1]["sum"])
+    print(f"   {'阶段':<18}{'次数':>7}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'合计(s)':>10}")
+    for phase, s in phases:
+        print(f"   {phase:<18}{s['count']:>7}{s['p50'] * 1000:>10.1f}{s['p95'] * 1000:>10.1f}"
+              f"{s['p99'] * 1000:>10.1f}{s['sum']:>10.2f}")
+    for host, s in snap["http"].items():
+        print(f"   🌐 {s['count']} 次请求，下载 {s.get('bytes', 0) / 1024 / 1024:.1f}MB")
+    if snap["ocr_accuracy"] is not None:
+        print(f"   🔍 验证码识别正确率 {snap['ocr_accuracy']:.1%}")
+    if snap["counters"].get("ocr_candidate_checks"):
+        print(f"   🔁 校验备选结果 {snap['counters']['ocr_candidate_checks']} 次，"
+              f"其中 {snap['counters'].get('ocr_rescued', 0)} 张验证码由备选结果通过")
+    if snap["counters"].get("retries"):
+        print(f"   🔁 重试 {snap['counters']['retries']} 次")
+    stages = snap.get("pipeline", {}).get("stages", [])
+    if any(s["processed"] for s in stages):
+        mode = "流水线" if snap["pipeline"]["enabled"] else "串行"
+        print(f"   🏭 登录阶段（{mode}）: " + "，".join(
+            f"{s['stage']} {s['throughput']:.1f}/s 排队{s['avg_wait'] * 1000:.0f}ms 峰值{s['max_depth']}"
+            + (f" 利用率{s['utilization']:.0%}" if s["utilization"] is not None else "")
+            for s in stages))
+    print(f"   🖥️ 服务端请求: {json.dumps(server_stats, ensure_ascii=False)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sjs / itjcb / rklt 端到端压测")
+    parser.add_argument("--sites", default="sjs,itjcb,rklt", help="要压测的脚本，逗号分隔")
+    parser.add_argument("--accounts", type=int, default=1000, help="每个站点的账户数")
+    parser.add_argument("--workers", type=int, default=16, help="同时处理的账户数")
+    parser.add_argument("--bad-password", type=float, default=0.0, help="密码错误账户的比例")
+    parser.add_argument("--json", help="将结果写入 JSON 文件")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    scripts = [s.strip() for s in args.sites.split(",") if s.strip()]
+
+    servers = {}
+    for script in scripts:
+        module_name, site, env = FLOWS[script]
+        servers[script] = MockServer(site, config_from_args(args)).start()
+        os.environ[env] = servers[script].url
+
+    workdir = tempfile.mkdtemp(prefix="ql_bench_")
+    os.environ.update({
+        "QL_STORE_PATH": os.path.join(workdir, "sessions.db"),
+        "QL_POOL_SIZE": str(max(10, args.workers * 2)),
+        "XSJ_ACCOUNTS": "placeholder:placeholder",
+        "ITJC8_ACCOUNTS": "placeholder:placeholder",
+        "RKLT_ACCOUNTS": "placeholder:placeholder",
+    })
+    print(f"🧪 {len(scripts)} 个模拟站点，每站 {args.accounts} 个账户，并发 {args.workers}，"
+          f"延迟 {args.latency:.0f}+{args.jitter:.0f}ms，失败率 {args.fail_rate:.0%}，数据目录 {workdir}")
+
+    results, loaded = [], []
+    for script in scripts:
+        server = servers[script]
+        # 模拟站点按图片记录验证码答案，由出图的站点提供识别接口
+        os.environ["OCR_SERVICE"] = f"{server.url}/ocr"
+        module = load_script(FLOWS[script][0])
+        loaded.append(module)
+        # 设置 OCR_WORKERS 时先启动识别进程池，再启动账户线程
+        if getattr(module, "ocr_pool", None) is not None:
+            module.ocr_pool.start()
+        bad = int(args.accounts * args.bad_password)
+        accounts = [
+            {"username": f"bench{i:05d}", "password": "bad-pass" if i < bad else f"pw{i}", "id": i + 1}
+            for i in range(args.accounts)
+        ]
+        for label in ("cold", "warm"):
+            if label == "warm":
+                server.site.reset()
+            server.site.stats.clear()
+            summary, elapsed, snap = run_round(module, accounts, args.workers)
+            print_round(script, label, summary, elapsed, snap, dict(server.site.stats))
+            results.append({
+                "script": script, "round": label, "accounts": len(accounts), "success": len(summary.success),
+                "elapsed": elapsed, "accounts_per_second": len(accounts) / elapsed, "metrics": snap,
+                "server": dict(server.site.stats),
+            })
+
+    for server in servers.values():
+        server.stop()
+    for module in loaded:
+        if getattr(module, "ocr_pool", None) is not None:
+            module.ocr_pool.close()
+        if getattr(module, "login_pipeline", None) is not None:
+            module.login_pipeline.close()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+对比 BeautifulSoup 全量解析与 qlkit.extract.Page 提取字段的 CPU 耗时
+
+用法：
+    python bench/bench_extract.py                 # 使用生成的论坛页面（约 250KB）
+    python bench/bench_extract.py page1.html ...  # 使用保存的真实页面
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bs4 import BeautifulSoup
+from qlkit.extract import Page
+
+
+def build_page(threads=400):
+    """生成结构与 Discuz 首页/登录页/签到页/个人主页相近的页面"""
+    rows = "\n".join(
+        f'<tbody id="normalthread_{i}"><tr><td class="icn"><a href="thread-{i}-1-1.html" title="新窗口打开">'
+        f'<img src="static/image/common/folder_common.gif" /></a></td><th class="common">'
+        f'<a href="forum.php?mod=forumdisplay&amp;fid=2&amp;filter=typeid&amp;typeid={i % 7}">[分类{i % 7}]</a> '
+        f'<a href="thread-{i}-1-1.html" onclick="atarget(this)" class="s xst">示例主题标题 {i} 关于资源分享与讨论</a>'
+        f'<span class="tps">&nbsp;...<a href="thread-{i}-2-1.html">2</a></span></th>'
+        f'<td class="by"><cite><a href="home.php?mod=space&amp;uid={i}" c="1">用户{i}</a></cite>'
+        f'<em><span>2024-1-{i % 28 + 1}</span></em></td><td class="num"><a href="thread-{i}-1-1.html" class="xi2">{i * 3}</a>'
+        f'<em>{i * 17}</em></td></tr></tbody>'
+        for i in range(threads)
+    )
+    return f"""<!DOCTYPE html><html><head><meta charset="utf-8" /><title>论坛</title>
+<script src="static/js/common.js" type="text/javascript"></script></head><body id="nv_forum">
+<div id="toptb" class="cl"><div class="wp"><div class="z"><a href="./" >设为首页</a></div></div></div>
+<div id="um"><p><strong class="vwmy"><a href="home.php?mod=space&amp;uid=1" target="_blank" title="访问我的空间">testuser</a></strong>
+<a href="member.php?mod=logging&amp;action=logout&amp;formhash=1a2b3c4d">退出</a></p>
+<p><a href="home.php?mod=spacecp&amp;ac=credit&amp;showcredit=1" id="extcreditmenu" class="showmenu">积分: 1234</a></p></div>
+<form method="post" autocomplete="off" id="loginform_LxA1b" action="member.php?mod=logging&amp;action=login&amp;loginsubmit=yes&amp;loginhash=LxA1b">
+<input type="hidden" name="formhash" value="1a2b3c4d" /><input type="hidden" name="referer" value="https://example.com/" />
+<input type="hidden" name="seccodehash" value="cSAbCd" /><input type="hidden" name="seccodemodid" value="member::logging" />
+<span id="seccode_cSAbCd"><img id="seccode_cSAbCd_img" src="misc.php?mod=seccode&amp;update=1&amp;idhash=cSAbCd" /></span>
+</form><form id="loginform" action="/member.php?mod=logging&amp;action=login&amp;loginsubmit=yes"></form>
+<input type="hidden" id="qiandao_num" value="12" /><input type="hidden" id="lxdays" value="5" />
+<input type="hidden" id="lxtdays" value="100" /><input type="hidden" id="lxlevel" value="3" /><input type="hidden" id="lxreward" value="2" />
+<ul id="psts" class="cl xl"><li><em>积分</em>1234</li><li><em>威望</em>10</li><li><em>车票</em>56</li><li><em>贡献</em>7</li></ul>
+<div id="threadlist"><table>{rows}</table></div></body></html>"""
+
+
+def legacy_extract(html):
+    """原实现：每个页面构建完整 BeautifulSoup 树后查找字段"""
+    soup = BeautifulSoup(html, "html.parser")
+    tag = soup.find("input", {"name": "formhash"})
+    out = {"formhash": tag["value"] if tag else None}
+    form = soup.find("form", id=re.compile(r"^loginform_"))
+    out["loginform"] = form.get("id") if form else None
+    tag = soup.find("input", {"name": "seccodehash"})
+    out["seccodehash"] = tag["value"] if tag else None
+    for img in soup.find_all("img"):
+        match = re.search(r"idhash=(\w+)", img.get("src", ""))
+        if match:
+            out["idhash"] = match.group(1)
+            break
+    tag = soup.find("a", id="extcreditmenu")
+    out["credit"] = tag.text.strip() if tag else None
+    ul = soup.find("ul", id="psts")
+    out["psts"] = [li.get_text(strip=True) for li in ul.find_all("li")] if ul else []
+    return out
+
+
+def fast_extract(html):
+    """qlkit.extract.Page 实现"""
+    page = Page(html)
+    out = {"formhash": page.input("formhash")}
+    form = page.find("form", "id", r"^loginform_")
+    out["loginform"] = form.get("id") if form else None
+    out["seccodehash"] = page.input("seccodehash")
+    img = page.find("img", "src", r"idhash=\w+")
+    out["idhash"] = re.search(r"idhash=(\w+)", img["src"]).group(1) if img else None
+    out["credit"] = page.text("extcreditmenu")
+    out["psts"] = page.items("psts")
+    return out
+
+
+def timeit(func, html, rounds):
+    start = time.process_time()
+    for _ in range(rounds):
+        func(html)
+    return (time.process_time() - start) / rounds * 1000
+
+
+if __name__ == "__main__":
+    files = sys.argv[1:]
+    pages = [(f, open(f, encoding="utf-8", errors="ignore").read()) for f in files] or [("生成页面", build_page())]
+    # 每个账户一次运行大约解析 4 个页面（登录页、首页/签到页、个人主页等）
+    pages_per_account = 4
+    for name, html in pages:
+        legacy, fast = legacy_extract(html), fast_extract(html)
+        mismatched = [k for k in legacy if legacy[k] != fast[k]]
+        rounds = 20
+        legacy_ms = timeit(legacy_extract, html, rounds)
+        fast_ms = timeit(fast_extract, html, rounds)
+        print(f"📄 {name}（{len(html) / 1024:.0f}KB）")
+        print(f"  BeautifulSoup: {legacy_ms:.2f}ms/页")
+        print(f"  Page:          {fast_ms:.2f}ms/页（{legacy_ms / fast_ms:.1f}x）")
+        print(f"  每账户节省CPU: {(legacy_ms - fast_ms) * pages_per_account:.1f}ms")
+        if mismatched:
+            print(f"  ⚠️ 结果不一致的字段: {', '.join(mismatched)}")
@@ -0,0 +1,607 @@
+"""
+本地模拟 Discuz 站点，供压测 sjs / itjcb / rklt 使用
+
+模拟的接口：
+    GET  /                                          首页（页头含退出链接、formhash、积分，之后是较大的帖子列表）
+    GET  /member.php?mod=logging&action=login       登录页（loginform_*、formhash、seccodehash）
+    POST /member.php?mod=logging&action=login&loginsubmit=yes...  登录
+    GET  /misc.php?mod=seccode&idhash=...           验证码（静态 JPEG 或多帧 GIF）
+    GET  /misc.php?mod=seccode&action=check...      验证码校验
+    GET  /k_misign-sign.html                        k_misign 签到页；带 operation=qiandao 时为 ajax 签到
+    POST /plugin.php?id=k_misign:sign...            k_misign 签到
+    POST /plugin.php?id=dsu_paulsign:sign...        dsu_paulsign 签到
+    GET  /home.php?mod=space                        个人主页（psts 积分列表）
+    POST /ocr                                       “作弊”OCR：直接返回服务端记录的验证码，可设置正确率
+    POST /__reset                                   清空今日签到状态，并按 revoke_rate 使部分登录态失效
+    GET  /__stats                                   各接口请求次数
+
+用法：
+    python bench/mock_discuz.py --site xsijishe --port 8081 --latency 30
+站点 xsijishe / itjc8 / ruike1 分别对应 sjs / itjcb / rklt 的页面模板、验证码格式和编码
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+from collections import deque
+from email.utils import formatdate
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from qlkit.captcha import otsu_threshold
+
+SITES = {
+    # sjs：登录表单 id 为 loginform，JPEG 验证码，k_misign 签到页
+    "xsijishe": {"cookiepre": "xsj_", "encoding": "utf-8", "captcha": "jpeg", "login_captcha": True},
+    # itjcb：登录表单 id 为 loginform_<loginhash>，多帧 GIF 验证码，dsu_paulsign 签到
+    "itjc8": {"cookiepre": "itjc_", "encoding": "utf-8", "captcha": "gif", "login_captcha": True},
+    # rklt：GBK 页面，首页快捷登录无验证码，k_misign ajax 签到
+    "ruike1": {"cookiepre": "rk_", "encoding": "gbk", "captcha": "jpeg", "login_captcha": False},
+}
+CAPTCHA_CHARS = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+# 模拟 OCR 常见的形近字符误识别
+CONFUSED_AS = {"5": "S", "S": "5", "8": "B", "B": "8", "2": "Z", "Z": "2", "6": "G", "G": "6",
+               "7": "T", "T": "7", "D": "0", "Q": "O"}
+# GIF 验证码左上角 4 个像素记录验证码字符（R=字符编码，G=B=250，灰度接近背景，不影响识别），供模拟 OCR 在重新编码后仍能读出
+MARK = 250
+INK_THUMB = (50, 18)
+INK_DISTANCE = 0.25  # 二值化缩略图不同像素的比例小于该值视为同一张验证码
+RECENT_GIFS = 1024  # 记录最近发出的 GIF 验证码数
+
+
+class Config:
+    def __init__(self, latency=0.0, jitter=0.0, fail_rate=0.0, session_ttl=30 * 86400,
+                 revoke_rate=0.0, ocr_accuracy=1.0, ocr_confusable=0.0, page_kb=60, frames=4, gif_style="blur"):
+        self.latency = latency  # 每个请求的基础延迟（秒）
+        self.jitter = jitter  # 额外的随机延迟上限（秒）
+        self.fail_rate = fail_rate  # 随机返回 502 的比例
+        self.session_ttl = session_ttl  # 登录 Cookie 有效期（秒）
+        self.revoke_rate = revoke_rate  # /__reset 时服务端使登录态失效的比例（Cookie 未过期但已失效）
+        self.ocr_accuracy = ocr_accuracy  # 模拟 OCR 的正确率
+        self.ocr_confusable = ocr_confusable  # 识别错误中属于形近字符误认的比例，其余为随机字符
+        self.page_kb = page_kb  # 首页/签到页正文大小
+        self.frames = frames  # GIF 验证码帧数
+        self.gif_style = gif_style  # GIF 验证码样式，见 gif_captcha
+
+
+def random_code(n=4):
+    return "".join(random.choice(CAPTCHA_CHARS) for _ in range(n))
+
+
+def captcha_font():
+    try:
+        return ImageFont.load_default(size=24)
+    except TypeError:  # Pillow < 10.1 只有固定大小的位图字体
+        return ImageFont.load_default()
+
+
+CAPTCHA_FONT = captcha_font()
+
+
+def draw_captcha(code, blur=0.0, size=(100, 36)):
+    """绘制灰度验证码：噪点背景、随机偏移的字符"""
+    img = Image.new("L", size, 235)
+    draw = ImageDraw.Draw(img)
+    for _ in range(60):
+        x, y = random.randrange(size[0]), random.randrange(size[1])
+        draw.point((x, y), fill=random.randint(80, 200))
+    for i, ch in enumerate(code):
+        draw.text((6 + i * 23 + random.randint(-2, 2), 4 + random.randint(-3, 3)), ch, fill=random.randint(0, 60), font=CAPTCHA_FONT)
+    if blur:
+        img = img.filter(ImageFilter.GaussianBlur(blur))
+    return img
+
+
+def jpeg_captcha(code):
+    buffer = BytesIO()
+    draw_captcha(code).convert("RGB").save(buffer, format="JPEG", quality=70)
+    return buffer.getvalue()
+
+
+def occluded_frames(code, frames):
+    """同一张底图整体轻微抖动，每帧用背景色条带遮住不同部位的笔画，并加入位置不同的干扰线，返回各帧灰度图"""
+    base = draw_captcha(code)
+    width, height = base.size
+    images = []
+    for _ in range(frames):
+        frame = Image.new("L", base.size, 235)
+        frame.paste(base, (random.randint(-2, 2), random.randint(-2, 2)))
+        draw = ImageDraw.Draw(frame)
+        for _ in range(3):
+            x = random.randrange(4, width - 8)
+            draw.rectangle((x, 0, x + random.randint(3, 6), height), fill=235)
+        for _ in range(2):
+            draw.line((random.randrange(width), random.randrange(height), random.randrange(width), random.randrange(height)),
+                      fill=random.randint(40, 100))
+        images.append(frame)
+    return images
+
+
+def gif_captcha(code, frames=4, style="blur"):
+    """
+    多帧 GIF，每帧左上角写入验证码标记，返回 (GIF 数据, 各帧灰度图)
+        blur     同一张底图，只有一帧清晰，其余帧模糊程度不同
+        occlude  各帧遮住不同部位的笔画，见 occluded_frames
+    """
+    if style == "occlude":
+        grays = occluded_frames(code, frames)
+    else:
+        base = draw_captcha(code)
+        sharp = random.randrange(frames)
+        grays = [base if i == sharp else base.filter(ImageFilter.GaussianBlur(1.0 + i * 0.5)) for i in range(frames)]
+    # 调色板：0~199 为灰度，200~203 为验证码标记颜色
+    palette = []
+    for i in range(200):
+        g = i * 255 // 199
+        palette += [g, g, g]
+    for ch in code:
+        palette += [ord(ch), MARK, MARK]
+    palette += [0, 0, 0] * (256 - len(palette) // 3)
+    images = []
+    for img in grays:
+        gray = np.asarray(img, dtype=np.uint16)
+        index = (gray * 199 // 255).astype(np.uint8)
+        index[0, :len(code)] = np.arange(200, 200 + len(code))
+        frame = Image.fromarray(index, mode="P")
+        frame.putpalette(palette)
+        images.append(frame)
+    buffer = BytesIO()
+    images[0].save(buffer, format="GIF", save_all=True, append_images=images[1:], duration=120, loop=0, optimize=False)
+    return buffer.getvalue(), grays
+
+
+def ink_thumbnail(gray):
+    """二值化缩略图（文字为 1），多帧合成、二值化后的验证码丢失了标记，按它查找答案"""
+    small = np.asarray(gray.convert("L").resize(INK_THUMB, Image.BILINEAR), dtype=np.float32)
+    return (small <= otsu_threshold(small)).astype(np.float32).ravel()
+
+
+def read_mark(data):
+    """从图片左上角读取验证码标记，读不到返回 None"""
+    try:
+        pixels = np.asarray(Image.open(BytesIO(data)).convert("RGB"))[0, :4]
+    except Exception:
+        return None
+    if all(int(g) == MARK and int(b) == MARK for _, g, b in pixels):
+        return "".join(chr(int(r)) for r, _, _ in pixels)
+    return None
+
+
+def filler(kb):
+    """帖子列表，放在 <div id="wp"> 之后，用于体现流式读取提前断开的效果"""
+    row = ('<tbody id="normalthread_{i}"><tr><th class="common"><a href="thread-{i}-1-1.html" class="s xst">'
+           '示例主题 {i} 资源分享与讨论</a></th><td class="by"><cite><a href="home.php?mod=space&amp;uid={i}">用户{i}</a>'
+           '</cite><em><span>2024-1-1</span></em></td><td class="num"><a class="xi2">{i}</a><em>{i}</em></td></tr></tbody>\n')
+    rows, size, i = [], 0, 0
+    while size < kb * 1024:
+        text = row.format(i=i)
+        rows.append(text)
+        size += len(text.encode("utf-8"))
+        i += 1
+    return '<div id="threadlist"><table>' + "".join(rows) + "</table></div>"
+
+
+class MockSite:
+    """单个模拟站点的服务端状态"""
+
+    def __init__(self, name, config=None):
+        self.name = name
+        self.profile = SITES[name]
+        self.config = config or Config()
+        self.lock = threading.Lock()
+        self.saltkeys = {}  # saltkey -> {"codes": {idhash: code}, "loginhash": str}
+        self.auths = {}  # auth 值 -> (用户名, 过期时间)
+        self.users = {}  # 用户名 -> {"signed": bool, "credit": int, "days": int, "total": int}
+        self.images = {}  # JPEG 验证码 sha1 -> 验证码
+        self.gif_thumbs = deque(maxlen=RECENT_GIFS * self.config.frames)  # 最近发出的 GIF 验证码各帧 (二值化缩略图, 验证码)
+        self.stats = {}
+        self._filler = filler(self.config.page_kb)
+
+    # ---- 状态 ----
+    def user(self, name):
+        return self.users.setdefault(name, {"signed": False, "credit": 100, "days": 0, "total": 0})
+
+    def current_user(self, cookies):
+        token = cookies.get(self.profile["cookiepre"] + "auth")
+        if not token:
+            return None
+        with self.lock:
+            entry = self.auths.get(token)
+        if not entry or entry[1] < time.time():
+            return None
+        return entry[0]
+
+    def formhash(self, saltkey, username):
+        return hashlib.md5(f"{saltkey}|{username or ''}".encode()).hexdigest()[:8]
+
+    def reset(self):
+        """新的一天：清空签到状态，并按 revoke_rate 使部分登录态失效"""
+        with self.lock:
+            for u in self.users.values():
+                u["signed"] = False
+            tokens = list(self.auths)
+            revoked = random.sample(tokens, int(len(tokens) * self.config.revoke_rate))
+            for token in revoked:
+                self.auths.pop(token, None)
+        return {"revoked": len(revoked), "users": len(self.users)}
+
+    def lookup_gif(self, data):
+        """按二值化缩略图查找最近发出的 GIF 验证码，找不到返回 None"""
+        with self.lock:
+            entries = list(self.gif_thumbs)
+        if not entries:
+            return None
+        try:
+            thumb = ink_thumbnail(Image.open(BytesIO(data)))
+        except Exception:
+            return None
+        distance = np.abs(np.stack([t for t, _ in entries]) - thumb).mean(axis=1)
+        best = int(np.argmin(distance))
+        return entries[best][1] if distance[best] < INK_DISTANCE else None
+
+    def count(self, route):
+        with self.lock:
+            self.stats[route] = self.stats.get(route, 0) + 1
+
+
+def make_handler(site):
+    profile = site.profile
+    pre = profile["cookiepre"]
+    encoding = profile["encoding"]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        # ---- 请求与响应工具 ----
+        def setup_request(self):
+            parts = urlsplit(self.path)
+            self.route = parts.path
+            self.query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+            jar = SimpleCookie(self.headers.get("Cookie", ""))
+            self.cookies = {k: m.value for k, m in jar.items()}
+            self.set_cookies = []
+            length = int(self.headers.get("Content-Length") or 0)
+            self.body = self.rfile.read(length) if length else b""
+            saltkey = self.cookies.get(pre + "saltkey")
+            if not saltkey:
+                saltkey = secrets.token_hex(4)
+                self.cookie("saltkey", saltkey, 7 * 86400)
+            self.saltkey = saltkey
+            with site.lock:
+                self.salt_state = site.saltkeys.setdefault(saltkey, {"codes": {}, "loginhash": secrets.token_hex(3)})
+            self.username = site.current_user(self.cookies)
+            self.cookie("lastact", f"{int(time.time())}%09{self.route.lstrip('/')}", 86400)
+
+        def form(self):
+            return {k: v[-1] for k, v in parse_qs(self.body.decode(encoding, "replace")).items()}
+
+        def cookie(self, name, value, max_age):
+            expires = formatdate(time.time() + max_age, usegmt=True)
+            self.set_cookies.append(f"{pre}{name}={value}; expires={expires}; path=/; HttpOnly")
+
+        def send(self, body, content_type="text/html", status=200):
+            if isinstance(body, str):
+                body = body.encode(encoding, "replace")
+                content_type += f"; charset={encoding}"
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for c in self.set_cookies:
+                self.send_header("Set-Cookie", c)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_xml(self, content):
+            self.send(f'<?xml version="1.0" encoding="{encoding}"?>\n<root><![CDATA[{content}]]></root>', "text/xml")
+
+        def send_json(self, obj):
+            self.send(json.dumps(obj).encode(), "application/json")
+
+        def error_div(self, message):
+            # sjs 从 <font color="red"> 中取错误信息，rklt/itjcb 从 <div class="c"> 中取
+            if site.name == "xsijishe":
+                return f'<div class="alert_error"><font color="red">{message}</font></div>'
+            return f'<div class="c">{message}</div>'
+
+        def header_html(self):
+            formhash = site.formhash(self.saltkey, self.username)
+            if self.username:
+                u = site.user(self.username)
+                um = (f'<div id="um"><strong class="vwmy"><a href="home.php?mod=space&amp;uid=1">{self.username}</a></strong>'
+                      f'<a href="member.php?mod=logging&amp;action=logout&amp;formhash={formhash}">退出</a>'
+                      f'<a href="home.php?mod=spacecp&amp;ac=credit&amp;showcredit=1" id="extcreditmenu" class="showmenu">积分: {u["credit"]}</a></div>')
+            else:
+                um = '<div id="um"><a href="member.php?mod=register">注册</a></div>'
+            return (f'<!DOCTYPE html><html><head><meta charset="{encoding}" /><title>{site.name}</title></head><body>'
+                    f'<div id="toptb">{um}<form id="scbar_form"><input type="hidden" name="formhash" value="{formhash}" /></form></div>')
+
+        def login_page(self):
+            loginhash = self.salt_state["loginhash"]
+            idhash = "cS" + secrets.token_hex(2)
+            formhash = site.formhash(self.saltkey, None)
+            form_id = "loginform" if site.name == "xsijishe" else f"loginform_{loginhash}"
+            action = (f"/member.php?mod=logging&amp;action=login&amp;loginsubmit=yes&amp;loginhash={loginhash}&amp;inajax=1"
+                      if site.name == "xsijishe" else
+                      f"member.php?mod=logging&amp;action=login&amp;loginsubmit=yes&amp;loginhash={loginhash}")
+            captcha = ""
+            if profile["login_captcha"]:
+                captcha = (f'<input type="hidden" name="seccodehash" value="{idhash}" />'
+                           f'<input type="hidden" name="seccodemodid" value="member::logging" />'
+                           f'<span id="seccode_{idhash}"><img id="seccode_{idhash}_img" '
+                           f'src="misc.php?mod=seccode&amp;update={random.randint(10000, 99999)}&amp;idhash={idhash}" /></span>')
+            self.send(self.header_html() +
+                      f'<form method="post" id="{form_id}" action="{action}">'
+                      f'<input type="hidden" name="formhash" value="{formhash}" />'
+                      f'<input type="hidden" name="referer" value="/" />'
+                      f'<input type="text" name="username" /><input type="password" name="password" />{captcha}</form>'
+                      '</body></html>')
+
+        def captcha_image(self):
+            code = random_code()
+            idhash = self.query.get("idhash", "")
+            with site.lock:
+                self.salt_state["codes"][idhash] = code
+            if profile["captcha"] == "gif":
+                data, grays = gif_captcha(code, site.config.frames, site.config.gif_style)
+                thumbs = [(ink_thumbnail(gray), code) for gray in grays]
+                with site.lock:
+                    site.gif_thumbs.extend(thumbs)
+                self.send(data, "image/gif")
+                return
+            data = jpeg_captcha(code)
+            with site.lock:
+                site.images[hashlib.sha1(data).hexdigest()] = code
+            self.send(data, "image/jpeg")
+
+        def captcha_ok(self, idhash, value):
+            with site.lock:
+                code = self.salt_state["codes"].get(idhash)
+            return bool(code) and code.lower() == (value or "").lower()
+
+        def captcha_check(self):
+            ok = self.captcha_ok(self.query.get("idhash"), self.query.get("secverify"))
+            self.send_xml("succeed" if ok else "invalid")
+
+        def login(self):
+            data = self.form()
+            if data.get("formhash") != site.formhash(self.saltkey, None):
+                return self.send_xml(self.error_div("抱歉，您的请求来路不正确或验证字串不符，无法提交"))
+            if profile["login_captcha"] and not self.captcha_ok(data.get("seccodehash"), data.get("seccodeverify")):
+                return self.send_xml(self.error_div("抱歉，验证码填写错误"))
+            username, password = data.get("username", ""), data.get("password", "")
+            if not username or password.startswith("bad"):
+                return self.send_xml(self.error_div("登录失败，密码错误，您还可以尝试 4 次"))
+            token = secrets.token_hex(16)
+            with site.lock:
+                site.auths[token] = (username, time.time() + site.config.session_ttl)
+                site.user(username)
+                self.salt_state["codes"].clear()
+            self.cookie("auth", token, site.config.session_ttl)
+            self.send_xml(f"欢迎您回来，{username}，现在将转入登录前页面"
+                          f"<script type=\"text/javascript\">window.location.href='forum.php';</script>")
+
+        def homepage(self):
+            self.send(self.header_html() + '<div id="wp" class="wp">' + site._filler + "</div></body></html>")
+
+        def sign(self, formhash):
+            """执行签到，返回 (状态, 用户)：unauth / invalid / done / ok"""
+            if not self.username:
+                return "unauth", None
+            if formhash != site.formhash(self.saltkey, self.username):
+                return "invalid", None
+            with site.lock:
+                u = site.user(self.username)
+                if u["signed"]:
+                    return "done", u
+                u["signed"] = True
+                u["days"] += 1
+                u["total"] += 1
+                u["credit"] += 5
+            return "ok", u
+
+        def sign_inputs(self, u):
+            return "".join(
+                f'<input type="hidden" id="{key}" value="{value}" />'
+                for key, value in (("qiandao_num", random.randint(1, 500)), ("lxdays", u["days"]),
+                                   ("lxtdays", u["total"]), ("lxlevel", 1 + u["total"] // 30), ("lxreward", 5))
+            )
+
+        def k_misign_page(self):
+            body = self.header_html()
+            if self.username:
+                u = site.user(self.username)
+                status = "您今天已经签到过了" if u["signed"] else '<a id="JD_sign" href="javascript:;">签到</a>'
+                body += (f'<div class="k_misign"><a href="home.php?mod=space&amp;uid=1">{self.username}</a>'
+                         f'{status}{self.sign_inputs(u)}</div>')
+            self.send(body + '<div id="wp" class="wp">' + site._filler + "</div></body></html>")
+
+        def k_misign_post(self):
+            status, u = self.sign(self.query.get("formhash") or self.form().get("formhash"))
+            messages = {"unauth": "请先登录", "invalid": "抱歉，您的请求来路不正确或验证字串不符，无法提交",
+                        "done": "您今天已经签到过了", "ok": "签到成功"}
+            self.send_xml(messages[status])
+
+        def k_misign_ajax(self):
+            status, u = self.sign(self.query.get("formhash"))
+            messages = {"unauth": "请先登录后才能继续浏览", "invalid": "抱歉，您的请求来路不正确或验证字串不符，无法提交",
+                        "done": "今日已签", "ok": "签到成功，获得 5 积分"}
+            self.send_xml(f'<div class="c">{messages[status]}</div>')
+
+        def paulsign_post(self):
+            status, u = self.sign(self.form().get("formhash"))
+            messages = {"unauth": "请先登录后才能继续浏览", "invalid": "抱歉，您的请求来路不正确或验证字串不符，无法提交",
+                        "done": "您今日已经签到，请明天再来！", "ok": "恭喜你签到成功!获得随机奖励 5 积分"}
+            self.send_xml(f'<div class="c">\n{messages[status]} </div>')
+
+        def profile_page(self):
+            if not self.username:
+                return self.send(self.header_html() + self.error_div("请先登录后才能继续浏览") + "</body></html>")
+            u = site.user(self.username)
+            self.send(self.header_html() +
+                      f'<ul id="psts" class="cl"><li><em>积分</em>{u["credit"]}</li><li><em>威望</em>3</li>'
+                      f'<li><em>车票</em>12</li><li><em>贡献</em>0</li></ul></body></html>')
+
+        def ocr(self):
+            data = json.loads(self.body or b"{}")
+            if "images" in data:
+                return self.send_json({"results": [self.recognize(img) for img in data["images"]]})
+            self.send_json(self.recognize(data.get("image", "")))
+
+        def recognize(self, image_b64):
+            raw = base64.b64decode(image_b64 or "")
+            with site.lock:
+                code = site.images.get(hashlib.sha1(raw).hexdigest())
+            code = code or read_mark(raw) or site.lookup_gif(raw)
+            if code and random.random() < site.config.ocr_accuracy:
+                return {"result": code, "confidence": round(random.uniform(0.8, 0.99), 3)}
+            wrong = list(code or random_code())
+            confusable = [i for i, ch in enumerate(wrong) if ch in CONFUSED_AS]
+            if confusable and random.random() < site.config.ocr_confusable:
+                i = random.choice(confusable)
+                wrong[i] = CONFUSED_AS[wrong[i]]
+            else:
+                wrong[random.randrange(len(wrong))] = random.choice(CAPTCHA_CHARS)
+            return {"result": "".join(wrong), "confidence": round(random.uniform(0.3, 0.7), 3)}
+
+        # ---- 路由 ----
+        def dispatch(self, method):
+            self.setup_request()
+            q = self.query
+            if self.route == "/__reset":
+                return self.send_json(site.reset())
+            if self.route == "/__stats":
+                return self.send_json(site.stats)
+            if self.route == "/ocr":
+                site.count("ocr")
+                return self.ocr()
+
+            delay = site.config.latency + random.uniform(0, site.config.jitter)
+            if delay:
+                time.sleep(delay)
+            if site.config.fail_rate and random.random() < site.config.fail_rate:
+                site.count("failed")
+                return self.send("<h1>502 Bad Gateway</h1>", status=502)
+
+            if self.route == "/member.php" and q.get("mod") == "logging":
+                if method == "POST" and q.get("loginsubmit"):
+                    name, handler = "login_post", self.login
+                else:
+                    name, handler = "login_page", self.login_page
+            elif self.route == "/misc.php" and q.get("mod") == "seccode":
+                if q.get("action") == "check":
+                    name, handler = "captcha_check", self.captcha_check
+                else:
+                    name, handler = "captcha", self.captcha_image
+            elif self.route == "/k_misign-sign.html":
+                if q.get("operation") == "qiandao":
+                    name, handler = "sign", self.k_misign_ajax
+                else:
+                    name, handler = "sign_page", self.k_misign_page
+            elif self.route == "/plugin.php" and q.get("operation") == "qiandao":
+                name = "sign"
+                handler = self.paulsign_post if "paulsign" in q.get("id", "") else self.k_misign_post
+            elif self.route == "/home.php":
+                name, handler = "profile", self.profile_page
+            elif self.route in ("/", "/forum.php"):
+                name, handler = "homepage", self.homepage
+            else:
+                return self.send("<h1>404</h1>", status=404)
+            site.count(name)
+            handler()
+
+        def do_GET(self):
+            self.dispatch("GET")
+
+        def do_POST(self):
+            self.dispatch("POST")
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # 默认积压队列只有 5，高并发建连时会被丢弃并等待 1 秒重传
+
+    def handle_error(self, request, client_address):
+        # 客户端流式读取到所需内容后会直接断开连接，属于正常情况
+        pass
+
+
+class MockServer:
+    """在后台线程中运行的模拟站点"""
+
+    def __init__(self, site="xsijishe", config=None, host="127.0.0.1", port=0):
+        self.site = MockSite(site, config)
+        self.httpd = _Server((host, port), make_handler(self.site))
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def add_config_arguments(parser):
+    parser.add_argument("--latency", type=float, default=0, help="每个请求的基础延迟（毫秒）")
+    parser.add_argument("--jitter", type=float, default=0, help="额外随机延迟上限（毫秒）")
+    parser.add_argument("--fail-rate", type=float, default=0, help="随机返回 502 的比例")
+    parser.add_argument("--session-ttl", type=float, default=30 * 86400, help="登录 Cookie 有效期（秒）")
+    parser.add_argument("--revoke-rate", type=float, default=0, help="每次 /__reset 时服务端使登录态失效的比例")
+    parser.add_argument("--ocr-accuracy", type=float, default=1.0, help="模拟 OCR 的正确率")
+    parser.add_argument("--ocr-confusable", type=float, default=0.0, help="识别错误中属于形近字符误认的比例")
+    parser.add_argument("--page-kb", type=int, default=60, help="首页/签到页正文大小（KB）")
+    parser.add_argument("--gif-style", choices=["blur", "occlude"], default="blur",
+                        help="GIF 验证码样式：blur 只有一帧清晰，occlude 各帧遮住不同部位")
+
+
+def config_from_args(args):
+    return Config(
+        latency=args.latency / 1000,
+        jitter=args.jitter / 1000,
+        fail_rate=args.fail_rate,
+        session_ttl=args.session_ttl,
+        revoke_rate=args.revoke_rate,
+        ocr_accuracy=args.ocr_accuracy,
+        ocr_confusable=args.ocr_confusable,
+        page_kb=args.page_kb,
+        gif_style=args.gif_style,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地模拟 Discuz 站点")
+    parser.add_argument("--site", choices=sorted(SITES), default="xsijishe")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    server = MockServer(args.site, config_from_args(args), args.host, args.port)
+    print(f"🧪 模拟站点 {args.site} 运行于 {server.url}，OCR 地址 {server.url}/ocr")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
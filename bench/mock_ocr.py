@@ -0,0 +1,252 @@
+"""
+本地模拟 OCR 服务，协议与 OCR_SERVICE 相同：
+    POST {"image": base64}            -> {"result": str, "confidence": float}
+    POST {"images": [base64, ...]}    -> {"results": [{"result", "confidence"}, ...]}
+请求中可附带 "truth" / "truths" 字段直接给出正确答案；未给出时按已登记的验证码样本（缩略图最近邻，
+对重新编码、转灰度等处理不敏感；多帧合成、二值化后的图片按二值化缩略图匹配）或模拟站点写入的像素标记查找答案
+
+识别效果按图片清晰度（拉普拉斯方差）模拟：越模糊正确率越低、置信度越低，
+清晰度为 sharp_ref 时正确率为 accuracy 的一半
+
+用法：
+    python bench/mock_ocr.py --port 8090 --ocr-latency 80 --accuracy 0.9 --corpus captchas/
+    GET /__stats 查看请求数、图片数与上传字节数
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mock_discuz import CAPTCHA_CHARS, INK_DISTANCE, INK_THUMB, ink_thumbnail, random_code, read_mark
+from qlkit.captcha import sharpness
+
+THUMB = (40, 12)  # 最近邻匹配使用的缩略图尺寸
+MATCH_DISTANCE = 16  # 缩略图平均灰度差小于该值视为同一张验证码
+
+
+def gray_frames(data):
+    """解码为灰度帧列表（动态图片返回全部帧）"""
+    img = Image.open(BytesIO(data))
+    return [frame.convert("RGB").convert("L") for frame in ImageSequence.Iterator(img)]
+
+
+def thumbnail(gray):
+    return np.asarray(gray.resize(THUMB, Image.BILINEAR), dtype=np.float32).ravel()
+
+
+def code_from_name(path):
+    """样本文件名以验证码开头，如 AB12.gif、ab12_0001.jpg"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    code = "".join(ch for ch in stem.split("_")[0] if ch.isalnum())
+    return code if len(code) == 4 else None
+
+
+class Config:
+    def __init__(self, latency=0.0, jitter=0.0, per_image=0.0, accuracy=0.95, sharp_ref=300.0,
+                 confidence_noise=0.1, fail_rate=0.0):
+        self.latency = latency  # 每个请求的基础延迟（秒）
+        self.jitter = jitter  # 额外的随机延迟上限（秒）
+        self.per_image = per_image  # 每张图片的识别耗时（秒），批量请求按图片数累加
+        self.accuracy = accuracy  # 清晰图片的正确率
+        self.sharp_ref = sharp_ref  # 正确率降为一半时的清晰度
+        self.confidence_noise = confidence_noise  # 置信度的随机扰动幅度
+        self.fail_rate = fail_rate  # 随机返回 500 的比例
+
+
+class OcrModel:
+    """模拟识别：查找答案，再按清晰度决定是否答对以及置信度"""
+
+    def __init__(self, config=None):
+        self.config = config or Config()
+        self.lock = threading.Lock()
+        self.thumbs = np.zeros((0, THUMB[0] * THUMB[1]), dtype=np.float32)
+        self.inks = np.zeros((0, INK_THUMB[0] * INK_THUMB[1]), dtype=np.float32)  # 二值化缩略图，用于多帧合成后的图片
+        self.codes = []
+        self.stats = {"requests": 0, "images": 0, "bytes": 0, "unknown": 0, "failed": 0}
+
+    def learn(self, data, code):
+        """登记一张验证码样本（动态图片的每一帧都登记）"""
+        frames = gray_frames(data)
+        thumbs = [thumbnail(g) for g in frames]
+        inks = [ink_thumbnail(g) for g in frames]
+        with self.lock:
+            self.thumbs = np.vstack([self.thumbs, *thumbs])
+            self.inks = np.vstack([self.inks, *inks])
+            self.codes += [code] * len(thumbs)
+
+    def load_corpus(self, directory):
+        count = 0
+        for name in sorted(os.listdir(directory)):
+            code = code_from_name(name)
+            if code:
+                with open(os.path.join(directory, name), "rb") as f:
+                    self.learn(f.read(), code)
+                count += 1
+        return count
+
+    def lookup(self, gray):
+        with self.lock:
+            thumbs, inks, codes = self.thumbs, self.inks, self.codes
+        if not codes:
+            return None
+        distance = np.abs(thumbs - thumbnail(gray)).mean(axis=1)
+        best = int(np.argmin(distance))
+        if distance[best] < MATCH_DISTANCE:
+            return codes[best]
+        distance = np.abs(inks - ink_thumbnail(gray)).mean(axis=1)
+        best = int(np.argmin(distance))
+        return codes[best] if distance[best] < INK_DISTANCE else None
+
+    def recognize(self, data, truth=None):
+        cfg = self.config
+        try:
+            gray = gray_frames(data)[0]
+        except Exception:
+            return {"result": "", "confidence": 0.0}
+        truth = truth or read_mark(data) or self.lookup(gray)
+        if not truth:
+            self.count("unknown")
+        score = float(sharpness(np.asarray(gray, dtype=np.float32)[None])[0])
+        quality = score / (score + cfg.sharp_ref)
+        noise = random.uniform(-cfg.confidence_noise, cfg.confidence_noise)
+        if truth and random.random() < cfg.accuracy * quality:
+            confidence = 0.55 + 0.4 * quality + noise
+            return {"result": truth, "confidence": round(min(max(confidence, 0.0), 1.0), 3)}
+        wrong = list(truth or random_code())
+        wrong[random.randrange(len(wrong))] = random.choice(CAPTCHA_CHARS)
+        confidence = 0.2 + 0.4 * quality + noise
+        return {"result": "".join(wrong), "confidence": round(min(max(confidence, 0.0), 1.0), 3)}
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.stats[name] = self.stats.get(name, 0) + value
+
+    def handle(self, payload):
+        """处理一次请求，返回响应对象"""
+        images = payload.get("images")
+        single = images is None
+        if single:
+            images, truths = [payload.get("image", "")], [payload.get("truth")]
+        else:
+            truths = payload.get("truths") or [None] * len(images)
+        self.count("requests")
+        self.count("images", len(images))
+        delay = self.config.latency + random.uniform(0, self.config.jitter) + self.config.per_image * len(images)
+        decoded = [base64.b64decode(img or "") for img in images]
+        results = [self.recognize(data, truth) for data, truth in zip(decoded, truths)]
+        if delay:
+            time.sleep(delay)
+        return results[0] if single else {"results": results}
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+def make_handler(model):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def send_json(self, obj, status=200):
+            body = json.dumps(obj).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.startswith("/__stats"):
+                return self.send_json(model.stats)
+            self.send_json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            model.count("bytes", len(body))
+            if model.config.fail_rate and random.random() < model.config.fail_rate:
+                model.count("failed")
+                return self.send_json({"error": "internal error"}, 500)
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                return self.send_json({"error": "invalid json"}, 400)
+            self.send_json(model.handle(payload))
+
+    return Handler
+
+
+class MockOcrServer:
+    """在后台线程中运行的模拟 OCR 服务"""
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.model = OcrModel(config)
+        self.httpd = _Server((host, port), make_handler(self.model))
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/ocr"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def add_config_arguments(parser):
+    parser.add_argument("--ocr-latency", type=float, default=50, help="每个 OCR 请求的基础延迟（毫秒）")
+    parser.add_argument("--ocr-jitter", type=float, default=20, help="额外随机延迟上限（毫秒）")
+    parser.add_argument("--per-image", type=float, default=15, help="每张图片的识别耗时（毫秒）")
+    parser.add_argument("--accuracy", type=float, default=0.95, help="清晰图片的正确率")
+    parser.add_argument("--sharp-ref", type=float, default=300, help="正确率降为一半时的清晰度")
+    parser.add_argument("--confidence-noise", type=float, default=0.1, help="置信度随机扰动幅度")
+    parser.add_argument("--ocr-fail-rate", type=float, default=0, help="随机返回 500 的比例")
+
+
+def config_from_args(args):
+    return Config(
+        latency=args.ocr_latency / 1000,
+        jitter=args.ocr_jitter / 1000,
+        per_image=args.per_image / 1000,
+        accuracy=args.accuracy,
+        sharp_ref=args.sharp_ref,
+        confidence_noise=args.confidence_noise,
+        fail_rate=args.ocr_fail_rate,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地模拟 OCR 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--corpus", help="验证码样本目录，文件名以验证码开头")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    server = MockOcrServer(config_from_args(args), args.host, args.port)
+    if args.corpus:
+        print(f"📚 已登记 {server.model.load_corpus(args.corpus)} 张验证码样本")
+    print(f"🤖 模拟 OCR 服务运行于 {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
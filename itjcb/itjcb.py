@@ -1,34 +1,79 @@
-import time
 import re
-import base64
 import random
-from io import BytesIO
 import os
+import sys
 
 import requests
 from bs4 import BeautifulSoup
-from PIL import Image
-import numpy as np
+
+# 公共模块 qlkit 位于仓库根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from qlkit.captcha import FUSION_METHODS
+from qlkit.extract import Page
+from qlkit.metrics import Metrics
+from qlkit.ocr import OCR_BACKEND, create_ocr_client, is_captcha_text
+from qlkit.ocr_pool import shared_pool, solve_frames, solve_workers
+from qlkit.pipeline import DONE, Job, Pipeline, Stage
+from qlkit.retry import PERMANENT, RetryPolicy, classify_exception, message_classifier
+from qlkit.runner import run_accounts
+from qlkit.scheduler import Scheduler
+from qlkit.session import EXPIRED, EXPIRING, VALID, session_state
+from qlkit.store import SessionStore
+from qlkit.stream import fetch_until
+from qlkit.transport import POOL_SIZE, Transport
 
 #需要安装的依赖 requests beautifulsoup4 pillow numpy
 
 # 从环境变量获取配置
 ACCOUNTS = os.environ.get('ITJC8_ACCOUNTS', '')  # 多账户配置
 OCR_SERVICE = os.environ.get('OCR_SERVICE', '')  # OCR服务地址
+OCR_CONCURRENCY = int(os.environ.get('OCR_CONCURRENCY', '4'))  # 同时识别的帧数
+OCR_MIN_CONFIDENCE = os.environ.get('OCR_MIN_CONFIDENCE', '')  # 达到该置信度即停止识别其余帧
+OCR_BATCH = os.environ.get('OCR_BATCH', '') == '1'  # OCR服务支持 {"images": [...]} 批量格式时开启
+CAPTCHA_TOP_FRAMES = int(os.environ.get('ITJC8_TOP_FRAMES', '3'))  # 只识别最清晰的前几帧，0 为全部
+# 多帧合成方式（median/min/max）：先识别对齐、合成、二值化后的一张图，结果无效或置信度不足时再逐帧识别；默认关闭
+CAPTCHA_FUSION = os.environ.get('ITJC8_FUSION', '').strip().lower()
+CAPTCHA_FUSION = "" if CAPTCHA_FUSION in ("", "0", "off") else CAPTCHA_FUSION
+CONCURRENCY = int(os.environ.get('ITJC8_CONCURRENCY', '1'))  # 同时处理的账户数，1 为串行
 
 # 检查环境变量是否设置
-if not ACCOUNTS or not OCR_SERVICE:
+# 使用进程内 OCR（OCR_BACKEND=template/onnx）时不需要 OCR_SERVICE
+if not ACCOUNTS or (OCR_BACKEND == "http" and not OCR_SERVICE):
     print("❌ 错误：请设置环境变量 ITJC8_ACCOUNTS 和 OCR_SERVICE")
     exit(1)
+if CAPTCHA_FUSION and CAPTCHA_FUSION not in FUSION_METHODS:
+    print(f"❌ 错误：ITJC8_FUSION 只能是 {'/'.join(FUSION_METHODS)} 或 0，当前为 {CAPTCHA_FUSION}")
+    exit(1)
 
-LOGIN_PAGE_URL = "https://www.itjc8.com/member.php?mod=logging&action=login"
-LOGIN_POST_URL = "https://www.itjc8.com/member.php?mod=logging&action=login&loginsubmit=yes&inajax=1"
-SIGN_URL = "https://www.itjc8.com/plugin.php?id=dsu_paulsign:sign&operation=qiandao&infloat=1&sign_as=1&inajax=1"
+# 站点地址，可指向本地模拟站点做压测
+BASE_URL = os.environ.get('ITJC8_BASE_URL', "https://www.itjc8.com").rstrip("/")
+LOGIN_PAGE_URL = f"{BASE_URL}/member.php?mod=logging&action=login"
+LOGIN_POST_URL = f"{BASE_URL}/member.php?mod=logging&action=login&loginsubmit=yes&inajax=1"
+SIGN_URL = f"{BASE_URL}/plugin.php?id=dsu_paulsign:sign&operation=qiandao&infloat=1&sign_as=1&inajax=1"
 
-COOKIE_FILE_PREFIX = "./itlt_"  # cookie文件前缀
 qdxq_list = ["kx", "ng", "ym", "wl", "nu", "ch", "fd", "yl", "shuai"]
 MAX_RETRY = 3
 
+OCR_OPTIONS = {
+    "timeout": 15,
+    "concurrency": OCR_CONCURRENCY,
+    "min_confidence": float(OCR_MIN_CONFIDENCE) if OCR_MIN_CONFIDENCE else None,
+    "batch": OCR_BATCH,
+}
+ocr_client = create_ocr_client(OCR_SERVICE, **OCR_OPTIONS)
+# 设置 OCR_WORKERS 时验证码的解码、选帧与识别在独立进程中进行
+ocr_pool = shared_pool(OCR_SERVICE, **OCR_OPTIONS)
+store = SessionStore("itjc8").load()
+metrics = Metrics("itjc8")
+# 所有账户共用连接池，每个账户独立 Cookie
+transport = Transport(pool_size=max(POOL_SIZE, CONCURRENCY), metrics=metrics)
+retry_policy = RetryPolicy(max_attempts=MAX_RETRY)
+# 登录失败提示分类：密码错误/错误次数过多时本次运行不再重试，操作频繁时延长等待
+classify_login_error = message_classifier(
+    permanent=("密码错误", "用户名无效", "错误次数过多"),
+    rate_limited=("过于频繁",),
+)
+
 # 随机User-Agent列表
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
@@ -45,7 +90,7 @@ def get_random_headers():
         "Accept-Language": "zh-CN,zh;q=0.8,zh-TW;q=0.7,zh-HK;q=0.5,en-US;q=0.3,en;q=0.2",
         "Connection": "keep-alive",
         "Upgrade-Insecure-Requests": "1",
-        "Referer": "https://www.itjc8.com/"
+        "Referer": f"{BASE_URL}/"
     }
 
 def parse_accounts(accounts_str):
@@ -80,12 +125,11 @@ def parse_accounts(accounts_str):
     return accounts
 
 def parse_login_params(html):
-    soup = BeautifulSoup(html, 'html.parser')
+    page = Page(html)
 
-    formhash_tag = soup.find('input', {'name': 'formhash'})
-    formhash = formhash_tag['value'] if formhash_tag else None
+    formhash = page.input('formhash')
 
-    login_form = soup.find('form', id=re.compile(r'^loginform_'))
+    login_form = page.find('form', 'id', r'^loginform_')
     loginhash = None
     if login_form:
         id_attr = login_form.get('id', '')
@@ -98,232 +142,266 @@ def parse_login_params(html):
             if match:
                 loginhash = match.group(1)
 
-    seccodehash_tag = soup.find('input', {'name': 'seccodehash'})
-    seccodehash = seccodehash_tag['value'] if seccodehash_tag else None
-
-    seccodemodid_tag = soup.find('input', {'name': 'seccodemodid'})
-    seccodemodid = seccodemodid_tag['value'] if seccodemodid_tag else None
+    seccodehash = page.input('seccodehash')
+    seccodemodid = page.input('seccodemodid')
 
     captcha_idhash = None
-    for img in soup.find_all('img'):
-        src = img.get('src', '')
-        match = re.search(r'idhash=(\w+)', src)
-        if match:
-            captcha_idhash = match.group(1)
-            break
+    captcha_img = page.find('img', 'src', r'idhash=\w+')
+    if captcha_img:
+        captcha_idhash = re.search(r'idhash=(\w+)', captcha_img['src']).group(1)
 
     return formhash, loginhash, seccodehash, seccodemodid, captcha_idhash
 
-def fetch_captcha_frames(session, captcha_idhash):
-    url = f"https://www.itjc8.com/misc.php?mod=seccode&idhash={captcha_idhash}&update={random.randint(100000, 999999)}"
+def fetch_captcha(session, captcha_idhash):
+    """下载验证码图片，失败返回 None"""
+    url = f"{BASE_URL}/misc.php?mod=seccode&idhash={captcha_idhash}&update={random.randint(100000, 999999)}"
     try:
-        resp = session.get(url, headers=get_random_headers(), timeout=15)
+        with metrics.span("captcha_download"):
+            resp = session.get(url, headers=get_random_headers(), timeout=15)
         resp.raise_for_status()
-        gif = Image.open(BytesIO(resp.content))
-        frames = []
-        for i in range(gif.n_frames):
-            gif.seek(i)
-            frame = gif.convert("RGB")
-            buf = BytesIO()
-            frame.save(buf, format="PNG")
-            b64 = base64.b64encode(buf.getvalue()).decode()
-            frames.append({"frame_index": i, "base64_data": b64})
-        return frames
+        return resp.content
     except Exception as e:
-        print(f"获取验证码帧失败: {e}")
-        return []
-
-def get_image_sharpness(b64):
+        print(f"获取验证码失败: {e}")
+        return None
+
+def recognize_captcha(data):
+    """
+    先识别多帧合成图，结果无效时再按清晰度选帧识别（设置 OCR_WORKERS 时在识别进程池中进行），
+    取置信度最高的4位结果
+    """
+    min_confidence = OCR_OPTIONS["min_confidence"]
     try:
-        import cv2
-        img = Image.open(BytesIO(base64.b64decode(b64))).convert('L')
-        arr = np.array(img)
-        return cv2.Laplacian(arr, cv2.CV_64F).var()
-    except ImportError:
-        return 0
-    except Exception:
-        return 0
-
-def recognize_captcha(frames):
+        if ocr_pool is not None:
+            candidates = ocr_pool.solve_frames(data, CAPTCHA_TOP_FRAMES, CAPTCHA_FUSION, min_confidence)
+        else:
+            candidates = solve_frames(ocr_client, data, CAPTCHA_TOP_FRAMES, CAPTCHA_FUSION, min_confidence)
+    except Exception as e:
+        print(f"验证码解码或识别失败: {e}")
+        return ""
+    if candidates and candidates[0]["frame_index"] == -1:
+        metrics.count("fusion_solved" if len(candidates) == 1 else "fusion_fallback")
     valid = []
-    for f in frames:
-        sharpness = get_image_sharpness(f["base64_data"])
-        try:
-            r = requests.post(OCR_SERVICE, json={"image": f["base64_data"]}, timeout=15)
-            r.raise_for_status()
-            res_json = r.json()
-            result = res_json.get("result", "").strip()
-            confidence = res_json.get("confidence", 0)
-            print(f"帧 {f['frame_index']} 识别: {result}, 置信度: {confidence}, 清晰度: {sharpness:.2f}")
-            if len(result) == 4 and result.isalnum():
-                valid.append({"result": result, "confidence": confidence, "sharpness": sharpness})
-        except Exception as e:
-            print(f"OCR失败: {e}")
+    for c in candidates:
+        source = "合成图" if c["frame_index"] == -1 else f"帧 {c['frame_index']}"
+        print(f"{source} 识别: {c['result']}, 置信度: {c['confidence']}, 清晰度: {c['sharpness']:.2f}")
+        if is_captcha_text(c["result"]):
+            valid.append(c)
     if not valid:
         return ""
     valid.sort(key=lambda x: (-x["confidence"], -x["sharpness"]))
     return valid[0]["result"]
 
 def save_cookies(username, cookies):
-    """保存cookie到文件"""
-    cookie_file = f"{COOKIE_FILE_PREFIX}{username}.txt"
+    """保存cookie（含过期时间）"""
+    store.save_cookies(username, cookies)
+    print("✅ Cookie 已保存")
+
+def load_cookies(username, jar):
+    """加载保存的cookie到jar，成功返回True"""
+    if store.load_cookies(username, jar):
+        print("✅ Cookie 已加载")
+        return True
+    return False
+
+def stage_form(job):
+    """流水线阶段：获取登录页面与动态参数"""
     try:
-        cookie_str = "; ".join(f"{c.name}={c.value}" for c in cookies)
-        with open(cookie_file, "w") as f:
-            f.write(cookie_str)
-        print(f"✅ Cookie 已保存: {cookie_file}")
+        # 获取登录页面
+        with metrics.span("login_page"):
+            r = job.session.get(LOGIN_PAGE_URL, timeout=job.attempt.timeout(15))
+        r.raise_for_status()
+        html = r.text
+        job.params = parse_login_params(html)
+    except requests.exceptions.RequestException as e:
+        print(f"网络请求异常: {e}")
+        job.attempt.fail(classify_exception(e))
+        return DONE
     except Exception as e:
-        print(f"Cookie保存失败: {e}")
-
-def load_cookies(username):
-    """从文件加载cookie"""
-    cookie_file = f"{COOKIE_FILE_PREFIX}{username}.txt"
-    if os.path.exists(cookie_file):
-        try:
-            with open(cookie_file, "r") as f:
-                cookie_str = f.read().strip()
-            cookies = {}
-            for c in cookie_str.split("; "):
-                if "=" in c:
-                    k, v = c.split("=", 1)
-                    cookies[k] = v
-            print(f"✅ Cookie 已加载: {cookie_file}")
-            return cookies
-        except Exception as e:
-            print(f"加载Cookie失败: {e}")
-    return None
-
-def login(username, password):
-    session = requests.Session()
-    session.headers.update(get_random_headers())
+        print(f"登录过程异常: {e}")
+        job.attempt.fail(classify_exception(e))
+        return DONE
     
-    for attempt in range(1, MAX_RETRY + 1):
-        print(f"\n🔐 账户 {username} 第{attempt}次尝试登录...")
+    formhash, loginhash, seccodehash, seccodemodid, captcha_idhash = job.params
+    print(f"获取参数: formhash={formhash}, loginhash={loginhash}, seccodehash={seccodehash}, seccodemodid={seccodemodid}, captcha_idhash={captcha_idhash}")
+
+    if not all(job.params):
+        print("动态参数不完整，重新尝试...")
+        job.attempt.fail(classify_login_error(html))
+        return DONE
+
+def stage_captcha(job):
+    """流水线阶段：下载验证码"""
+    job.captcha_data = fetch_captcha(job.session, job.params[4])
+    if not job.captcha_data:
+        print("无法获取验证码图片，重新尝试...")
+        return DONE
+
+def stage_solve(job):
+    """流水线阶段：识别验证码"""
+    job.captcha = recognize_captcha(job.captcha_data)
+    if not job.captcha:
+        print("验证码识别失败，重新尝试...")
+        return DONE
+    print(f"识别验证码: {job.captcha}")
+
+def stage_submit(job):
+    """流水线阶段：提交登录表单，验证码随表单一起校验"""
+    username, session, attempt = job.username, job.session, job.attempt
+    formhash, loginhash, seccodehash, seccodemodid, _ = job.params
+    post_data = {
+        "formhash": formhash,
+        "referer": f"{BASE_URL}/",
+        "username": username,
+        "password": job.password,
+        "questionid": "0",
+        "answer": "",
+        "seccodehash": seccodehash,
+        "seccodemodid": seccodemodid,
+        "seccodeverify": job.captcha,
+    }
+
+    try:
+        full_url = f"{LOGIN_POST_URL}&loginhash={loginhash}"
+        with metrics.span("login_post"):
+            r = session.post(full_url, data=post_data, timeout=attempt.timeout(20))
+        r.raise_for_status()
         
-        try:
-            # 获取登录页面
-            r = session.get(LOGIN_PAGE_URL, timeout=15)
-            r.raise_for_status()
-            html = r.text
-            
-            formhash, loginhash, seccodehash, seccodemodid, captcha_idhash = parse_login_params(html)
-            print(f"获取参数: formhash={formhash}, loginhash={loginhash}, seccodehash={seccodehash}, seccodemodid={seccodemodid}, captcha_idhash={captcha_idhash}")
-
-            if not all([formhash, loginhash, seccodehash, seccodemodid, captcha_idhash]):
-                print("动态参数不完整，重新尝试...")
-                time.sleep(2)
-                continue
-
-            frames = fetch_captcha_frames(session, captcha_idhash)
-            if not frames:
-                print("无法获取验证码图片，重新尝试...")
-                time.sleep(2)
-                continue
-
-            captcha = recognize_captcha(frames)
-            if not captcha:
-                print("验证码识别失败，重新尝试...")
-                time.sleep(2)
-                continue
-
-            print(f"识别验证码: {captcha}")
-
-            post_data = {
-                "formhash": formhash,
-                "referer": "https://www.itjc8.com/",
-                "username": username,
-                "password": password,
-                "questionid": "0",
-                "answer": "",
-                "seccodehash": seccodehash,
-                "seccodemodid": seccodemodid,
-                "seccodeverify": captcha,
-            }
-
-            full_url = f"{LOGIN_POST_URL}&loginhash={loginhash}"
-            r = session.post(full_url, data=post_data, timeout=20)
-            r.raise_for_status()
+        # 检查登录结果
+        if any(s in r.text for s in ["欢迎您回来", "您已经登录", "登录成功"]):
+            print("🎉 登录成功")
+            metrics.count("ocr_checked")
+            metrics.count("ocr_passed")
+            save_cookies(username, session.cookies)
+            job.result = session
+            return DONE
+        else:
+            print(f"登录失败，响应片段：{r.text[:300]}")
+            if "验证码" in r.text:
+                metrics.count("ocr_checked")
             
-            # 检查登录结果
-            if any(s in r.text for s in ["欢迎您回来", "您已经登录", "登录成功"]):
-                print("🎉 登录成功")
-                save_cookies(username, session.cookies)
-                return session
-            else:
-                print(f"登录失败，响应片段：{r.text[:300]}")
+            # 尝试从响应中提取错误信息
+            soup = BeautifulSoup(r.text, 'html.parser')
+            if error_div := soup.find('div', class_='alert_error'):
+                error_msg = error_div.get_text(strip=True)
+                print(f"❌ 错误信息: {error_msg}")
+            elif error_div := soup.find('div', class_='alert_info'):
+                error_msg = error_div.get_text(strip=True)
+                print(f"⚠️ 提示信息: {error_msg}")
+            if attempt.fail(classify_login_error(r.text)) == PERMANENT:
+                print("❌ 账号或密码错误，停止重试")
+                return DONE
                 
-                # 尝试从响应中提取错误信息
-                soup = BeautifulSoup(r.text, 'html.parser')
-                if error_div := soup.find('div', class_='alert_error'):
-                    error_msg = error_div.get_text(strip=True)
-                    print(f"❌ 错误信息: {error_msg}")
-                elif error_div := soup.find('div', class_='alert_info'):
-                    error_msg = error_div.get_text(strip=True)
-                    print(f"⚠️ 提示信息: {error_msg}")
-                    
-        except requests.exceptions.RequestException as e:
-            print(f"网络请求异常: {e}")
-        except Exception as e:
-            print(f"登录过程异常: {e}")
-        
-        print("3秒后重试...")
-        time.sleep(3)
+    except requests.exceptions.RequestException as e:
+        print(f"网络请求异常: {e}")
+        attempt.fail(classify_exception(e))
+    except Exception as e:
+        print(f"登录过程异常: {e}")
+        attempt.fail(classify_exception(e))
 
-    print("❌ 登录失败，达到最大重试次数")
-    return None
+# 登录拆成四个阶段（站点没有单独的验证码校验接口），开启 QL_PIPELINE 时各阶段由独立线程处理
+login_pipeline = Pipeline("itjc8", [
+    Stage("form", stage_form, workers=4),
+    Stage("captcha", stage_captcha, workers=4),
+    Stage("solve", stage_solve, workers=solve_workers()),
+    Stage("submit", stage_submit, workers=4),
+])
 
-def sign_in(username, password):
-    # 先尝试从cookie签到
-    print(f"\n🔄 账户 {username} 尝试签到...")
-    
-    # 加载cookie
-    cookies = load_cookies(username)
-    session = requests.Session()
-    session.headers.update(get_random_headers())
+def login(username, password):
+    session = transport.session(get_random_headers())
     
-    if cookies:
-        # 设置cookie
-        session.cookies.update(cookies)
-        print("✅ 使用cookie进行签到")
-    else:
-        print("❌ Cookie文件不存在或加载失败")
-        return False
+    for attempt in retry_policy.attempts():
+        print(f"\n🔐 账户 {username} 第{attempt.number}次尝试登录...")
+        # 每次尝试依次经过 登录页 -> 验证码下载 -> 识别 -> 提交，失败时在本线程退避后重试
+        job = Job(attempt=attempt, username=username, password=password, session=session)
+        if login_pipeline.run(job):
+            return session
+
+    print("❌ 登录失败")
+    return None
 
-    # 使用cookie尝试签到
-    try:
-        # 获取首页以获取formhash
-        r = session.get("https://www.itjc8.com/", timeout=10)
-        r.raise_for_status()
+def fetch_sign_formhash(session):
+    """流式读取首页确认登录状态并获取签到formhash，未登录或获取失败返回None"""
+    # 退出链接和formhash都在页头，找到即断开；读到正文仍没有退出链接说明未登录
+    with metrics.span("homepage"):
+        result = fetch_until(
+            session,
+            f"{BASE_URL}/",
+            {"logout": rb'action=logout', "formhash": rb'name="formhash" value="(\w+)"'},
+            stop_at=rb'<div id="wp"',
+            timeout=10,
+        )
+    if result.status_code >= 400:
+        raise requests.HTTPError(f"首页请求失败，状态码: {result.status_code}")
+    
+    # 检查登录状态
+    if "logout" not in result.found:
+        print("❌ Cookie失效，需要重新登录")
+        return None
         
-        # 检查登录状态
-        if "退出" not in r.text:
-            print("❌ Cookie失效，需要重新登录")
-            return False
-            
-        soup = BeautifulSoup(r.text, "html.parser")
-        formhash_tag = soup.find("input", {"name": "formhash"})
-        formhash = formhash_tag['value'] if formhash_tag else None
-        if not formhash:
-            print("无法获取签到formhash")
-            return False
+    formhash = result.group("formhash")
+    if not formhash:
+        print("无法获取签到formhash")
+    return formhash
+
+def post_sign(session, formhash):
+    """提交签到请求，返回提示信息"""
+    day_xq = random.choice(qdxq_list)
+
+    post_data = {
+        "formhash": formhash,
+        "qdxq" : day_xq,
+        "qdmode": "3",
+        "todaysay": "",
+        "fastreply": "0",
+    }
+    
+    with metrics.span("sign_post"):
+        sign_resp = retry_policy.call(lambda: session.post(SIGN_URL, data=post_data, timeout=15))
+    sign_resp.raise_for_status()
 
-        day_xq = random.choice(qdxq_list)
+    text = sign_resp.text
+    # 简单提取 <div class="c"> 内文字
+    m = re.search(r'<div class="c">\s*(.*?)\s*</div>', text, re.S)
+    return m.group(1).strip() if m else "未知签到返回"
 
-        post_data = {
-            "formhash": formhash,
-            "qdxq" : day_xq,
-            "qdmode": "3",
-            "todaysay": "",
-            "fastreply": "0",
-        }
+def sign_in(username, password, session=None):
+    """签到；传入刚登录的 session 时直接使用，不再从存储读回Cookie"""
+    print(f"\n🔄 账户 {username} 尝试签到...")
+    
+    # 根据本地保存的Cookie过期时间判断，已过期的直接重新登录
+    record = store.get(username)
+    state = session_state(record["cookies"])
+    if session is None:
+        if state == EXPIRED:
+            print("❌ Cookie不存在或已过期，需要重新登录")
+            return False
         
-        sign_resp = session.post(SIGN_URL, data=post_data, timeout=15)
-        sign_resp.raise_for_status()
+        # 加载cookie
+        session = transport.session(get_random_headers())
+        load_cookies(username, session.cookies)
+        print("✅ 使用cookie进行签到")
 
-        text = sign_resp.text
-        # 简单提取 <div class="c"> 内文字
-        m = re.search(r'<div class="c">\s*(.*?)\s*</div>', text, re.S)
-        msg = m.group(1).strip() if m else "未知签到返回"
+    # 使用cookie尝试签到
+    try:
+        # Cookie确定有效且有缓存的formhash时，跳过首页探测直接签到
+        cached = state in (VALID, EXPIRING) and record["formhash"]
+        if cached:
+            formhash = record["formhash"]
+            print("⚡ Cookie有效，使用缓存的formhash签到")
+        else:
+            formhash = fetch_sign_formhash(session)
+            if not formhash:
+                return False
+            store.update(username, formhash=formhash)
+
+        msg = post_sign(session, formhash)
+        if cached and ("验证串" in msg or "来路" in msg):
+            print("🔁 缓存的formhash已失效，重新获取")
+            formhash = fetch_sign_formhash(session)
+            if not formhash:
+                return False
+            store.update(username, formhash=formhash)
+            msg = post_sign(session, formhash)
 
         # 简单emoji美化
         if "成功" in msg or "已签到" in msg:
@@ -356,8 +434,8 @@ def process_account(account):
         session = login(username, password)
         if session:
             print("登录成功，开始签到...")
-            # 登录后立即尝试签到
-            success = sign_in(username, password)
+            # 登录后直接用内存中的会话签到
+            success = sign_in(username, password, session)
             if success:
                 print(f"🎉 账户 {username} 签到完成")
             else:
@@ -366,7 +444,13 @@ def process_account(account):
             print(f"❌ 账户 {username} 登录失败，无法签到")
     else:
         print(f"🎉 账户 {username} 使用Cookie签到成功")
+        # Cookie即将过期时提前重新登录，避免下次运行时失效
+        if session_state(store.get(username)["cookies"]) == EXPIRING:
+            print("⏰ Cookie即将过期，提前重新登录")
+            login(username, password)
     
+    if success:
+        store.mark_success(username)
     return success
 
 if __name__ == "__main__":
@@ -377,13 +461,21 @@ if __name__ == "__main__":
         print("❌ 没有找到有效的账户配置")
         exit(1)
     
-    print(f"🔍 找到 {len(accounts)} 个账户")
+    print(f"🔍 找到 {len(accounts)} 个账户，并发数: {CONCURRENCY}")
     
-    # 处理每个账户
-    success_count = 0
-    for account in accounts:
-        if process_account(account):
-            success_count += 1
-        print("\n" + "="*50 + "\n")  # 账户分隔线
+    # 识别进程需在其他线程启动前创建
+    if ocr_pool is not None:
+        ocr_pool.start()
+
+    # 按预估耗时处理每个账户，Cookie 有效的优先
+    try:
+        summary = run_accounts(accounts, process_account, workers=CONCURRENCY, scheduler=Scheduler(store))
+    finally:
+        store.flush()
+        if ocr_pool is not None:
+            ocr_pool.close()
     
-    print(f"\n✅ 所有账户处理完成，成功: {success_count}/{len(accounts)}")
+    login_pipeline.close()
+    summary.report()
+    login_pipeline.report()
+    metrics.close()
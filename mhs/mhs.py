@@ -1,21 +1,41 @@
 import os
-import requests
+import sys
 import base64
 import json
+import time
+from functools import lru_cache
 from Cryptodome.Cipher import AES
 from Cryptodome.Hash import SHA256
+
+# 公共模块 qlkit 位于仓库根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from qlkit.metrics import Metrics
+from qlkit.retry import DEFAULT_POLICY, SIGN_POLICY, account_deadline
+from qlkit.session import EXPIRED, EXPIRING, token_expiry, token_state
+from qlkit.store import SessionStore
+from qlkit.transport import Transport
+
 #需要安装pycryptodomex
 #第一次使用前先抓https://bxo30.xyz/api/user/qd请求中的encryptedData和iv参数将其填到环境变量中
 
 # 从环境变量获取配置
 MHS_ACCOUNTS = os.environ.get('MHS_ACCOUNTS', '')  # 多账户配置
-TOKEN_FILE_PREFIX = "./mhs_"  # token文件前缀
 
 # 检查环境变量是否设置
 if not MHS_ACCOUNTS:
     print("❌ 错误：请设置环境变量 MHS_ACCOUNTS")
     exit(1)
 
+store = SessionStore("mhs").load()
+metrics = Metrics("mhs")
+# 所有账户共用连接池
+transport = Transport(metrics=metrics)
+
+# 签到响应中表示token失效的关键字
+TOKEN_INVALID_WORDS = ("token", "Token", "登录", "过期", "失效")
+# 即将过期的token仍可用时，观察到的有效期按此倍数放宽
+TTL_GROWTH = 1.25
+
 def parse_accounts(accounts_str):
     """解析多账户配置"""
     accounts = []
@@ -52,30 +72,48 @@ def parse_accounts(accounts_str):
     return accounts
 
 def save_token(username, token):
-    """保存token到文件"""
-    token_file = f"{TOKEN_FILE_PREFIX}{username}.txt"
+    """保存token及签发时间，能从JWT解析出有效期时一并保存"""
     try:
-        with open(token_file, 'w', encoding='utf-8') as f:
-            f.write(token)
-        print(f"✅ Token已保存: {token_file}")
+        extra = {"token_issued": time.time()}
+        lifetime = token_expiry(token)[1]
+        if lifetime:
+            extra["token_ttl"] = lifetime
+        store.update(username, token=token, extra=extra)
+        print("✅ Token已保存")
     except Exception as e:
         print(f"❌ Token保存失败: {e}")
 
 def load_token(username):
-    """从文件加载token"""
-    token_file = f"{TOKEN_FILE_PREFIX}{username}.txt"
-    if os.path.exists(token_file):
-        try:
-            with open(token_file, 'r', encoding='utf-8') as f:
-                token = f.read().strip()
-                if token:
-                    print(f"✅ 已加载Token: {token_file}")
-                    return token
-        except Exception as e:
-            print(f"❌ Token加载失败: {e}")
-    return None
+    """加载保存的token，返回 (token, 状态)"""
+    record = store.get(username)
+    token = record["token"]
+    state = token_state(token, record["extra"].get("token_issued"), record["extra"].get("token_ttl"))
+    if token:
+        print(f"✅ 已加载Token（{state}）")
+    return token, state
+
+def observe_token_lifetime(username, issued, alive):
+    """
+    按旧token的实际情况修正观察到的有效期（仅用于无法从JWT读出过期时间的token）：
+    alive=False 表示token被服务端判定失效，有效期不会超过此时已使用的时长；
+    alive=True 表示即将过期的token仍然可用，按此时的时长放宽估计，避免一次偏短的记录让之后一直提前刷新
+    """
+    if not issued:
+        return
+    observed = time.time() - issued
+    ttl = store.get(username)["extra"].get("token_ttl")
+    if alive:
+        if not ttl or observed * TTL_GROWTH <= ttl:
+            return
+        ttl = observed * TTL_GROWTH
+    elif not ttl or observed < ttl:
+        ttl = observed
+    else:
+        return
+    store.update(username, extra={"token_ttl": ttl})
+    print(f"📏 Token有效期约 {ttl / 3600:.1f} 小时")
 
-def login(username, password):
+def login(session, username, password):
     """登录获取token"""
     headers = {
         "Host": "bxo30.xyz",
@@ -95,14 +133,16 @@ def login(username, password):
 
     url = "https://bxo30.xyz/api/auth/login"
     try:
-        response = requests.post(url, json=data, headers=headers, timeout=10)
+        with metrics.span("login_post"):
+            response = DEFAULT_POLICY.call(lambda: session.post(url, json=data, headers=headers, timeout=10))
         if response.status_code == 200:
-            print(f'🤪 登录结果：{response.json().get("msg")}')
+            result = response.json()
+            print(f'🤪 登录结果：{result.get("msg")}')
         else:
             print(f'☹️ 登录失败，状态码：{response.status_code}')
             return None
 
-        plaintext = decrypt_aes_cbc_base64(response.json().get("data"), response.json().get("iv"))
+        plaintext = decrypt_aes_cbc_base64(result.get("data"), result.get("iv"))
         token = plaintext.get('token')
         if token:
             save_token(username, token)
@@ -112,8 +152,12 @@ def login(username, password):
         print(f"❌ 登录请求异常: {e}")
         return None
 
-def qd(username, token, encrypted_data, iv):
-    """执行签到"""
+def is_token_rejected(status, msg):
+    """签到响应是否表示token失效（网络错误、超时等不算）"""
+    return status in (401, 403) or any(word in (msg or "") for word in TOKEN_INVALID_WORDS)
+
+def qd(session, username, token, encrypted_data, iv):
+    """执行签到，返回 (是否成功, token是否被判定失效)"""
     url = "https://bxo30.xyz/api/user/qd"
     headers = {
         "Content-Type": "application/json;charset=UTF-8",
@@ -128,44 +172,58 @@ def qd(username, token, encrypted_data, iv):
     }
     
     try:
-        response = requests.post(url, headers=headers, json=json_data, timeout=10)
+        with metrics.span("sign_post"):
+            response = SIGN_POLICY.call(lambda: session.post(url, headers=headers, json=json_data, timeout=10))
         if response.status_code == 200:
             data = response.json()
             if data.get("code") == 1:
                 print(f"🥳 签到成功: {data.get('msg')}")
-                return True
+                return True, False
             else:
                 print(f"😖 签到失败: {data.get('msg')}")
-                return False
+                return False, is_token_rejected(response.status_code, data.get("msg"))
         else:
             print(f"😖 请求失败，状态码: {response.status_code}")
-            return False
+            return False, is_token_rejected(response.status_code, None)
     except Exception as e:
         print(f"❌ 签到请求异常: {e}")
-        return False
-
-def decrypt_aes_cbc_base64(cipher_b64: str, iv_b64: str, mH: str = "mhs-1234-s981re-k071y2"):
-    """解密数据"""
-    try:
-        key = SHA256.new(mH.encode()).digest()
-        iv = base64.b64decode(iv_b64)
-        ciphertext = base64.b64decode(cipher_b64)
+        return False, False
 
-        cipher = AES.new(key, AES.MODE_CBC, iv)
-        padded_plaintext = cipher.decrypt(ciphertext)
+MH_SECRET = "mhs-1234-s981re-k071y2"
 
-        pad_len = padded_plaintext[-1]
-        plaintext = padded_plaintext[:-pad_len].decode('utf-8')
+@lru_cache(maxsize=None)
+def derive_key(mH: str):
+    """由口令派生AES密钥，同一口令只计算一次"""
+    return SHA256.new(mH.encode()).digest()
 
+@metrics.timer("aes_decrypt")
+def decrypt_many(payloads, mH: str = MH_SECRET):
+    """批量解密 [(密文, iv), ...]，按顺序返回结果，单条失败时对应位置为 None"""
+    key = derive_key(mH)
+    results = []
+    for cipher_b64, iv_b64 in payloads:
         try:
-            return json.loads(plaintext)
-        except json.JSONDecodeError:
-            return plaintext
-    except Exception as e:
-        print(f"😖 解密失败: {e}")
-        return None
+            # CBC 的解密状态依赖 iv，每条数据需要单独的 cipher 对象
+            cipher = AES.new(key, AES.MODE_CBC, base64.b64decode(iv_b64))
+            padded_plaintext = cipher.decrypt(base64.b64decode(cipher_b64))
+
+            pad_len = padded_plaintext[-1]
+            plaintext = padded_plaintext[:-pad_len].decode('utf-8')
+
+            try:
+                results.append(json.loads(plaintext))
+            except json.JSONDecodeError:
+                results.append(plaintext)
+        except Exception as e:
+            print(f"😖 解密失败: {e}")
+            results.append(None)
+    return results
 
-def get_user_info(token):
+def decrypt_aes_cbc_base64(cipher_b64: str, iv_b64: str, mH: str = MH_SECRET):
+    """解密数据"""
+    return decrypt_many([(cipher_b64, iv_b64)], mH)[0]
+
+def get_user_info(session, token):
     """获取用户信息"""
     url = "https://bxo30.xyz/api/user/info"
     headers = {
@@ -177,7 +235,8 @@ def get_user_info(token):
     }
 
     try:
-        response = requests.post(url, headers=headers, timeout=10)
+        with metrics.span("user_info"):
+            response = session.post(url, headers=headers, timeout=10)
         if response.status_code == 200:
             res_json = response.json()
             if res_json.get("code") == 1:
@@ -191,7 +250,7 @@ def get_user_info(token):
         print(f"❌ 获取用户信息异常: {e}")
     return None
 
-def lottery(token, data):
+def lottery(session, token, data):
     """抽奖"""
     jf = data.get("jf") if data else 0
     if jf < 10:
@@ -205,7 +264,8 @@ def lottery(token, data):
     }
     
     try:
-        resp = requests.post(url, headers=headers, json={}, timeout=10)
+        with metrics.span("lottery"):
+            resp = session.post(url, headers=headers, json={}, timeout=10)
         if resp.status_code == 200:
             result = resp.json()
             code = result.get("code")
@@ -231,30 +291,48 @@ def process_account(account):
     iv = account["iv"]
     
     print(f"\n======= 开始处理账户: {username} =======")
+    session = transport.session()
     
-    # 加载token
-    token = load_token(username)
-    
-    # 如果没有token或签到失败，尝试登录
-    if not token:
-        print(f"🤖 没有找到有效token，准备登录获取新token")
-        token = login(username, password)
+    # 加载token，按签发时间和有效期判断，过期或即将过期的先登录，避免白发一次签到请求
+    token, state = load_token(username)
+    issued = store.get(username)["extra"].get("token_issued")
+    # 有效期只是观察值（不是JWT）时，即将过期的token先试用一次，仍可用就放宽估计
+    probe = state == EXPIRING and token and not token_expiry(token)[0]
+    fresh = False
+    if state in (EXPIRED, EXPIRING) and not probe:
+        if not token:
+            print(f"🤖 没有找到有效token，准备登录获取新token")
+        elif state == EXPIRED:
+            print(f"⌛ Token已过期，重新登录")
+        else:
+            print(f"⏰ Token即将过期，提前刷新")
+        token = login(session, username, password) or (token if state == EXPIRING else None)
+        fresh = True
     
     # 执行签到
+    success = False
     if token:
-        success = qd(username, token, encrypted_data, iv)
-        if not success:
-            print(f"😖 签到失败，尝试重新登录获取token")
-            token = login(username, password)
+        success, rejected = qd(session, username, token, encrypted_data, iv)
+        if success and probe:
+            observe_token_lifetime(username, issued, alive=True)
+        # 只有服务端明确判定token失效时才重新登录再签到一次，网络错误、已签到等其他失败不再重复签到
+        if not success and rejected and not fresh:
+            print(f"😖 Token已失效，尝试重新登录获取token")
+            token = login(session, username, password)
             if token:
-                success = qd(username, token, encrypted_data, iv)
+                success = qd(session, username, token, encrypted_data, iv)[0]
+                if success:
+                    observe_token_lifetime(username, issued, alive=False)
+    
+    if success:
+        store.mark_success(username)
     
     # 获取用户信息和抽奖
     if token:
-        data = get_user_info(token)
+        data = get_user_info(session, token)
         if data:
             print(f"🤑 当前积分: {data.get('jf')}")
-            lottery(token, data)
+            lottery(session, token, data)
     
     print(f"======= 账户 {username} 处理完成 =======\n")
     return success
@@ -271,8 +349,13 @@ if __name__ == "__main__":
     
     # 处理每个账户
     success_count = 0
-    for account in accounts:
-        if process_account(account):
-            success_count += 1
+    try:
+        for account in accounts:
+            with account_deadline():
+                if process_account(account):
+                    success_count += 1
+    finally:
+        store.flush()
     
     print(f"✅ 所有账户处理完成，成功: {success_count}/{len(accounts)}")
+    metrics.close()
@@ -1,8 +1,18 @@
+import asyncio
 import os
+import sys
 import httpx
 import json
 import time
 import re
+import random
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+
+# 公共模块 qlkit 位于仓库根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from qlkit.metrics import Metrics, summarize
+from qlkit.retry import SIGN_POLICY, account_deadline
+from qlkit.session import EXPIRED, EXPIRING, auth_expiry, session_state
 
 # 从环境变量获取多账户 Cookie 配置
 def get_cookies_list_from_env():
@@ -94,80 +104,165 @@ data = {
 # 🔗 请求 URL
 url = "https://vip.bdziyi.com/wp-admin/admin-ajax.php"
 
-def sign_in_for_account(account):
-    """为单个账户执行签到"""
-    account_id = account["id"]
+metrics = Metrics("bdziyi")
+
+# 并发模式：所有账户共用一个 HTTP/2 连接同时签到，设为 0 时逐个账户签到
+CONCURRENT = os.getenv('BDZYYI_CONCURRENT', '1') != '0'
+# 并发模式下同时进行的签到请求数
+CONCURRENCY = int(os.getenv('BDZYYI_CONCURRENCY', '20'))
+
+def get_username(cookies):
+    """从 wordpress_logged_in Cookie 中提取用户名"""
+    for key in cookies:
+        if "wordpress_logged_in" in key:
+            match = re.search(r'\|([^\|]+)\|', cookies[key])
+            if match:
+                return match.group(1)
+    return "未知用户"
+
+def prepare_account(account):
+    """打印账户信息并检查 Cookie 是否过期，可以签到时返回 True"""
     cookies = account["cookies"]
     
-    print(f"\n{'='*30} 账户 {account_id} {'='*30}")
+    print(f"\n{'='*30} 账户 {account['id']} {'='*30}")
+    print(f"👤 用户名: {get_username(cookies)}")
+    print(f"🔑 使用的 Cookie 键: {', '.join(cookies.keys())}")
+    
+    # wordpress_logged_in 中带有过期时间，已过期的不再发送请求
+    state = session_state(cookies)
+    if state == EXPIRED:
+        print("⚠️ Cookie 已过期，请重新获取")
+        return False
+    if state == EXPIRING:
+        expire_at = time.strftime("%Y-%m-%d %H:%M", time.localtime(auth_expiry(cookies)))
+        print(f"⏰ Cookie 将于 {expire_at} 过期，请及时更新")
+    return True
+
+def handle_response(response, elapsed_time):
+    """处理签到响应，成功或今日已签到时返回 True"""
+    print(f"⏱️ 请求耗时: {elapsed_time:.2f}ms")
+    print(f"📡 响应状态码: {response.status_code}")
+    
+    # 📊 处理响应
+    if response.status_code == 200:
+        try:
+            result = response.json()
+            
+            if not result.get("error"):
+                print("✅ 签到成功！🎉")
+                print(f"📅 连续签到: {result.get('continuous_day', '未知')} 天")
+                print(f"⭐ 获得积分: +{result.get('data', {}).get('points', '未知')}")
+                print(f"📚 获得经验: +{result.get('data', {}).get('integral', '未知')}")
+                print(f"🕒 时间: {result.get('data', {}).get('time', '未知')}")
+                return True
+            else:
+                error_msg = result.get("msg", "未知错误")
+                print(f"❌ 签到失败: {error_msg}")
+                
+                # 常见错误处理
+                if "已经签到" in error_msg:
+                    print("ℹ️ 今日已签到过，无需重复签到")
+                    return True
+                elif "登录" in error_msg:
+                    print("⚠️ Cookie 可能已失效，请重新获取")
+        except json.JSONDecodeError:
+            print("❌ 无法解析返回结果，响应内容:")
+            print(response.text[:200])  # 只打印前200个字符
+    else:
+        print(f"🚫 请求失败，状态码: {response.status_code}")
+        print(f"响应内容: {response.text[:200]}")
+    return False
+
+def report_error(error):
+    """打印请求异常"""
+    if isinstance(error, httpx.ConnectError):
+        print("❌ 网络连接错误，请检查网络连接")
+    elif isinstance(error, httpx.TimeoutException):
+        print("❌ 请求超时，请稍后重试")
+    else:
+        print(f"❌ 发生未知错误: {str(error)}")
+
+def sign_in_for_account(account, elapsed=None):
+    """为单个账户执行签到，elapsed 用于收集请求耗时"""
+    if not prepare_account(account):
+        return False
     
     try:
-        # 获取登录用户名（如果有）
-        username = "未知用户"
-        for key in cookies:
-            if "wordpress_logged_in" in key:
-                # 尝试从 Cookie 值中提取用户名
-                match = re.search(r'\|([^\|]+)\|', cookies[key])
-                if match:
-                    username = match.group(1)
-                    break
-        
-        print(f"👤 用户名: {username}")
-        print(f"🔑 使用的 Cookie 键: {', '.join(cookies.keys())}")
-        
         # 📨 发起 POST 请求
         with httpx.Client(
             http2=True,
-            cookies=cookies,
+            cookies=account["cookies"],
             headers=get_headers(),
             timeout=15,
             follow_redirects=True
         ) as client:
             start_time = time.time()
-            response = client.post(url, data=data)
+            response = SIGN_POLICY.call(lambda: client.post(url, data=data))
             elapsed_time = (time.time() - start_time) * 1000  # 毫秒
-        
-        print(f"⏱️ 请求耗时: {elapsed_time:.2f}ms")
-        print(f"📡 响应状态码: {response.status_code}")
-        
-        # 📊 处理响应
-        if response.status_code == 200:
-            try:
-                result = response.json()
-                
-                if not result.get("error"):
-                    print("✅ 签到成功！🎉")
-                    print(f"📅 连续签到: {result.get('continuous_day', '未知')} 天")
-                    print(f"⭐ 获得积分: +{result.get('data', {}).get('points', '未知')}")
-                    print(f"📚 获得经验: +{result.get('data', {}).get('integral', '未知')}")
-                    print(f"🕒 时间: {result.get('data', {}).get('time', '未知')}")
-                    return True
-                else:
-                    error_msg = result.get("msg", "未知错误")
-                    print(f"❌ 签到失败: {error_msg}")
-                    
-                    # 常见错误处理
-                    if "已经签到" in error_msg:
-                        print("ℹ️ 今日已签到过，无需重复签到")
-                        return True
-                    elif "登录" in error_msg:
-                        print("⚠️ Cookie 可能已失效，请重新获取")
-            except json.JSONDecodeError:
-                print("❌ 无法解析返回结果，响应内容:")
-                print(response.text[:200])  # 只打印前200个字符
-        else:
-            print(f"🚫 请求失败，状态码: {response.status_code}")
-            print(f"响应内容: {response.text[:200]}")
-    
-    except httpx.ConnectError:
-        print("❌ 网络连接错误，请检查网络连接")
-    except httpx.TimeoutException:
-        print("❌ 请求超时，请稍后重试")
+        metrics.observe("checkin", elapsed_time / 1000)
+        metrics.observe_http(url, response.elapsed.total_seconds(), response.num_bytes_downloaded)
+        if elapsed is not None:
+            elapsed.append(elapsed_time)
+        return handle_response(response, elapsed_time)
     except Exception as e:
-        print(f"❌ 发生未知错误: {str(e)}")
+        report_error(e)
     
     return False
 
+async def post_with_cookie(client, cookie):
+    """发送签到请求并逐跳跟随重定向，每一跳都只携带本账户的 Cookie"""
+    request = client.build_request("POST", url, data=data, headers={"Cookie": cookie})
+    for _ in range(client.max_redirects + 1):
+        response = await client.send(request)
+        if response.next_request is None:
+            return response
+        # httpx 跟随重定向时会去掉显式的 Cookie 头，改用客户端 Cookie，这里重新写回本账户的 Cookie
+        request = response.next_request
+        request.headers["Cookie"] = cookie
+    raise httpx.TooManyRedirects("重定向次数过多", request=request)
+
+async def checkin(client, semaphore, account):
+    """在共享连接上发送单个账户的签到请求，Cookie 随请求单独携带"""
+    cookie = "; ".join(f"{k}={v}" for k, v in account["cookies"].items())
+    async with semaphore:
+        start_time = time.time()
+        response = await SIGN_POLICY.call_async(lambda: post_with_cookie(client, cookie))
+        return response, (time.time() - start_time) * 1000
+
+async def sign_in_concurrently(accounts, elapsed):
+    """所有账户共用一个 HTTP/2 客户端并发签到，按账户顺序输出结果，返回成功数"""
+    ready = [a for a in accounts if session_state(a["cookies"]) != EXPIRED]
+    semaphore = asyncio.Semaphore(max(1, CONCURRENCY))
+    # 共享客户端不保存任何 Cookie（各账户响应中的 Set-Cookie 不会混入其他账户的请求），重定向由 post_with_cookie 处理
+    async with httpx.AsyncClient(
+        http2=True,
+        headers=get_headers(),
+        cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+        timeout=15,
+        follow_redirects=False
+    ) as client:
+        results = await asyncio.gather(
+            *(checkin(client, semaphore, a) for a in ready), return_exceptions=True
+        )
+    results = dict(zip((a["id"] for a in ready), results))
+    
+    success_count = 0
+    for account in accounts:
+        if not prepare_account(account):
+            continue
+        result = results[account["id"]]
+        if isinstance(result, Exception):
+            report_error(result)
+            continue
+        response, elapsed_time = result
+        elapsed.append(elapsed_time)
+        metrics.observe("checkin", elapsed_time / 1000)
+        metrics.observe_http(url, response.elapsed.total_seconds(), response.num_bytes_downloaded)
+        print(f"🔀 协议: {response.http_version}")
+        if handle_response(response, elapsed_time):
+            success_count += 1
+    return success_count
+
 if __name__ == "__main__":
     # 获取多账户配置
     accounts = get_cookies_list_from_env()
@@ -180,12 +275,27 @@ if __name__ == "__main__":
     print("=" * 60)
     
     # 执行签到
-    success_count = 0
-    for account in accounts:
-        if sign_in_for_account(account):
-            success_count += 1
+    elapsed = []
+    started = time.time()
+    if CONCURRENT:
+        success_count = asyncio.run(sign_in_concurrently(accounts, elapsed))
         print("=" * 60)
-        time.sleep(1)  # 账户间短暂延迟
+    else:
+        success_count = 0
+        for account in accounts:
+            with account_deadline():
+                if sign_in_for_account(account, elapsed):
+                    success_count += 1
+            print("=" * 60)
+            with metrics.span("account_delay"):
+                time.sleep(1)  # 账户间短暂延迟
     
-    print(f"\n📊 签到完成: 成功 {success_count}/{len(accounts)} 个账户")
+    print(f"\n📊 签到完成: 成功 {success_count}/{len(accounts)} 个账户，总耗时 {time.time() - started:.2f}s")
+    if elapsed:
+        stats = summarize(elapsed)
+        print(f"⏱️ 请求耗时: p50 {stats['p50']:.0f}ms / p95 {stats['p95']:.0f}ms / p99 {stats['p99']:.0f}ms / 最大 {stats['max']:.0f}ms")
+    try:
+        metrics.export()
+    except Exception as e:
+        print(f"⚠️ 导出统计失败: {e}")
     print("=" * 60)
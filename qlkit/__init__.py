@@ -0,0 +1 @@
+"""青龙签到脚本公共模块"""
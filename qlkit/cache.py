@@ -0,0 +1,73 @@
+"""单次运行内的页面缓存"""
+import re
+import threading
+from collections import OrderedDict
+
+
+class PageCache:
+    """
+    以 (URL, Cookie 状态) 为键缓存页面解析结果
+    cookie_names 为参与计算键的 Cookie 名称正则（如只看登录相关 Cookie，忽略 lastact 这类每次都变的值）；
+    登录、签到等改变状态的请求之后应调用 invalidate
+    """
+
+    def __init__(self, cookie_names=None, maxsize=64):
+        self.cookie_names = re.compile(cookie_names) if cookie_names else None
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, session, url):
+        cookies = sorted(
+            (c.domain, c.name, c.value)
+            for c in session.cookies
+            if self.cookie_names is None or self.cookie_names.search(c.name)
+        )
+        return url, tuple(cookies)
+
+    def get(self, session, url, fetch):
+        """命中时返回缓存内容，否则调用 fetch() 获取并缓存"""
+        key = self.key(session, url)
+        with self._lock:
+            if key in self._items:
+                self.hits += 1
+                self._items.move_to_end(key)
+                return self._items[key]
+            self.misses += 1
+        value = fetch()
+        # 非 2xx 的页面（如 5xx 错误页）不缓存，下次重新获取
+        status = getattr(value, "status_code", 200)
+        if not 200 <= status < 300:
+            return value
+        self.put(session, url, value)
+        return value
+
+    def peek(self, session, url):
+        """当前 Cookie 状态下的缓存内容，未缓存时返回 None（不计入命中统计）"""
+        with self._lock:
+            return self._items.get(self.key(session, url))
+
+    def put(self, session, url, value):
+        """按当前 Cookie 状态写入缓存，也用于按响应更新已缓存的页面"""
+        # 按获取之后的 Cookie 状态缓存（首次访问会下发 saltkey 等 Cookie）；
+        # 没有任何相关 Cookie 的页面无法区分会话，不缓存，以免新会话之间共用 formhash
+        key = self.key(session, url)
+        if not key[1]:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def invalidate(self, session=None, url=None):
+        """清除缓存；指定 session 时只清除该会话当前 Cookie 状态下的页面"""
+        with self._lock:
+            if session is None:
+                self._items.clear()
+                return
+            current = self.key(session, url or "")[1]
+            for key in [k for k in self._items if k[1] == current and (url is None or k[0] == url)]:
+                del self._items[key]
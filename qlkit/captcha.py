@@ -0,0 +1,118 @@
+"""验证码图像处理（纯 NumPy，不依赖 OpenCV）"""
+import base64
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+from qlkit.metrics import timer
+
+# ITU-R BT.601 灰度系数，与 PIL convert('L') 一致
+GRAY_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+@timer("gif_decode")
+def decode_frames(data):
+    """一次性解码（动态）图片为 (n, h, w, 3) 的 uint8 数组"""
+    img = Image.open(BytesIO(data))
+    return np.stack([np.asarray(frame.convert("RGB")) for frame in ImageSequence.Iterator(img)])
+
+
+def to_gray(frames):
+    """(n, h, w, 3) 转为 (n, h, w) 的 float32 灰度"""
+    return frames.astype(np.float32) @ GRAY_WEIGHTS
+
+
+def sharpness(frames):
+    """
+    向量化计算每帧清晰度：4 邻域拉普拉斯响应的方差
+    与 cv2.Laplacian(img, CV_64F).var() 在图像内部区域的计算一致
+    """
+    gray = to_gray(frames) if frames.ndim == 4 else frames.astype(np.float32)
+    if gray.shape[1] < 3 or gray.shape[2] < 3:
+        return np.zeros(gray.shape[0])
+    lap = (
+        gray[:, :-2, 1:-1] + gray[:, 2:, 1:-1]
+        + gray[:, 1:-1, :-2] + gray[:, 1:-1, 2:]
+        - 4 * gray[:, 1:-1, 1:-1]
+    )
+    return lap.reshape(lap.shape[0], -1).var(axis=1)
+
+
+@timer("frame_rank")
+def rank_frames(frames, top_k=0):
+    """按清晰度从高到低返回 (帧序号, 清晰度) 列表，top_k<=0 时返回全部"""
+    scores = sharpness(frames)
+    order = np.argsort(-scores, kind="stable")
+    if top_k > 0:
+        order = order[:top_k]
+    return [(int(i), float(scores[i])) for i in order]
+
+
+@timer("png_encode")
+def encode_png_base64(frame):
+    """单帧数组编码为 PNG 的 base64 字符串"""
+    buf = BytesIO()
+    Image.fromarray(frame).save(buf, format="PNG")
+    return base64.b64encode(buf.getvalue()).decode()
+
+
+def otsu_threshold(gray):
+    """Otsu 法求二值化阈值（类间方差最大），gray 为 0~255 的二维数组"""
+    hist = np.bincount(np.clip(gray, 0, 255).astype(np.uint8).ravel(), minlength=256).astype(np.float64)
+    weight = np.cumsum(hist)
+    total = weight[-1]
+    mean = np.cumsum(hist * np.arange(256))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mean[-1] * weight / total - mean) ** 2 / (weight * (total - weight))
+    # 只有一种灰度时各阈值均无意义，返回 0
+    return int(np.argmax(np.nan_to_num(between[:-1])))
+
+
+def phase_correlation(reference, image):
+    """相位相关法估计整数平移 (dy, dx)：将 image 平移 (dy, dx) 后与 reference 对齐"""
+    cross = np.fft.rfft2(reference - reference.mean()) * np.conj(np.fft.rfft2(image - image.mean()))
+    cross /= np.abs(cross) + 1e-9
+    corr = np.fft.irfft2(cross, s=reference.shape)
+    dy, dx = np.unravel_index(int(np.argmax(corr)), corr.shape)
+    h, w = corr.shape
+    return int(dy - h if dy > h // 2 else dy), int(dx - w if dx > w // 2 else dx)
+
+
+def shift_frame(gray, dy, dx, fill):
+    """平移灰度帧，移出画面的部分丢弃，空出的边缘填充 fill"""
+    shifted = np.roll(gray, (dy, dx), axis=(0, 1))
+    if dy > 0:
+        shifted[:dy] = fill
+    elif dy < 0:
+        shifted[dy:] = fill
+    if dx > 0:
+        shifted[:, :dx] = fill
+    elif dx < 0:
+        shifted[:, dx:] = fill
+    return shifted
+
+
+# 逐像素合成方式：median 去掉只出现在少数帧中的遮挡与噪点，min 补全各帧分别被遮住的深色笔画，max 去掉位置不同的深色干扰线
+FUSION_METHODS = {"median": np.median, "min": np.min, "max": np.max}
+
+
+@timer("frame_fusion")
+def fuse_frames(frames, method="median", binarize=True, max_shift=8):
+    """
+    多帧合成：以最清晰的帧为基准，用相位相关对齐其余各帧（位移超过 max_shift 视为估计失败，不平移），
+    逐像素合成一张去噪图；binarize 时按 Otsu 阈值二值化为白底黑字。返回 (h, w) 的 uint8 数组
+    """
+    gray = to_gray(frames) if frames.ndim == 4 else frames.astype(np.float32)
+    reference = gray[int(np.argmax(sharpness(gray)))]
+    fill = float(np.median(reference))  # 背景色
+    aligned = []
+    for frame in gray:
+        dy, dx = phase_correlation(reference, frame)
+        if max(abs(dy), abs(dx)) <= max_shift:
+            frame = shift_frame(frame, dy, dx, fill)
+        aligned.append(frame)
+    composite = FUSION_METHODS[method](np.stack(aligned), axis=0)
+    if binarize:
+        composite = np.where(composite > otsu_threshold(composite), 255.0, 0.0)
+    return np.clip(composite + 0.5, 0, 255).astype(np.uint8)
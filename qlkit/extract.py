@@ -0,0 +1,143 @@
+"""
+轻量 HTML 字段提取
+一次正则扫描建立标签索引，读取 formhash 等少量字段时无需构建完整的 BeautifulSoup 树；
+快速路径找不到时自动回退到 BeautifulSoup
+"""
+import re
+from html import unescape
+
+from qlkit.metrics import timer
+
+# 标签内的属性部分，属性值按引号整体匹配，值中的 > 不会截断标签
+ATTRS = r'(?:"[^"]*"|\'[^\']*\'|[^\'">])*'
+TAG_RE = re.compile(rf'<(input|form|span|img|a|ul|div)\b({ATTRS})>', re.I)
+LINK_RE = re.compile(rf'<a\b({ATTRS})>(.*?)</a>', re.I | re.S)
+HREF_RE = re.compile(r'\bhref\s*=\s*(?:"([^"]*)"|\'([^\']*)\')', re.I)
+ATTR_RE = re.compile(r'([\w:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+))')
+LI_RE = re.compile(rf'<li\b{ATTRS}>(.*?)</li>', re.I | re.S)
+MARKUP_RE = re.compile(rf'<[^>\'"]{ATTRS}>')
+
+
+def strip_tags(fragment):
+    """去掉标签并逐段去除空白，效果同 get_text(strip=True)"""
+    return "".join(part.strip() for part in unescape(MARKUP_RE.sub("\0", fragment)).split("\0"))
+
+
+class Page:
+    """
+    页面字段索引，fallback=False 时找不到直接返回 None
+    各方法的 fallback 参数可单独覆盖（自带备选方案的可选字段传 False，找不到时不构建 BeautifulSoup）
+    """
+
+    @timer("html_parse")
+    def __init__(self, html, fallback=True):
+        self.html = html
+        self.fallback = fallback
+        self._soup = None
+        self.tags = []
+        self.inputs = {}
+        self.ids = {}
+        for m in TAG_RE.finditer(html):
+            body = m.group(2)
+            if "=" not in body:
+                continue
+            attrs = {
+                k.lower(): unescape(v or v2 or v3)
+                for k, v, v2, v3 in ATTR_RE.findall(body)
+            }
+            tag = m.group(1).lower()
+            entry = (tag, attrs, m.end())
+            self.tags.append(entry)
+            if tag == "input" and "name" in attrs:
+                self.inputs.setdefault(attrs["name"], attrs)
+            if "id" in attrs:
+                self.ids.setdefault(attrs["id"], entry)
+
+    @property
+    def soup(self):
+        if self._soup is None:
+            from bs4 import BeautifulSoup
+            self._soup = BeautifulSoup(self.html, "html.parser")
+        return self._soup
+
+    def _fallback(self, fallback):
+        return self.fallback if fallback is None else fallback
+
+    def input(self, name, fallback=None):
+        """name 对应 input 的 value"""
+        attrs = self.inputs.get(name)
+        if attrs is not None:
+            return attrs.get("value")
+        if self._fallback(fallback):
+            tag = self.soup.find("input", {"name": name})
+            return tag.get("value") if tag else None
+        return None
+
+    def element(self, element_id, fallback=None):
+        """id 对应元素的属性字典"""
+        entry = self.ids.get(element_id)
+        if entry is not None:
+            return entry[1]
+        if self._fallback(fallback):
+            tag = self.soup.find(id=element_id)
+            return dict(tag.attrs) if tag else None
+        return None
+
+    def find(self, tag, attr, pattern, fallback=None):
+        """第一个 attr 匹配正则 pattern 的 tag 元素的属性字典"""
+        regex = re.compile(pattern)
+        for name, attrs, _ in self.tags:
+            if name == tag and regex.search(attrs.get(attr, "")):
+                return attrs
+        if self._fallback(fallback):
+            found = self.soup.find(tag, attrs={attr: regex})
+            return dict(found.attrs) if found else None
+        return None
+
+    def _inner(self, element_id):
+        """元素的内部 HTML，按同名标签的嵌套层数找对应的结束标签，找不到时返回 None"""
+        entry = self.ids.get(element_id)
+        if entry is None:
+            return None
+        tag, _, start = entry
+        depth = 1
+        for m in re.compile(rf'<(/?){tag}\b{ATTRS}>', re.I).finditer(self.html, start):
+            if not m.group(1):
+                depth += not m.group(0).endswith("/>")
+                continue
+            depth -= 1
+            if depth == 0:
+                return self.html[start:m.start()]
+        return None
+
+    def text(self, element_id, fallback=None):
+        """id 对应元素的文本内容"""
+        inner = self._inner(element_id)
+        if inner is not None:
+            return strip_tags(inner)
+        if self._fallback(fallback):
+            tag = self.soup.find(id=element_id)
+            return tag.get_text(strip=True) if tag else None
+        return None
+
+    def link_text(self, href_pattern, fallback=None):
+        """第一个 href 匹配正则的链接文本"""
+        regex = re.compile(href_pattern)
+        for m in LINK_RE.finditer(self.html):
+            href = HREF_RE.search(m.group(1))
+            if href and regex.search(unescape(href.group(1) if href.group(1) is not None else href.group(2))):
+                return strip_tags(m.group(2))
+        if self._fallback(fallback):
+            tag = self.soup.find("a", href=regex)
+            return tag.get_text(strip=True) if tag else None
+        return None
+
+    def items(self, element_id, fallback=None):
+        """id 对应列表中每个 li 的文本"""
+        inner = self._inner(element_id)
+        if inner is not None:
+            return [strip_tags(li) for li in LI_RE.findall(inner)]
+        if self._fallback(fallback):
+            tag = self.soup.find(id=element_id)
+            return [li.get_text(strip=True) for li in tag.find_all("li")] if tag else []
+        return []
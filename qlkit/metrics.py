@@ -0,0 +1,258 @@
+"""
+耗时统计：按阶段记录 span 耗时、按主机记录请求耗时与流量、计数器（重试次数、验证码识别结果等），
+运行结束时导出 JSON Lines 与 Prometheus textfile
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from urllib.parse import urlsplit
+
+# 导出目录，未设置时只在内存中统计
+METRICS_DIR = os.environ.get('QL_METRICS_DIR', '')
+QUANTILES = (50, 95, 99)
+
+
+def percentile(values, p):
+    """线性插值计算百分位数，p 取 0~100，values 为空时返回 None"""
+    data = sorted(values)
+    if not data:
+        return None
+    k = (len(data) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(data) - 1)
+    return data[lower] + (data[upper] - data[lower]) * (k - lower)
+
+
+def summarize(values, points=QUANTILES):
+    """返回 {"count", "max", "p50", ...}"""
+    values = list(values)
+    result = {"count": len(values), "max": max(values) if values else None}
+    for p in points:
+        result[f"p{p}"] = percentile(values, p)
+    return result
+
+
+class Metrics:
+    """
+    用法：
+        metrics = Metrics("xsijishe")
+        with metrics.span("login_post"):
+            ...
+        session.hooks["response"].append(metrics.response_hook)
+        metrics.count("ocr_passed")
+        metrics.export()
+    """
+
+    def __init__(self, site, directory=METRICS_DIR):
+        self.site = site
+        self.directory = directory
+        self.started = time.time()
+        self.phases = {}  # 阶段 -> [耗时秒]
+        self.http = {}  # 主机 -> [耗时秒]
+        self.counters = {}
+        self._bytes = {}  # 主机 -> 下载字节数
+        self._lock = threading.Lock()
+        activate(self)
+
+    def reset(self):
+        """清空已记录的数据，重新开始统计"""
+        with self._lock:
+            self.started = time.time()
+            self.phases.clear()
+            self.http.clear()
+            self.counters.clear()
+            self._bytes.clear()
+
+    @contextmanager
+    def span(self, phase):
+        """记录代码块耗时，异常时同样记录"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - start)
+
+    def timer(self, phase):
+        """函数耗时装饰器"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(phase):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def observe(self, phase, seconds):
+        with self._lock:
+            self.phases.setdefault(phase, []).append(seconds)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe_http(self, url, seconds, nbytes=0):
+        """记录一次请求（用于 httpx 等无法挂 requests 钩子的客户端）"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            self.http.setdefault(host, []).append(seconds)
+        self.add_bytes(host, nbytes)
+
+    def add_bytes(self, host, nbytes):
+        with self._lock:
+            self._bytes[host] = self._bytes.get(host, 0) + nbytes
+
+    def response_hook(self, response, *args, **kwargs):
+        """
+        requests 响应钩子：记录请求耗时；正文在钩子之后才读取，
+        因此包装底层流按实际读取的（解压后）字节数统计，流式读取中途断开的只计已读部分
+        """
+        host = urlsplit(response.url).netloc
+        with self._lock:
+            self.http.setdefault(host, []).append(response.elapsed.total_seconds())
+        raw = response.raw
+        stream = getattr(raw, "stream", None)
+        if stream is not None:
+            def counted(*args, **kwargs):
+                for chunk in stream(*args, **kwargs):
+                    self.add_bytes(host, len(chunk))
+                    yield chunk
+            raw.stream = counted
+        return response
+
+    def bytes_by_host(self):
+        with self._lock:
+            return dict(self._bytes)
+
+    def snapshot(self):
+        """本次运行的统计结果"""
+        transferred = self.bytes_by_host()
+        with self._lock:
+            phases = {k: summarize(v) for k, v in self.phases.items()}
+            for phase, values in self.phases.items():
+                phases[phase]["sum"] = sum(values)
+            http = {k: {**summarize(v), "sum": sum(v)} for k, v in self.http.items()}
+            counters = dict(self.counters)
+        for host, nbytes in transferred.items():
+            http.setdefault(host, {"count": 0})["bytes"] = nbytes
+        checked = counters.get("ocr_checked", 0)
+        return {
+            "site": self.site,
+            "started": self.started,
+            "elapsed": time.time() - self.started,
+            "phases": phases,
+            "http": http,
+            "counters": counters,
+            "ocr_accuracy": counters.get("ocr_passed", 0) / checked if checked else None,
+        }
+
+    def report(self):
+        """打印耗时最多的阶段"""
+        snap = self.snapshot()
+        if not snap["phases"]:
+            return
+        print("\n⏱️ 各阶段耗时（合计 / p50 / p95 / 次数）:")
+        for phase, s in sorted(snap["phases"].items(), key=lambda kv: -kv[1]["sum"]):
+            print(f"   {phase}: {s['sum']:.2f}s / {s['p50'] * 1000:.0f}ms / {s['p95'] * 1000:.0f}ms / {s['count']}")
+        for host, s in snap["http"].items():
+            print(f"🌐 {host}: {s['count']} 次请求，{s.get('bytes', 0) / 1024:.1f}KB")
+        if snap["ocr_accuracy"] is not None:
+            print(f"🔍 验证码识别正确率: {snap['ocr_accuracy']:.0%}")
+        if snap["counters"].get("retries"):
+            print(f"🔁 重试次数: {snap['counters']['retries']}")
+
+    def export(self, directory=None):
+        """追加一行 JSON 到 <目录>/<站点>.jsonl，并覆盖写入 <目录>/<站点>.prom"""
+        directory = directory or self.directory
+        if not directory:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        snap = self.snapshot()
+        with open(os.path.join(directory, f"{self.site}.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(snap, ensure_ascii=False) + "\n")
+        path = os.path.join(directory, f"{self.site}.prom")
+        # 先写临时文件再替换，避免 node_exporter 读到半个文件
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(prometheus_text(snap))
+        os.replace(path + ".tmp", path)
+        return snap
+
+    def close(self):
+        """打印并导出统计结果"""
+        self.report()
+        try:
+            self.export()
+        except Exception as e:
+            print(f"⚠️ 导出统计失败: {e}")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in labels.items()) + "}"
+
+
+def prometheus_text(snap):
+    """按 Prometheus textfile 格式输出统计结果"""
+    site = snap["site"]
+    lines = [
+        "# HELP ql_phase_seconds 各阶段耗时",
+        "# TYPE ql_phase_seconds summary",
+    ]
+    for phase, s in snap["phases"].items():
+        for p in QUANTILES:
+            lines.append(f"ql_phase_seconds{_labels(site=site, phase=phase, quantile=p / 100)} {s[f'p{p}']:.6f}")
+        lines.append(f"ql_phase_seconds_sum{_labels(site=site, phase=phase)} {s['sum']:.6f}")
+        lines.append(f"ql_phase_seconds_count{_labels(site=site, phase=phase)} {s['count']}")
+    lines += ["# HELP ql_http_seconds 请求耗时", "# TYPE ql_http_seconds summary"]
+    for host, s in snap["http"].items():
+        if not s["count"]:
+            continue
+        for p in QUANTILES:
+            lines.append(f"ql_http_seconds{_labels(site=site, host=host, quantile=p / 100)} {s[f'p{p}']:.6f}")
+        lines.append(f"ql_http_seconds_sum{_labels(site=site, host=host)} {s['sum']:.6f}")
+        lines.append(f"ql_http_seconds_count{_labels(site=site, host=host)} {s['count']}")
+    lines += ["# HELP ql_http_bytes 下载字节数", "# TYPE ql_http_bytes gauge"]
+    for host, s in snap["http"].items():
+        lines.append(f"ql_http_bytes{_labels(site=site, host=host)} {s.get('bytes', 0)}")
+    lines += ["# HELP ql_events 计数器（重试、验证码识别等）", "# TYPE ql_events gauge"]
+    for name, value in snap["counters"].items():
+        lines.append(f"ql_events{_labels(site=site, name=name)} {value}")
+    if snap["ocr_accuracy"] is not None:
+        lines += ["# HELP ql_ocr_accuracy 验证码识别正确率", "# TYPE ql_ocr_accuracy gauge"]
+        lines.append(f"ql_ocr_accuracy{_labels(site=site)} {snap['ocr_accuracy']:.4f}")
+    lines += ["# TYPE ql_run_seconds gauge", f"ql_run_seconds{_labels(site=site)} {snap['elapsed']:.3f}"]
+    lines.append(f"ql_run_timestamp_seconds{_labels(site=site)} {snap['started']:.0f}")
+    return "\n".join(lines) + "\n"
+
+
+# 当前脚本的 Metrics，供 qlkit 内部模块（重试、验证码解码等）上报
+_active = None
+
+
+def activate(metrics):
+    global _active
+    _active = metrics
+
+
+def count(name, value=1):
+    if _active is not None:
+        _active.count(name, value)
+
+
+def observe(phase, seconds):
+    if _active is not None:
+        _active.observe(phase, seconds)
+
+
+def timer(phase):
+    """qlkit 内部函数的耗时装饰器，上报到当前脚本的 Metrics"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return func(*args, **kwargs)
+            with _active.span(phase):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
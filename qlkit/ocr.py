@@ -0,0 +1,237 @@
+"""OCR 服务客户端"""
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from qlkit.metrics import timer
+
+CAPTCHA_PATTERN = re.compile(r'^[a-zA-Z0-9]{4}$')
+# 识别后端：http 为远程 OCR_SERVICE；template / onnx 在本进程内识别，OCR_MODEL 为模板或模型文件
+OCR_BACKEND = os.environ.get('OCR_BACKEND', 'http').strip().lower()
+OCR_MODEL = os.environ.get('OCR_MODEL', '')
+OCR_CHARSET = os.environ.get('OCR_CHARSET', '')  # ONNX 模型输出对应的字符集
+# 形近字符组，识别结果中的字符容易被误认为同组的其他字符
+CONFUSABLE_GROUPS = ("0OoDQ", "1lIi", "5Ss", "8B", "2Zz", "6Gb", "9gq", "7T")
+CONFUSABLE = {ch: [other for other in group if other != ch] for group in CONFUSABLE_GROUPS for ch in group}
+
+
+def is_captcha_text(text):
+    """判断是否为 4 位字母数字验证码"""
+    return bool(text) and bool(CAPTCHA_PATTERN.match(text))
+
+
+def confusable_variants(text):
+    """形近字符变体：先逐位替换一个字符，再替换两个字符"""
+    singles = [(i, other) for i, ch in enumerate(text) for other in CONFUSABLE.get(ch, ())]
+    for i, other in singles:
+        yield text[:i] + other + text[i + 1:]
+    for a, (i, x) in enumerate(singles):
+        for j, y in singles[a + 1:]:
+            if j != i:
+                yield text[:i] + x + text[i + 1:j] + y + text[j + 1:]
+
+
+def rank_candidates(res, limit=3, ignore_case=False):
+    """
+    由识别结果生成按可能性排序的候选验证码：首选结果、识别后端给出的其他候选、首选结果的形近字符变体
+    只保留 4 位字母数字，ignore_case 时忽略大小写去重（Discuz 校验验证码不区分大小写）
+    """
+    if not res:
+        return []
+    # 过滤无效字符，只取前 4 位
+    texts = [re.sub(r'[^a-zA-Z0-9]', '', item.get("result") or "")[:4] for item in [res] + (res.get("candidates") or [])]
+    ranked, seen = [], set()
+    for text in chain(texts, confusable_variants(texts[0])):
+        key = text.upper() if ignore_case else text
+        if is_captcha_text(text) and key not in seen:
+            seen.add(key)
+            ranked.append(text)
+            if len(ranked) >= limit:
+                break
+    return ranked
+
+
+def image_key(data):
+    """按图片内容生成缓存键"""
+    return hashlib.sha1(data).hexdigest()
+
+
+class OcrCache:
+    """
+    以图片内容哈希为键的有界 LRU 缓存
+    记录识别结果以及验证码校验是否通过，hits/misses 用于评估缓存收益
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """返回可复用的识别结果，已被校验否定的结果视为未命中"""
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None or entry["rejected"]:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, result):
+        with self._lock:
+            self._items[key] = {"result": result, "confirmed": False, "rejected": False}
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def mark(self, key, passed):
+        """记录验证码校验结果"""
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                entry["confirmed"] = passed
+                entry["rejected"] = not passed
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._items),
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class OcrClient:
+    """
+    带连接池的 OCR 客户端
+    多张图片并发提交，识别到置信度不低于 min_confidence 的 4 位结果时提前结束；
+    batch=True 时优先以 {"images": [...]} 一次提交全部图片
+    """
+
+    in_process = False  # 输入为 base64 字符串
+
+    def __init__(self, url, timeout=15, concurrency=4, min_confidence=None, batch=False):
+        self.url = url
+        self.timeout = timeout
+        self.concurrency = max(1, concurrency)
+        self.min_confidence = min_confidence
+        self.batch = batch
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+            return self._executor
+
+    @staticmethod
+    def _parse(data):
+        res = {
+            "result": str(data.get("result", "") or "").strip(),
+            "confidence": float(data.get("confidence", 0) or 0),
+        }
+        # 服务可选返回按可能性排序的候选 {"candidates": ["AB12", ...]} 或 [{"result", "confidence"}]
+        candidates = data.get("candidates")
+        if isinstance(candidates, list):
+            res["candidates"] = [
+                {"result": str(c.get("result", "") or "").strip(), "confidence": float(c.get("confidence", 0) or 0)}
+                if isinstance(c, dict) else {"result": str(c).strip(), "confidence": 0.0}
+                for c in candidates
+            ]
+        return res
+
+    @timer("ocr")
+    def recognize(self, image_b64):
+        """识别单张 base64 图片，失败返回 None"""
+        try:
+            r = self.session.post(self.url, json={"image": image_b64}, timeout=self.timeout)
+            r.raise_for_status()
+            return self._parse(r.json())
+        except Exception as e:
+            print(f"🤖 OCR识别错误: {e}")
+            return None
+
+    @timer("ocr_batch")
+    def recognize_batch(self, images_b64):
+        """批量识别，服务不支持批量格式时返回 None"""
+        try:
+            r = self.session.post(self.url, json={"images": list(images_b64)}, timeout=self.timeout)
+            r.raise_for_status()
+            results = r.json().get("results")
+            if not isinstance(results, list) or len(results) != len(images_b64):
+                return None
+            return [self._parse(item) if isinstance(item, dict) else None for item in results]
+        except Exception as e:
+            print(f"🤖 OCR批量识别失败，改为逐张识别: {e}")
+            return None
+
+    def is_confident(self, item):
+        """结果满足提前结束条件"""
+        return (
+            item is not None
+            and self.min_confidence is not None
+            and is_captcha_text(item["result"])
+            and item["confidence"] >= self.min_confidence
+        )
+
+    def recognize_many(self, images_b64):
+        """
+        识别多张图片，返回与输入顺序对应的结果列表
+        提前结束时尚未发出的请求会被取消，对应位置为 None
+        """
+        images_b64 = list(images_b64)
+        results = [None] * len(images_b64)
+        if not images_b64:
+            return results
+
+        if self.batch and len(images_b64) > 1:
+            batch_results = self.recognize_batch(images_b64)
+            if batch_results is not None:
+                return batch_results
+
+        if self.concurrency == 1 or len(images_b64) == 1:
+            for i, image in enumerate(images_b64):
+                results[i] = self.recognize(image)
+                if self.is_confident(results[i]):
+                    break
+            return results
+
+        futures = {self.executor.submit(self.recognize, image): i for i, image in enumerate(images_b64)}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            if self.is_confident(results[futures[future]]):
+                for pending in futures:
+                    pending.cancel()
+                break
+        return results
+
+
+def create_ocr_client(url, backend=OCR_BACKEND, model=OCR_MODEL, **kwargs):
+    """按 OCR_BACKEND 创建识别后端，进程内后端可直接接收 NumPy 数组或图片字节"""
+    if backend == "http":
+        return OcrClient(url, **kwargs)
+    from qlkit.ocr_local import DEFAULT_CHARSET, OnnxOcrBackend, TemplateOcrBackend
+    if not model:
+        raise ValueError(f"OCR_BACKEND={backend} 需要设置 OCR_MODEL")
+    if backend == "template":
+        return TemplateOcrBackend(model)
+    if backend == "onnx":
+        return OnnxOcrBackend(model, charset=OCR_CHARSET or DEFAULT_CHARSET)
+    raise ValueError(f"未知的 OCR_BACKEND: {backend}")
@@ -0,0 +1,277 @@
+"""
+进程内 OCR 后端：模型每个进程只加载一次，批量接收 NumPy 数组，不经过 base64 与网络
+    TemplateOcrBackend  模板匹配（纯 NumPy），模板由同站点的已标注验证码生成
+    OnnxOcrBackend      ONNX 模型（需安装 onnxruntime）
+
+生成模板：
+    python -m qlkit.ocr_local 样本目录 templates.npz           # 样本文件名以验证码开头，如 AB12_001.gif
+    python -m qlkit.ocr_local 样本目录 templates.npz median    # 由多帧合成图生成，配合 ITJC8_FUSION 使用
+"""
+import base64
+import heapq
+import os
+import sys
+import threading
+from functools import lru_cache
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+from qlkit.captcha import GRAY_WEIGHTS, decode_frames, fuse_frames, otsu_threshold, sharpness
+from qlkit.metrics import timer
+
+CAPTCHA_LENGTH = 4
+CANDIDATES = 5  # 每张图片额外给出的候选结果数
+GLYPH_SIZE = (16, 20)  # 模板字符尺寸（宽, 高）
+DEFAULT_CHARSET = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def to_gray_array(image):
+    """
+    将 OCR 输入转为二维 float32 灰度数组
+    支持 (h, w) / (h, w, 3) 数组、图片字节（动态图片取清晰度最高的一帧）和 base64 字符串
+    """
+    if isinstance(image, str):
+        image = base64.b64decode(image)
+    if isinstance(image, (bytes, bytearray)):
+        img = Image.open(BytesIO(image))
+        frames = np.stack([np.asarray(f.convert("L"), dtype=np.float32) for f in ImageSequence.Iterator(img)])
+        return frames[int(np.argmax(sharpness(frames)))] if len(frames) > 1 else frames[0]
+    array = np.asarray(image)
+    if array.ndim == 3:
+        return array[..., :3].astype(np.float32) @ GRAY_WEIGHTS
+    return array.astype(np.float32)
+
+
+def resize(gray, size):
+    """双线性缩放灰度数组，size 为 (宽, 高)"""
+    return np.asarray(Image.fromarray(gray.astype(np.float32), mode="F").resize(size, Image.BILINEAR))
+
+
+def despeckle(ink):
+    """去掉零星噪点：8 邻域内其他墨迹少于 2 个的像素视为背景（笔画宽度至少 2 像素）"""
+    padded = np.pad(ink, 1)
+    h, w = ink.shape
+    neighbours = sum(
+        padded[1 + dy:1 + dy + h, 1 + dx:1 + dx + w]
+        for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx
+    )
+    return ink & (neighbours >= 2)
+
+
+def column_runs(profile, length):
+    """
+    按列投影把文字切成 length 段：取连续有墨迹的列，
+    段数过多时合并间隔最小的相邻段，过少时在最宽段中部投影最小处切开
+    """
+    ink = np.r_[0, (profile > 0).astype(np.int8), 0]
+    edges = np.flatnonzero(np.diff(ink))
+    runs = [[int(a), int(b)] for a, b in zip(edges[::2], edges[1::2])]
+    if not runs:
+        return []  # 空白帧没有墨迹
+    # 丢掉墨迹远少于其他段的碎片（残留噪点）
+    mass = [profile[a:b].sum() for a, b in runs]
+    if len(runs) > length:
+        runs = [r for r, m in zip(runs, mass) if m >= 0.15 * np.median(mass)]
+    while len(runs) > length:
+        gaps = [runs[i + 1][0] - runs[i][1] for i in range(len(runs) - 1)]
+        i = int(np.argmin(gaps))
+        runs[i:i + 2] = [[runs[i][0], runs[i + 1][1]]]
+    while len(runs) < length:
+        i = max(range(len(runs)), key=lambda k: runs[k][1] - runs[k][0])
+        start, end = runs[i]
+        if end - start < 2:
+            break
+        quarter = max(1, (end - start) // 4)
+        cut = start + quarter + int(np.argmin(profile[start + quarter:end - quarter])) if end - start > 3 else start + 1
+        runs[i:i + 1] = [[start, cut], [cut, end]]
+    return runs
+
+
+def segment(gray, length=CAPTCHA_LENGTH):
+    """
+    二值化、去噪点后按列投影切分字符，返回 (length, 高, 宽) 的字符图（文字为 1）
+    每个字符裁到自身墨迹范围后缩放到统一尺寸，消除位置偏移；空白或纯色帧返回全 0
+    """
+    if gray.min() == gray.max():
+        ink = np.zeros(gray.shape, dtype=np.float32)
+    else:
+        ink = despeckle(gray <= otsu_threshold(gray)).astype(np.float32)
+    glyphs = []
+    for left, right in column_runs(ink.sum(axis=0), length):
+        part = ink[:, left:right]
+        rows = np.flatnonzero(part.sum(axis=1))
+        glyphs.append(resize(part[rows[0]:rows[-1] + 1], GLYPH_SIZE))
+    while len(glyphs) < length:
+        glyphs.append(np.zeros((GLYPH_SIZE[1], GLYPH_SIZE[0]), dtype=np.float32))
+    return np.stack(glyphs)
+
+
+def normalize(vectors):
+    """逐行去均值并归一化，点积即为相关系数"""
+    vectors = vectors - vectors.mean(axis=1, keepdims=True)
+    norm = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norm == 0, 1, norm)
+
+
+def top_sequences(scores, labels, limit=CANDIDATES):
+    """
+    由逐位分数 (位置, 字符) 求总分最高的 limit 个字符串（按总分从高到低），
+    返回 [{"result", "confidence"}]，置信度为各位分数的平均值
+    """
+    order = np.argsort(-scores, axis=1)[:, :limit]
+    picked = np.take_along_axis(scores, order, axis=1)
+    start = (0,) * len(scores)
+    heap, seen, results = [(-picked[:, 0].sum(), start)], {start}, []
+    while heap and len(results) < limit:
+        total, ranks = heapq.heappop(heap)
+        text = "".join(labels[order[pos, r]] for pos, r in enumerate(ranks))
+        results.append({"result": text, "confidence": round(float(-total / len(ranks)), 3)})
+        for pos in range(len(ranks)):
+            if ranks[pos] + 1 < order.shape[1]:
+                following = ranks[:pos] + (ranks[pos] + 1,) + ranks[pos + 1:]
+                if following not in seen:
+                    seen.add(following)
+                    heapq.heappush(heap, (total + picked[pos, ranks[pos]] - picked[pos, following[pos]], following))
+    return results
+
+
+class LocalOcrBackend:
+    """进程内后端的公共接口，与 OcrClient 的 recognize / recognize_many 一致"""
+
+    in_process = True
+
+    def recognize_arrays(self, arrays):
+        """批量识别灰度数组，返回 [{"result", "confidence"}]"""
+        raise NotImplementedError
+
+    def recognize(self, image):
+        return self.recognize_many([image])[0]
+
+    @timer("ocr_local")
+    def recognize_many(self, images):
+        """一次前向计算识别全部图片，与输入顺序对应；整批出错时逐张重试，只有出错的图片为 None"""
+        images = list(images)
+        if not images:
+            return []
+        try:
+            return self.recognize_arrays([to_gray_array(image) for image in images])
+        except Exception as e:
+            if len(images) == 1:
+                print(f"🤖 本地OCR识别错误: {e}")
+                return [None]
+        return [self.recognize_many([image])[0] for image in images]
+
+
+@lru_cache(maxsize=None)
+def load_templates(path):
+    """读取模板文件（同一进程内只读取一次）"""
+    data = np.load(path)
+    return normalize(data["glyphs"].astype(np.float32)), [str(label) for label in data["labels"]]
+
+
+def sample_image(data, fusion=""):
+    """模板样本：设置 fusion 时为多帧合成图，否则为原始图片（动态图片取最清晰的一帧）"""
+    if not fusion:
+        return data
+    frames = decode_frames(data)
+    return fuse_frames(frames, fusion) if len(frames) > 1 else frames[0]
+
+
+def build_templates(samples):
+    """由 [(图片, 验证码)] 生成每个字符的平均字形，返回 (glyphs, labels)"""
+    sums, counts = {}, {}
+    for image, code in samples:
+        for ch, glyph in zip(code, segment(to_gray_array(image), len(code))):
+            sums[ch] = sums.get(ch, 0) + glyph.ravel()
+            counts[ch] = counts.get(ch, 0) + 1
+    labels = sorted(sums)
+    glyphs = np.stack([sums[ch] / counts[ch] for ch in labels]).astype(np.float32)
+    return glyphs, labels
+
+
+class TemplateOcrBackend(LocalOcrBackend):
+    """
+    模板匹配：字符图与各字符模板求相关系数，置信度为各字符最高相关系数的平均值
+    candidates 为其他较可能的组合（按平均相关系数排序）
+    """
+
+    def __init__(self, path, length=CAPTCHA_LENGTH):
+        self.templates, self.labels = load_templates(path)
+        self.length = length
+
+    def recognize_arrays(self, arrays):
+        glyphs = np.concatenate([segment(gray, self.length) for gray in arrays])
+        scores = (normalize(glyphs.reshape(len(glyphs), -1)) @ self.templates.T).clip(0, 1)
+        results = []
+        for image_glyphs, image_scores in zip(glyphs.reshape(len(arrays), self.length, -1),
+                                              scores.reshape(len(arrays), self.length, -1)):
+            if not image_glyphs.any():
+                results.append({"result": "", "confidence": 0.0, "candidates": []})  # 空白帧
+                continue
+            ranked = top_sequences(image_scores, self.labels, CANDIDATES + 1)
+            results.append({**ranked[0], "candidates": ranked[1:]})
+        return results
+
+
+_onnx_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def load_onnx(path):
+    try:
+        import onnxruntime
+    except ImportError:
+        raise RuntimeError("OCR_BACKEND=onnx 需要安装 onnxruntime") from None
+    with _onnx_lock:
+        return onnxruntime.InferenceSession(path, providers=["CPUExecutionProvider"])
+
+
+class OnnxOcrBackend(LocalOcrBackend):
+    """
+    ONNX 模型：输入 (n, 1, 高, 宽) 的 0~1 灰度，输出 (n, 位置, 字符集) 的分数
+    位置数等于验证码长度时逐位取最大值并给出其他高分组合作为候选，否则按 CTC 贪心解码（0 为空白）
+    """
+
+    def __init__(self, path, charset=DEFAULT_CHARSET, length=CAPTCHA_LENGTH):
+        self.session = load_onnx(path)
+        self.input = self.session.get_inputs()[0]
+        height, width = self.input.shape[2:4]
+        self.size = (int(width) if isinstance(width, int) else 100, int(height) if isinstance(height, int) else 36)
+        self.charset = charset
+        self.length = length
+
+    def recognize_arrays(self, arrays):
+        batch = np.stack([resize(gray, self.size) / 255.0 for gray in arrays])[:, None].astype(np.float32)
+        logits = self.session.run(None, {self.input.name: batch})[0]
+        logits = logits - logits.max(axis=-1, keepdims=True)
+        probs = np.exp(logits) / np.exp(logits).sum(axis=-1, keepdims=True)
+        best = probs.argmax(axis=-1)
+        results = []
+        for row, p, image_probs in zip(best, probs.max(axis=-1), probs):
+            if probs.shape[1] == self.length:
+                ranked = top_sequences(image_probs, self.charset, CANDIDATES + 1)
+                results.append({**ranked[0], "candidates": ranked[1:]})
+                continue
+            keep = (row != 0) & np.r_[True, row[1:] != row[:-1]]
+            text, kept = "".join(self.charset[i - 1] for i in row[keep]), p[keep]
+            results.append({"result": text, "confidence": round(float(kept.mean()) if len(kept) else 0.0, 3)})
+        return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        print("用法: python -m qlkit.ocr_local 样本目录 输出.npz [median|min|max]")
+        sys.exit(1)
+    directory, output = sys.argv[1:3]
+    fusion = sys.argv[3] if len(sys.argv) == 4 else ""
+    samples = []
+    for name in sorted(os.listdir(directory)):
+        code = os.path.splitext(name)[0].split("_")[0]
+        if len(code) == CAPTCHA_LENGTH and code.isalnum():
+            with open(os.path.join(directory, name), "rb") as f:
+                samples.append((sample_image(f.read(), fusion), code))
+    glyphs, labels = build_templates(samples)
+    np.savez_compressed(output, glyphs=glyphs, labels=np.array(labels))
+    print(f"✅ 由 {len(samples)} 张样本生成 {len(labels)} 个字符模板: {output}")
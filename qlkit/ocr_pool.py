@@ -0,0 +1,146 @@
+"""
+验证码识别进程池：GIF 解码、帧清晰度排序、编码与（本地）OCR 都是 CPU 密集操作，
+放到多个进程中执行以绕过 GIL；每个进程启动时创建一次识别后端（本地模型只加载一次），
+所有站点、账户的验证码任务共用同一个池，排队任务数达到上限时提交方阻塞等待
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from qlkit import metrics
+from qlkit.captcha import decode_frames, encode_png_base64, fuse_frames, rank_frames, sharpness
+from qlkit.ocr import OCR_BACKEND, OCR_MODEL, create_ocr_client, is_captcha_text
+
+OCR_WORKERS = int(os.environ.get('OCR_WORKERS', '0'))  # 识别进程数，0 为在本进程内识别
+OCR_QUEUE = int(os.environ.get('OCR_QUEUE', '0'))  # 最多同时排队的任务数，0 为进程数的 2 倍
+# 多帧合成图的结果达到该置信度才不再逐帧识别（设置 OCR_MIN_CONFIDENCE 时以其为准）
+FUSION_CONFIDENCE = float(os.environ.get('OCR_FUSION_CONFIDENCE', '0.8'))
+
+
+def solve_frames(client, data, top_k=0, fusion=None, min_confidence=None):
+    """
+    解码（动态）验证码，按清晰度取前 top_k 帧识别，返回各帧的候选结果（按清晰度排序）
+    设置 fusion（median/min/max）时先识别多帧合成图（frame_index 为 -1），
+    得到4位结果且置信度不低于 min_confidence（未设置时为 FUSION_CONFIDENCE）时不再逐帧识别
+    """
+    frames = decode_frames(data)
+    encode = (lambda frame: frame) if client.in_process else encode_png_base64
+    candidates = []
+    if fusion and len(frames) > 1:
+        composite = fuse_frames(frames, fusion)
+        res = client.recognize(encode(composite))
+        if res is not None:
+            candidates.append({"frame_index": -1, "sharpness": float(sharpness(composite[None])[0]), **res})
+            threshold = FUSION_CONFIDENCE if min_confidence is None else min_confidence
+            if is_captcha_text(res["result"]) and res["confidence"] >= threshold:
+                return candidates
+    ranked = rank_frames(frames, top_k)
+    results = client.recognize_many(encode(frames[i]) for i, _ in ranked)
+    return candidates + [
+        {"frame_index": i, "sharpness": score, **res}
+        for (i, score), res in zip(ranked, results)
+        if res is not None
+    ]
+
+
+def solve_workers():
+    """流水线识别阶段的默认线程数：进程池时为排队上限，HTTP 识别为 4，进程内识别受 GIL 限制为 1"""
+    if OCR_WORKERS > 0:
+        return OCR_QUEUE if OCR_QUEUE > 0 else OCR_WORKERS * 2
+    return 4 if OCR_BACKEND == "http" else 1
+
+
+# ---- 子进程 ----
+_client = None
+
+
+def _init_worker(url, backend, model, options):
+    """子进程初始化：创建识别后端（加载模型）"""
+    global _client
+    metrics.activate(None)  # 子进程的耗时无法汇总到父进程的 Metrics
+    _client = create_ocr_client(url, backend=backend, model=model, **options)
+
+
+def _ready():
+    return os.getpid()
+
+
+def _solve_frames(data, top_k, fusion, min_confidence):
+    start = time.perf_counter()
+    return solve_frames(_client, data, top_k, fusion, min_confidence), time.perf_counter() - start
+
+
+def _recognize(image):
+    start = time.perf_counter()
+    return _client.recognize(image), time.perf_counter() - start
+
+
+class OcrPool:
+    """
+    用法：
+        pool = OcrPool(OCR_SERVICE, workers=4).start()   # 在启动其他线程之前调用
+        candidates = pool.solve_frames(gif_bytes, top_k=3)
+        result = pool.recognize(jpeg_bytes 或 base64)
+        pool.close()
+    """
+
+    def __init__(self, url, workers=OCR_WORKERS, queue_size=OCR_QUEUE, backend=OCR_BACKEND, model=OCR_MODEL, **options):
+        self.workers = max(1, workers)
+        # fork 启动不会重新执行脚本的模块级代码；没有 fork 的平台使用默认方式
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(url, backend, model, options),
+        )
+        self.slots = threading.BoundedSemaphore(queue_size if queue_size > 0 else self.workers * 2)
+
+    def start(self):
+        """立即启动全部子进程并完成初始化，之后提交的任务不再等待模型加载"""
+        for future in [self.executor.submit(_ready) for _ in range(self.workers)]:
+            future.result()
+        print(f"🧵 OCR 进程池已启动 {self.workers} 个进程")
+        return self
+
+    def _run(self, func, *args):
+        self.slots.acquire()  # 排队任务已满时阻塞，避免验证码堆积在内存中
+        start = time.perf_counter()
+        try:
+            future = self.executor.submit(func, *args)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        result, worked = future.result()
+        total = time.perf_counter() - start
+        metrics.observe("ocr_pool", total)
+        metrics.observe("ocr_pool_wait", max(0.0, total - worked))
+        return result
+
+    def solve_frames(self, data, top_k=0, fusion=None, min_confidence=None):
+        return self._run(_solve_frames, data, top_k, fusion, min_confidence)
+
+    def recognize(self, image):
+        return self._run(_recognize, image)
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_pool(url, **options):
+    """进程内所有脚本/站点共用的识别进程池，OCR_WORKERS 未设置时返回 None"""
+    global _shared
+    if OCR_WORKERS <= 0:
+        return None
+    with _shared_lock:
+        if _shared is None:
+            _shared = OcrPool(url, **options)
+        return _shared
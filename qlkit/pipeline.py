@@ -0,0 +1,280 @@
+"""
+分阶段登录流水线：登录拆成 表单 -> 验证码下载 -> 识别 -> 校验 -> 提交 等阶段，阶段之间用有界队列连接，
+每个阶段有独立的线程数，一个账户下载页面时另一个账户的验证码可以同时识别，
+批量登录的吞吐取决于最慢的阶段，而不是各阶段耗时之和
+
+用法：
+    pipeline = Pipeline("xsijishe", [
+        Stage("form", stage_form, workers=4),
+        Stage("solve", stage_solve, workers=2),
+        ...
+    ])
+    for attempt in retry_policy.attempts():                   # 在账户线程中调用，退避等待不占用阶段线程
+        session = pipeline.run(Job(attempt=attempt, username=..., password=...))
+    pipeline.close()
+    pipeline.report()
+
+一个任务是一次登录尝试。阶段函数接收 job，返回 None 进入下一阶段，返回 DONE 提前结束（本次尝试失败或已得到结果），
+结果写入 job.result，抛出的异常由 run() 重新抛出
+未开启流水线（QL_PIPELINE 为空）时各阶段在账户线程中依次执行，行为与原来的串行登录一致
+"""
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+from qlkit.retry import bind_deadline, current_deadline
+
+# 分阶段登录流水线："1" 按脚本默认线程数开启，或 "form:4,solve:2" 指定各阶段线程数，空为不开启
+PIPELINE = os.environ.get('QL_PIPELINE', '')
+
+DONE = "done"
+
+
+def parse_workers(spec):
+    """解析 QL_PIPELINE，返回 {阶段名: 线程数}，未开启时返回 None"""
+    spec = (spec or "").strip()
+    if not spec or spec == "0":
+        return None
+    workers = {}
+    for item in spec.split(","):
+        name, _, count = item.partition(":")
+        if name.strip() and count.strip().isdigit():
+            workers[name.strip()] = int(count)
+    return workers
+
+
+class StageQueue:
+    """阶段前的有界队列，队列满时上一阶段阻塞等待（背压）"""
+
+    def __init__(self, capacity):
+        self.capacity = max(1, capacity)
+        self.items = deque()
+        self.closed = False
+        self.max_depth = 0
+        self.depth_sum = 0
+        self.depth_samples = 0
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            while len(self.items) >= self.capacity and not self.closed:
+                self._cond.wait()
+            self.items.append(item)
+            depth = len(self.items)
+            self.max_depth = max(self.max_depth, depth)
+            self.depth_sum += depth
+            self.depth_samples += 1
+            self._cond.notify_all()
+
+    def get(self):
+        """取出一个任务，队列关闭且为空时返回 None"""
+        with self._cond:
+            while not self.items and not self.closed:
+                self._cond.wait()
+            if not self.items:
+                return None
+            item = self.items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def reset_stats(self):
+        with self._cond:
+            self.max_depth = len(self.items)
+            self.depth_sum = self.depth_samples = 0
+
+
+class Job:
+    """一个账户的一次登录尝试，各阶段在其上读写状态（formhash、验证码等）"""
+
+    def __init__(self, **fields):
+        self.result = None
+        self.error = None
+        self.__dict__.update(fields)
+        # 阶段线程沿用账户线程的时间预算与日志缓存
+        self.deadline = current_deadline()
+        self.output = getattr(sys.stdout, "current", lambda: None)()
+        self.queued = 0.0
+        self.finished = threading.Event()
+
+
+class Stage:
+    """流水线的一个阶段：名称、处理函数、线程数"""
+
+    def __init__(self, name, func, workers=1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue = None
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.processed = 0
+        self.errors = 0
+        self.busy = 0.0  # 阶段函数执行耗时合计
+        self.wait = 0.0  # 任务在本阶段队列中的排队耗时合计
+        self.blocked = 0.0  # 下一阶段队列已满时的等待耗时合计
+
+    def record(self, busy=0.0, wait=0.0, blocked=0.0, error=False):
+        with self._lock:
+            self.busy += busy
+            self.wait += wait
+            self.blocked += blocked
+            if busy:
+                self.processed += 1
+                self.errors += int(error)
+
+
+class Pipeline:
+    """按阶段顺序处理登录任务，spec 见 QL_PIPELINE，capacity 为各阶段队列容量（0 为线程数的 2 倍）"""
+
+    def __init__(self, name, stages, spec=PIPELINE, capacity=0):
+        self.name = name
+        self.stages = list(stages)
+        workers = parse_workers(spec)
+        self.enabled = workers is not None
+        for stage in self.stages:
+            if self.enabled and workers.get(stage.name):
+                stage.workers = workers[stage.name]
+            stage.queue = StageQueue(capacity or stage.workers * 2)
+        self.threads = []
+        self.started = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """启动各阶段线程（首次 run 时自动调用）"""
+        with self._lock:
+            if self.started is not None:
+                return self
+            self.started = time.perf_counter()
+            if self.enabled:
+                for i, stage in enumerate(self.stages):
+                    for n in range(stage.workers):
+                        thread = threading.Thread(
+                            target=self._work, args=(i,), name=f"{self.name}-{stage.name}-{n}", daemon=True
+                        )
+                        thread.start()
+                        self.threads.append(thread)
+                plan = "，".join(f"{s.name}×{s.workers}" for s in self.stages)
+                print(f"🏭 登录流水线 [{self.name}] 已启动: {plan}")
+        return self
+
+    def run(self, job):
+        """处理一个任务并等待完成，返回 job.result"""
+        self.start()
+        if self.enabled:
+            job.queued = time.perf_counter()
+            self.stages[0].queue.put(job)
+            job.finished.wait()
+        else:
+            i = 0
+            while i is not None:
+                i = self._process(i, job)
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _process(self, i, job):
+        """执行第 i 个阶段，返回下一个阶段的序号，结束时返回 None"""
+        stage = self.stages[i]
+        stream = sys.stdout
+        redirect = getattr(stream, "redirect", None)
+        output = redirect(job.output) if redirect and job.output is not None else nullcontext()
+        start = time.perf_counter()
+        with bind_deadline(job.deadline), output:
+            try:
+                route = stage.func(job)
+            except Exception as e:
+                job.error, route = e, DONE
+        stage.record(busy=max(time.perf_counter() - start, 1e-9), error=job.error is not None)
+        if route == DONE or i + 1 == len(self.stages):
+            return None
+        return i + 1
+
+    def _work(self, i):
+        stage = self.stages[i]
+        while True:
+            job = stage.queue.get()
+            if job is None:
+                return
+            stage.record(wait=time.perf_counter() - job.queued)
+            following = self._process(i, job)
+            if following is None:
+                job.finished.set()
+                continue
+            start = job.queued = time.perf_counter()
+            self.stages[following].queue.put(job)
+            stage.record(blocked=time.perf_counter() - start)
+
+    def close(self):
+        """停止各阶段线程，队列中已有的任务会先处理完"""
+        for stage in self.stages:
+            stage.queue.close()
+            for thread in self.threads:
+                if thread.name.startswith(f"{self.name}-{stage.name}-"):
+                    thread.join()
+
+    def reset(self):
+        """清空统计（压测时每轮开始前调用）"""
+        self.started = time.perf_counter() if self.started is not None else None
+        for stage in self.stages:
+            stage.reset()
+            stage.queue.reset_stats()
+
+    def stats(self):
+        """各阶段的处理数、吞吐、平均耗时、排队耗时、队列深度与线程利用率"""
+        elapsed = max(time.perf_counter() - self.started, 1e-9) if self.started is not None else 0.0
+        result = []
+        for stage in self.stages:
+            queue = stage.queue
+            processed = stage.processed
+            result.append({
+                "stage": stage.name,
+                "workers": stage.workers if self.enabled else 0,
+                "processed": processed,
+                "errors": stage.errors,
+                "throughput": processed / elapsed if elapsed else 0.0,
+                "busy": stage.busy,
+                "avg": stage.busy / processed if processed else 0.0,
+                "avg_wait": stage.wait / processed if processed else 0.0,
+                "blocked": stage.blocked,
+                "max_depth": queue.max_depth,
+                "avg_depth": queue.depth_sum / queue.depth_samples if queue.depth_samples else 0.0,
+                "utilization": stage.busy / (stage.workers * elapsed) if self.enabled and elapsed else None,
+            })
+        return result
+
+    def bottleneck(self):
+        """线程利用率最高的阶段（未开启流水线时为总耗时最长的阶段）"""
+        stats = [s for s in self.stats() if s["processed"]]
+        if not stats:
+            return None
+        return max(stats, key=lambda s: s["utilization"] if s["utilization"] is not None else s["busy"])
+
+    def report(self):
+        """打印各阶段统计"""
+        stats = self.stats()
+        if not any(s["processed"] for s in stats):
+            return
+        mode = "流水线" if self.enabled else "串行（未开启流水线）"
+        print(f"\n🏭 登录阶段统计 [{self.name}] {mode}:")
+        print(f"   {'阶段':<10}{'线程':>5}{'处理':>7}{'吞吐(/s)':>10}{'平均(ms)':>10}{'排队(ms)':>10}"
+              f"{'队列峰值':>9}{'平均队列':>9}{'利用率':>8}")
+        for s in stats:
+            utilization = f"{s['utilization']:.0%}" if s["utilization"] is not None else "-"
+            print(f"   {s['stage']:<10}{s['workers'] or '-':>5}{s['processed']:>7}{s['throughput']:>10.1f}"
+                  f"{s['avg'] * 1000:>10.1f}{s['avg_wait'] * 1000:>10.1f}{s['max_depth']:>9}"
+                  f"{s['avg_depth']:>9.1f}{utilization:>8}")
+        slowest = self.bottleneck()
+        if slowest is not None:
+            detail = f"利用率 {slowest['utilization']:.0%}" if slowest["utilization"] is not None \
+                else f"合计 {slowest['busy']:.2f}s"
+            print(f"🐢 瓶颈阶段: {slowest['stage']}（{detail}），可调大 QL_PIPELINE 中该阶段的线程数")
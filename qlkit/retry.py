@@ -0,0 +1,269 @@
+"""
+通用重试策略：指数退避 + 随机抖动、单账户/整次运行的时间预算、失败类型区分
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from qlkit import metrics
+
+RETRY = "retry"  # 临时错误，退避后重试
+PERMANENT = "permanent"  # 永久错误（密码错误等），立即放弃
+RATE_LIMITED = "rate_limited"  # 被限流，按较长间隔重试
+
+RUN_BUDGET = float(os.environ.get('QL_RUN_BUDGET', '0'))  # 整次运行的时间预算（秒），0 为不限制
+ACCOUNT_BUDGET = float(os.environ.get('QL_ACCOUNT_BUDGET', '0'))  # 单个账户的时间预算（秒），0 为不限制
+
+
+class Deadline:
+    """截止时间，可嵌套：剩余时间取自身与上级中较小者"""
+
+    def __init__(self, seconds=0, parent=None):
+        self.expires = time.monotonic() + seconds if seconds and seconds > 0 else None
+        self.parent = parent
+
+    def remaining(self):
+        """剩余秒数，不限制时返回 None"""
+        values = []
+        if self.expires is not None:
+            values.append(self.expires - time.monotonic())
+        if self.parent is not None:
+            parent = self.parent.remaining()
+            if parent is not None:
+                values.append(parent)
+        return max(0.0, min(values)) if values else None
+
+    @property
+    def expired(self):
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def timeout(self, default):
+        """请求超时不超过剩余时间"""
+        remaining = self.remaining()
+        return default if remaining is None else max(0.1, min(default, remaining))
+
+
+RUN_DEADLINE = Deadline(RUN_BUDGET)
+_local = threading.local()
+
+
+def current_deadline():
+    """当前线程正在处理的账户的截止时间，不在账户内时为整次运行的截止时间"""
+    return getattr(_local, "deadline", None) or RUN_DEADLINE
+
+
+@contextmanager
+def account_deadline(seconds=ACCOUNT_BUDGET):
+    """为当前线程设置单账户时间预算"""
+    previous = getattr(_local, "deadline", None)
+    _local.deadline = Deadline(seconds, parent=RUN_DEADLINE)
+    try:
+        yield _local.deadline
+    finally:
+        _local.deadline = previous
+
+
+@contextmanager
+def bind_deadline(deadline):
+    """在当前线程沿用其他线程的截止时间（流水线阶段线程处理某个账户的任务时）"""
+    previous = getattr(_local, "deadline", None)
+    _local.deadline = deadline
+    try:
+        yield deadline
+    finally:
+        _local.deadline = previous
+
+
+def classify_exception(error):
+    """按异常类型区分失败"""
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return classify_status(status) or PERMANENT
+    name = type(error).__name__
+    if "Timeout" in name or "Connect" in name or "Connection" in name or "Network" in name:
+        return RETRY
+    if isinstance(error, (ValueError, KeyError, TypeError)):
+        return PERMANENT
+    return RETRY
+
+
+def classify_send_exception(error):
+    """非幂等请求（签到 POST 等）的异常：只有请求确定没有发出（连接失败）时才可重试，读超时等服务端可能已处理"""
+    name = type(error).__name__
+    if name in ("ConnectError", "ConnectTimeout"):
+        return RETRY
+    text = str(error)
+    if name == "ConnectionError" and ("NewConnectionError" in text or "NameResolutionError" in text):
+        return RETRY
+    return PERMANENT
+
+
+def classify_status(status):
+    """按 HTTP 状态码区分失败，可接受的状态码返回 None"""
+    if status == 429:
+        return RATE_LIMITED
+    if status in (408, 500, 502, 503, 504, 520, 521, 522, 524):
+        return RETRY
+    return None
+
+
+def message_classifier(permanent=(), rate_limited=()):
+    """根据响应文本中的关键字区分失败，未命中关键字视为可重试"""
+    def classify(text):
+        text = text or ""
+        if any(word in text for word in rate_limited):
+            return RATE_LIMITED
+        if any(word in text for word in permanent):
+            return PERMANENT
+        return RETRY
+    return classify
+
+
+class Attempt:
+    """一次尝试，循环体内调用 fail() 标记失败类型"""
+
+    def __init__(self, number, deadline):
+        self.number = number
+        self.deadline = deadline
+        self.outcome = None
+
+    def fail(self, outcome=RETRY):
+        self.outcome = outcome
+        return outcome
+
+    def timeout(self, default):
+        return self.deadline.timeout(default)
+
+
+class RetryPolicy:
+    """
+    用法：
+        for attempt in policy.attempts():
+            ...
+            if 密码错误:
+                attempt.fail(PERMANENT)
+                break
+            attempt.fail(RETRY)   # 下次迭代前自动退避
+    """
+
+    def __init__(self, max_attempts=3, base=1.0, cap=8.0, rate_limit_delay=15.0, idempotent=True):
+        self.max_attempts = max_attempts
+        # 非幂等请求（签到）只在连接失败或被限流（429）时重试，5xx 与读超时时服务端可能已经记录
+        self.idempotent = idempotent
+        self.base = base
+        self.cap = cap
+        self.rate_limit_delay = rate_limit_delay
+
+    def delay(self, number, outcome):
+        """第 number 次失败后的等待时间（full jitter）"""
+        backoff = random.uniform(0, min(self.cap, self.base * 2 ** (number - 1)))
+        if outcome == RATE_LIMITED:
+            return self.rate_limit_delay + backoff
+        return backoff
+
+    def attempts(self, deadline=None):
+        deadline = deadline or current_deadline()
+        for number in range(1, self.max_attempts + 1):
+            if deadline.expired:
+                print("⏱️ 已超出时间预算，停止重试")
+                return
+            attempt = Attempt(number, deadline)
+            yield attempt
+            wait = self._backoff(attempt)
+            if wait is None:
+                return
+            time.sleep(wait)
+
+    async def attempts_async(self, deadline=None):
+        """attempts 的协程版本，退避等待不阻塞事件循环"""
+        deadline = deadline or current_deadline()
+        for number in range(1, self.max_attempts + 1):
+            if deadline.expired:
+                print("⏱️ 已超出时间预算，停止重试")
+                return
+            attempt = Attempt(number, deadline)
+            yield attempt
+            wait = self._backoff(attempt)
+            if wait is None:
+                return
+            await asyncio.sleep(wait)
+
+    def _backoff(self, attempt):
+        """本次尝试之后的等待时间，不再重试时返回 None"""
+        outcome = attempt.outcome or RETRY
+        if outcome == PERMANENT or attempt.number == self.max_attempts:
+            return None
+        wait = self.delay(attempt.number, outcome)
+        remaining = attempt.deadline.remaining()
+        if remaining is not None and wait >= remaining:
+            print("⏱️ 剩余时间不足以再次重试")
+            return None
+        metrics.count("retries")
+        metrics.observe("retry_wait", wait)
+        return wait
+
+    def call(self, func, deadline=None):
+        """
+        执行单个请求函数，遇到可重试的异常或状态码时退避重试
+        返回最后一次的结果；全部失败时抛出最后一次异常
+        """
+        result, error = None, None
+        for attempt in self.attempts(deadline):
+            try:
+                result, error = func(), None
+            except Exception as e:
+                result, error = None, e
+            if _settle(attempt, result, error, self.idempotent):
+                return result
+        return _last(result, error)
+
+    async def call_async(self, func, deadline=None):
+        """call 的协程版本，func 返回 awaitable"""
+        result, error = None, None
+        async for attempt in self.attempts_async(deadline):
+            try:
+                result, error = await func(), None
+            except Exception as e:
+                result, error = None, e
+            if _settle(attempt, result, error, self.idempotent):
+                return result
+        return _last(result, error)
+
+
+def _settle(attempt, result, error, idempotent=True):
+    """按异常或状态码标记本次尝试，成功时返回 True"""
+    if error is not None:
+        attempt.fail(classify_exception(error) if idempotent else classify_send_exception(error))
+        return False
+    outcome = classify_status(getattr(result, "status_code", 200))
+    if outcome is None:
+        return True
+    if outcome == RETRY and not idempotent:
+        outcome = PERMANENT  # 非幂等请求遇到 5xx 不重试，返回该响应由调用方处理
+    attempt.fail(outcome)
+    return False
+
+
+def _last(result, error):
+    """全部尝试结束后返回最后一次的结果或抛出最后一次异常"""
+    if error is not None:
+        raise error
+    if result is None:
+        raise TimeoutError("已超出时间预算")
+    return result
+
+
+DEFAULT_POLICY = RetryPolicy(
+    max_attempts=int(os.environ.get('QL_MAX_RETRY', '3')),
+    base=float(os.environ.get('QL_RETRY_BASE', '1')),
+)
+# 签到等非幂等请求
+SIGN_POLICY = RetryPolicy(
+    max_attempts=DEFAULT_POLICY.max_attempts,
+    base=DEFAULT_POLICY.base,
+    idempotent=False,
+)
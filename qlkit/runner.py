@@ -0,0 +1,221 @@
+"""多账户并发执行器"""
+import io
+import sys
+import threading
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from qlkit import metrics
+from qlkit.retry import account_deadline
+
+
+class HostLimiter:
+    """按主机限制同时进行的请求数，limit<=0 表示不限制"""
+
+    def __init__(self, limit=0):
+        self.limit = limit
+        self._sems = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._sems:
+                self._sems[host] = threading.BoundedSemaphore(self.limit)
+            return self._sems[host]
+
+    @contextmanager
+    def slot(self, url):
+        """占用目标主机的一个并发名额"""
+        if self.limit <= 0:
+            yield
+            return
+        sem = self._semaphore(urlsplit(url).netloc)
+        with sem:
+            yield
+
+    def mount(self, session):
+        """为 requests.Session 挂载限流适配器"""
+        if self.limit <= 0:
+            return session
+        from requests.adapters import HTTPAdapter
+
+        limiter = self
+
+        class _LimitedAdapter(HTTPAdapter):
+            def send(self, request, **kwargs):
+                with limiter.slot(request.url):
+                    return super().send(request, **kwargs)
+
+        adapter = _LimitedAdapter()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+
+class _ThreadBufferedStdout:
+    """并发模式下按线程缓存输出，账户处理完后整段打印，避免日志交错"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def begin(self):
+        self._local.buffer = io.StringIO()
+
+    def end(self):
+        buffer = getattr(self._local, "buffer", None)
+        self._local.buffer = None
+        if buffer is not None:
+            with self._lock:
+                self._stream.write(buffer.getvalue())
+                self._stream.flush()
+
+    def current(self):
+        """当前线程的输出缓存"""
+        return getattr(self._local, "buffer", None)
+
+    @contextmanager
+    def redirect(self, buffer):
+        """在其他线程中把输出写入指定账户的缓存（流水线阶段线程），保证单个账户的日志连续"""
+        previous = getattr(self._local, "buffer", None)
+        self._local.buffer = buffer
+        try:
+            yield
+        finally:
+            self._local.buffer = previous
+
+    def write(self, text):
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is not None:
+            return buffer.write(text)
+        with self._lock:
+            return self._stream.write(text)
+
+    def flush(self):
+        self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class RunSummary:
+    """汇总每个账户的执行结果"""
+
+    def __init__(self):
+        self.results = []
+        self.deferred = []
+        self.started = time.time()
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def add(self, name, ok, elapsed, error=None):
+        with self._lock:
+            self.results.append({"name": name, "ok": ok, "elapsed": elapsed, "error": error})
+
+    def defer(self, name):
+        """记录因时间预算不足而未执行的账户"""
+        with self._lock:
+            self.deferred.append(name)
+
+    @property
+    def success(self):
+        return [r for r in self.results if r["ok"]]
+
+    @property
+    def failed(self):
+        return [r for r in self.results if not r["ok"]]
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.time()) - self.started
+
+    def report(self):
+        """打印汇总信息"""
+        total = len(self.results)
+        print(f"\n📊 执行汇总: 成功 {len(self.success)}/{total}，总耗时 {self.elapsed:.2f}s")
+        if self.results:
+            slowest = max(self.results, key=lambda r: r["elapsed"])
+            print(f"🐢 最慢账户: {slowest['name']} ({slowest['elapsed']:.2f}s)")
+        for r in self.failed:
+            reason = f"：{r['error']}" if r["error"] else ""
+            print(f"❌ 失败账户: {r['name']}{reason}")
+        if self.deferred:
+            print(f"⏭️ 时间预算不足，延后 {len(self.deferred)} 个账户: {', '.join(self.deferred)}")
+
+
+def run_accounts(accounts, worker, workers=1, name=None, delay=None, scheduler=None):
+    """
+    执行多账户任务并返回 RunSummary
+    workers<=1 时保持串行执行，delay 为串行模式下账户间的随机延迟区间 (min, max)
+    传入 scheduler 时按预估耗时排序，剩余时间不足的账户记为延后
+    """
+    name = name or (lambda account: account.get("username", "?"))
+    summary = RunSummary()
+    if scheduler:
+        accounts = scheduler.order(accounts)
+
+    def defer(account):
+        print(f"⏭️ 账户 {name(account)} 预计无法在剩余时间内完成，延后处理")
+        summary.defer(name(account))
+
+    def admit(account):
+        if scheduler and not scheduler.admit(account):
+            defer(account)
+            return False
+        return True
+
+    def run_one(account):
+        if admit(account):
+            execute(account)
+
+    def execute(account):
+        start = time.time()
+        try:
+            with account_deadline():
+                ok = bool(worker(account))
+            summary.add(name(account), ok, time.time() - start)
+        except Exception as e:
+            print(f"❌ 账户 {name(account)} 执行异常: {e}")
+            summary.add(name(account), False, time.time() - start, str(e))
+        finally:
+            metrics.observe("account", time.time() - start)
+            if scheduler:
+                scheduler.record(account, time.time() - start)
+
+    if workers <= 1:
+        for index, account in enumerate(accounts):
+            if not admit(account):
+                # 账户已按预估耗时从小到大排序，剩余时间只会更少，后面的账户同样放不下，也不再等待账户间延迟
+                for rest in accounts[index + 1:]:
+                    defer(rest)
+                break
+            if delay and index:
+                wait = random.uniform(*delay)
+                metrics.observe("account_delay", wait)
+                time.sleep(wait)
+            execute(account)
+    else:
+        stdout = sys.stdout
+        buffered = _ThreadBufferedStdout(stdout)
+        sys.stdout = buffered
+
+        def run_buffered(account):
+            buffered.begin()
+            try:
+                run_one(account)
+            finally:
+                buffered.end()
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for future in as_completed([pool.submit(run_buffered, a) for a in accounts]):
+                    future.result()
+        finally:
+            sys.stdout = stdout
+
+    summary.finished = time.time()
+    return summary
@@ -0,0 +1,72 @@
+"""
+按预估耗时安排账户执行顺序：Cookie 有效的账户先执行，需要验证码登录的账户在剩余时间内尽量安排，
+放不下的记为延后，而不是执行到一半被青龙超时杀掉
+"""
+import os
+import threading
+
+from qlkit.retry import RUN_DEADLINE
+from qlkit.session import EXPIRED, EXPIRING, UNKNOWN, VALID, session_state
+
+# 没有历史耗时时的默认预估（秒）
+COST_VALID = float(os.environ.get('QL_COST_VALID', '3'))
+COST_LOGIN = float(os.environ.get('QL_COST_LOGIN', '30'))
+DEFAULT_COSTS = {
+    VALID: COST_VALID,
+    # 即将过期的账户先用 Cookie 签到，再完整走一次验证码登录刷新 Cookie
+    EXPIRING: float(os.environ.get('QL_COST_EXPIRING', str(COST_VALID + COST_LOGIN))),
+    UNKNOWN: COST_LOGIN,
+    EXPIRED: COST_LOGIN,
+}
+SMOOTHING = 0.3  # 历史耗时的指数平均系数
+MARGIN = 1.2  # 预估耗时的安全系数
+
+
+class Scheduler:
+    """
+    估算账户耗时：按存储中的 Cookie 状态区分走 Cookie 签到还是重新登录，
+    同一状态下优先使用该账户过去的实际耗时（保存在 extra 中）
+    """
+
+    def __init__(self, store, name=None, deadline=None, costs=None):
+        self.store = store
+        self.name = name or (lambda account: account.get("username", "?"))
+        self.deadline = deadline or RUN_DEADLINE
+        self.costs = {**DEFAULT_COSTS, **(costs or {})}
+        self._lock = threading.Lock()
+        self._states = {}
+
+    def state(self, account):
+        return session_state(self.store.get(self.name(account))["cookies"])
+
+    def estimate(self, account):
+        """预估单个账户耗时（秒）"""
+        state = self.state(account)
+        history = self.store.get(self.name(account))["extra"].get(f"cost_{state}")
+        return history if history else self.costs[state]
+
+    def order(self, accounts):
+        """按预估耗时从小到大排序，耗时相同保持原顺序"""
+        return sorted(accounts, key=self.estimate)
+
+    def admit(self, account):
+        """剩余时间足够时登记开始执行并返回 True，否则返回 False（延后）"""
+        state = self.state(account)
+        cost = self.estimate(account)
+        with self._lock:
+            remaining = self.deadline.remaining()
+            if remaining is not None and cost * MARGIN > remaining:
+                return False
+            self._states[self.name(account)] = (state, cost)
+            return True
+
+    def record(self, account, elapsed):
+        """记录实际耗时，用于下次运行时的预估"""
+        name = self.name(account)
+        with self._lock:
+            state, cost = self._states.pop(name, (None, None))
+        if state is None:
+            return
+        history = self.store.get(name)["extra"].get(f"cost_{state}")
+        value = elapsed if not history else history + SMOOTHING * (elapsed - history)
+        self.store.update(name, extra={f"cost_{state}": round(value, 3)})
@@ -0,0 +1,112 @@
+"""根据本地保存的 Cookie / Token 判断登录状态，无需发送探测请求"""
+import base64
+import json
+import os
+import re
+import time
+from urllib.parse import unquote
+
+VALID = "valid"  # 登录Cookie有效
+EXPIRING = "expiring"  # 即将过期，应提前重新登录
+EXPIRED = "expired"  # 已过期或没有登录Cookie，直接重新登录
+UNKNOWN = "unknown"  # 无法从本地判断（会话Cookie等），需要联网确认
+
+# 距离过期不足该秒数时视为即将过期
+REFRESH_BEFORE = int(os.environ.get('QL_SESSION_REFRESH', str(24 * 3600)))
+
+DISCUZ_AUTH = re.compile(r'(^|_)auth$')
+WORDPRESS_AUTH = "wordpress_logged_in"
+
+
+def as_records(cookies):
+    """兼容 {name: value} 字典与 SessionStore 的 Cookie 列表"""
+    if isinstance(cookies, dict):
+        return [{"name": k, "value": v, "expires": None} for k, v in cookies.items()]
+    return list(cookies or [])
+
+
+def auth_expiry(cookies):
+    """
+    返回登录Cookie的过期时间戳
+    Discuz 取 *_auth 的 expires，WordPress 取 wordpress_logged_in_* 值中的过期时间；
+    没有登录Cookie返回 None，登录Cookie没有过期信息返回 0
+    """
+    expiries = []
+    for c in as_records(cookies):
+        name = c.get("name", "")
+        if name.startswith(WORDPRESS_AUTH):
+            # 值格式：用户名|过期时间|token|hmac
+            parts = unquote(c.get("value", "")).split("|")
+            if len(parts) >= 2 and parts[1].isdigit():
+                expiries.append(int(parts[1]))
+            elif c.get("expires"):
+                expiries.append(int(c["expires"]))
+            else:
+                expiries.append(0)
+        elif DISCUZ_AUTH.search(name):
+            expiries.append(int(c["expires"]) if c.get("expires") else 0)
+    if not expiries:
+        return None
+    known = [e for e in expiries if e]
+    return min(known) if known else 0
+
+
+def session_state(cookies, now=None, refresh_before=REFRESH_BEFORE):
+    """判断会话状态：VALID / EXPIRING / EXPIRED / UNKNOWN"""
+    expiry = auth_expiry(cookies)
+    if expiry is None:
+        return EXPIRED
+    if expiry == 0:
+        return UNKNOWN
+    now = time.time() if now is None else now
+    if expiry <= now:
+        return EXPIRED
+    if expiry - now <= refresh_before:
+        return EXPIRING
+    return VALID
+
+
+def token_claims(token):
+    """解析 JWT 载荷（不校验签名），不是 JWT 时返回 None"""
+    parts = (token or "").split(".")
+    if len(parts) != 3:
+        return None
+    try:
+        payload = parts[1] + "=" * (-len(parts[1]) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+    except (ValueError, TypeError):
+        return None
+    return claims if isinstance(claims, dict) else None
+
+
+def token_expiry(token, issued=None, ttl=None):
+    """
+    返回 (过期时间戳, 有效期秒数)
+    优先取 JWT 的 exp/iat，否则按记录的签发时间与有效期推算；无法判断时返回 (0, None)
+    """
+    claims = token_claims(token) or {}
+    exp = claims.get("exp")
+    if isinstance(exp, (int, float)) and exp > 0:
+        iat = claims.get("iat")
+        lifetime = exp - iat if isinstance(iat, (int, float)) and iat < exp else ttl
+        return exp, lifetime
+    if issued and ttl:
+        return issued + ttl, ttl
+    return 0, ttl
+
+
+def token_state(token, issued=None, ttl=None, now=None, refresh_before=REFRESH_BEFORE):
+    """判断 Token 状态：VALID / EXPIRING / EXPIRED / UNKNOWN，有效期较短时按其五分之一提前刷新"""
+    if not token:
+        return EXPIRED
+    expiry, lifetime = token_expiry(token, issued, ttl)
+    if not expiry:
+        return UNKNOWN
+    now = time.time() if now is None else now
+    if expiry <= now:
+        return EXPIRED
+    if lifetime:
+        refresh_before = min(refresh_before, lifetime / 5)
+    if expiry - now <= refresh_before:
+        return EXPIRING
+    return VALID
@@ -0,0 +1,183 @@
+"""账户会话存储：所有脚本共用的 SQLite（WAL 模式）数据库"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from http.cookiejar import Cookie
+
+DEFAULT_PATH = os.environ.get('QL_STORE_PATH', './ql_sessions.db')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    site TEXT NOT NULL,
+    account TEXT NOT NULL,
+    cookies TEXT,
+    token TEXT,
+    formhash TEXT,
+    last_success REAL,
+    updated_at REAL NOT NULL,
+    extra TEXT,
+    PRIMARY KEY (site, account)
+)
+"""
+
+_FIELDS = ("cookies", "token", "formhash", "last_success", "extra")
+
+
+def cookies_to_records(jar):
+    """将 CookieJar 转为可序列化的列表，保留域名、路径与过期时间"""
+    return [
+        {
+            "name": c.name,
+            "value": c.value,
+            "domain": c.domain,
+            "path": c.path,
+            "expires": c.expires,
+            "secure": c.secure,
+        }
+        for c in jar
+    ]
+
+
+def records_to_cookies(records, jar):
+    """将 cookies_to_records 的结果写回 CookieJar"""
+    for r in records or []:
+        domain = r.get("domain", "")
+        jar.set_cookie(Cookie(
+            version=0, name=r["name"], value=r["value"],
+            port=None, port_specified=False,
+            domain=domain, domain_specified=bool(domain), domain_initial_dot=domain.startswith("."),
+            path=r.get("path") or "/", path_specified=True,
+            secure=bool(r.get("secure")), expires=r.get("expires"),
+            discard=r.get("expires") is None, comment=None, comment_url=None, rest={},
+        ))
+    return jar
+
+
+class SessionStore:
+    """
+    按 (site, account) 保存 Cookie、token、formhash 与最近成功时间
+    启动时 load() 一次性读入某站点的全部记录，运行中 update() 只写内存，
+    积累 autoflush 条修改或调用 flush() 时在单个事务中批量写回；
+    WAL 模式加 busy_timeout 保证多进程并发写安全
+    """
+
+    def __init__(self, site, path=DEFAULT_PATH, autoflush=20):
+        self.site = site
+        self.path = path
+        self.autoflush = autoflush
+        self._rows = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return closing(conn)
+
+    def load(self):
+        """批量读取当前站点的全部账户记录"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT account, cookies, token, formhash, last_success, extra FROM sessions WHERE site=?",
+                (self.site,),
+            ).fetchall()
+        with self._lock:
+            for account, cookies, token, formhash, last_success, extra in rows:
+                self._rows[account] = {
+                    "cookies": json.loads(cookies) if cookies else [],
+                    "token": token,
+                    "formhash": formhash,
+                    "last_success": last_success,
+                    "extra": json.loads(extra) if extra else {},
+                }
+        return self
+
+    def get(self, account):
+        """返回账户记录的副本，不存在时返回空记录"""
+        with self._lock:
+            row = self._rows.get(account)
+            if row is None:
+                return {"cookies": [], "token": None, "formhash": None, "last_success": None, "extra": {}}
+            return {**row, "extra": dict(row["extra"])}
+
+    def update(self, account, **fields):
+        """修改内存中的记录并标记待写回，extra 为合并更新"""
+        unknown = set(fields) - set(_FIELDS)
+        if unknown:
+            raise ValueError(f"未知字段: {', '.join(sorted(unknown))}")
+        with self._lock:
+            row = self._rows.setdefault(
+                account, {"cookies": [], "token": None, "formhash": None, "last_success": None, "extra": {}}
+            )
+            extra = fields.pop("extra", None)
+            if extra:
+                row["extra"] = {**row["extra"], **extra}
+            row.update(fields)
+            self._dirty.add(account)
+            pending = len(self._dirty)
+        if self.autoflush and pending >= self.autoflush:
+            self.flush()
+
+    def save_cookies(self, account, jar, formhash=None):
+        """保存 CookieJar，可同时缓存 formhash"""
+        fields = {"cookies": cookies_to_records(jar)}
+        if formhash:
+            fields["formhash"] = formhash
+        self.update(account, **fields)
+
+    def load_cookies(self, account, jar):
+        """将保存的 Cookie 写入 jar，有 Cookie 时返回 True"""
+        records = self.get(account)["cookies"]
+        records_to_cookies(records, jar)
+        return bool(records)
+
+    def mark_success(self, account):
+        self.update(account, last_success=time.time())
+
+    def forget(self, account):
+        """清除账户的会话信息（Cookie/token/formhash）"""
+        self.update(account, cookies=[], token=None, formhash=None)
+
+    def flush(self):
+        """将所有修改在一个事务中写回数据库"""
+        with self._lock:
+            dirty = [(a, dict(self._rows[a])) for a in self._dirty]
+            self._dirty.clear()
+        if not dirty:
+            return 0
+        now = time.time()
+        params = [
+            (
+                self.site, account,
+                json.dumps(row["cookies"], ensure_ascii=False),
+                row["token"], row["formhash"], row["last_success"], now,
+                json.dumps(row["extra"], ensure_ascii=False),
+            )
+            for account, row in dirty
+        ]
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT INTO sessions (site, account, cookies, token, formhash, last_success, updated_at, extra) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(site, account) DO UPDATE SET cookies=excluded.cookies, token=excluded.token, "
+                    "formhash=excluded.formhash, last_success=excluded.last_success, "
+                    "updated_at=excluded.updated_at, extra=excluded.extra",
+                    params,
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                with self._lock:
+                    self._dirty.update(a for a, _ in dirty)
+                raise
+        return len(params)
+
@@ -0,0 +1,57 @@
+"""流式读取页面，找到所需内容后立即断开连接"""
+import re
+
+# 跨分块匹配时回看的字节数，需大于任一匹配内容的长度
+OVERLAP = 512
+
+
+class StreamResult:
+    """found 为 名称 -> (整体匹配, 分组元组)，body 为已读取的原始字节"""
+
+    def __init__(self, status_code, found, body, complete):
+        self.status_code = status_code
+        self.found = found
+        self.body = body
+        self.complete = complete
+
+    def group(self, name, index=1):
+        """返回匹配的分组并按 latin-1 解码（匹配内容均为 ASCII），未找到返回 None"""
+        if name not in self.found:
+            return None
+        whole, groups = self.found[name]
+        value = groups[index - 1] if len(groups) >= index else whole
+        return value.decode("latin-1") if value is not None else None
+
+
+def _compile(pattern):
+    if isinstance(pattern, str):
+        pattern = pattern.encode("utf-8")
+    if isinstance(pattern, bytes):
+        pattern = re.compile(pattern)
+    return pattern
+
+
+def fetch_until(session, url, patterns, stop_at=None, chunk_size=8192, **kwargs):
+    """
+    分块读取 url，对原始字节增量匹配 patterns（名称 -> 正则）
+    全部找到或读到 stop_at 时关闭连接，不再下载和解码剩余页面
+    """
+    pending = {name: _compile(p) for name, p in patterns.items()}
+    stop = _compile(stop_at) if stop_at is not None else None
+    found = {}
+    body = bytearray()
+    complete = True
+    with session.get(url, stream=True, **kwargs) as resp:
+        for chunk in resp.iter_content(chunk_size):
+            start = max(0, len(body) - OVERLAP)
+            body += chunk
+            for name, regex in list(pending.items()):
+                m = regex.search(body, start)
+                if m:
+                    found[name] = (m.group(0), m.groups())
+                    del pending[name]
+            if not pending or (stop is not None and stop.search(body, start)):
+                complete = False
+                break
+        status_code = resp.status_code
+    return StreamResult(status_code, found, bytes(body), complete)
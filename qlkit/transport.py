@@ -0,0 +1,58 @@
+"""
+多账户共用的 HTTP 连接池：每个账户一个独立 Cookie 的 Session，底层按主机复用 TCP/TLS 连接
+"""
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+POOL_SIZE = int(os.environ.get('QL_POOL_SIZE', '10'))  # 每个主机保留的连接数
+
+
+class _SharedAdapter(HTTPAdapter):
+    """多个 Session 共用的适配器，Session 关闭时不关闭连接池"""
+
+    def __init__(self, limiter=None, **kwargs):
+        self.limiter = limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if self.limiter is None:
+            return super().send(request, **kwargs)
+        with self.limiter.slot(request.url):
+            return super().send(request, **kwargs)
+
+    def close(self):
+        pass
+
+    def shutdown(self):
+        super().close()
+
+
+class Transport:
+    """
+    用法：
+        transport = Transport(limiter=HostLimiter(2), metrics=Metrics("site"))
+        session = transport.session(headers)   # 每个账户一个，Cookie 互不影响
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, limiter=None, headers=None, metrics=None):
+        self.headers = headers or {}
+        self.metrics = metrics
+        # urllib3 按 (协议, 主机, 端口) 分别建连接池，pool_connections 为保留的主机数
+        self.adapter = _SharedAdapter(limiter=limiter, pool_connections=16, pool_maxsize=max(1, pool_size))
+
+    def session(self, headers=None):
+        """新建使用共享连接池、独立 Cookie 的 Session"""
+        session = requests.Session()
+        session.headers.update(self.headers)
+        if headers:
+            session.headers.update(headers)
+        session.mount("https://", self.adapter)
+        session.mount("http://", self.adapter)
+        if self.metrics is not None:
+            session.hooks["response"].append(self.metrics.response_hook)
+        return session
+
+    def close(self):
+        self.adapter.shutdown()
@@ -1,11 +1,24 @@
 import os
-import requests
+import sys
 import re
-import pickle
 import time
-from bs4 import BeautifulSoup
 import json
 
+# 公共模块 qlkit 位于仓库根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from qlkit.cache import PageCache
+from qlkit.metrics import Metrics
+from qlkit.retry import DEFAULT_POLICY, account_deadline
+from qlkit.session import EXPIRED, EXPIRING, session_state
+from qlkit.store import SessionStore
+from qlkit.stream import StreamResult, fetch_until
+from qlkit.transport import Transport
+
+store = SessionStore("ruike1").load()
+metrics = Metrics("ruike1")
+# 所有账户共用连接池，每个账户独立 Cookie
+transport = Transport(metrics=metrics)
+
 # 从环境变量获取多账户配置
 def get_accounts_from_env():
     """从环境变量解析多账户配置"""
@@ -45,43 +58,53 @@ def get_accounts_from_env():
     
     return accounts
 
-# 为每个账户创建独立的Cookie文件
-def get_cookie_file(username):
-    """生成账户特定的Cookie文件名"""
-    safe_username = re.sub(r'[^a-zA-Z0-9]', '_', username)
-    return f"./rklt_cookie_{safe_username}.pkl"
-
 def save_cookies(session, username):
-    """保存Cookie到文件"""
-    cookie_file = get_cookie_file(username)
+    """保存Cookie（含过期时间）"""
     try:
-        with open(cookie_file, 'wb') as f:
-            pickle.dump(session.cookies, f)
+        store.save_cookies(username, session.cookies)
         return True
     except Exception as e:
         print(f"❌ 保存Cookie失败: {e}")
         return False
 
 def load_cookies(session, username):
-    """从文件加载Cookie"""
-    cookie_file = get_cookie_file(username)
-    if os.path.exists(cookie_file):
-        try:
-            with open(cookie_file, 'rb') as f:
-                session.cookies.update(pickle.load(f))
-            return True
-        except Exception as e:
-            print(f"❌ 加载Cookie失败: {e}")
+    """加载保存的Cookie"""
+    try:
+        return store.load_cookies(username, session.cookies)
+    except Exception as e:
+        print(f"❌ 加载Cookie失败: {e}")
     return False
 
+# 站点地址，可指向本地模拟站点做压测
+BASE_URL = os.getenv('RKLT_BASE_URL', "https://www.ruike1.com").rstrip("/")
+HOME_URL = f"{BASE_URL}/"
+# 首页头部即可得到 formhash、登录状态和积分
+HOMEPAGE_PATTERNS = {
+    "formhash": rb'name="formhash" value="([a-f0-9]{8})"',
+    "logout": rb'action=logout',
+    "credit": rb'id="extcreditmenu"[^>]*>([^<]*)<',
+}
+# 首页按登录相关 Cookie 缓存，同一状态下只请求一次
+homepage_cache = PageCache(cookie_names=r'(auth|saltkey)$')
+CREDIT_PATTERN = r"积分[:：]\s*(\d+)"
+# 签到响应中的积分栏（format=global_usernav_extra）或奖励数值
+NAV_CREDIT_PATTERN = r'id="extcreditmenu"[^>]*>([^<]*)<'
+REWARD_PATTERN = r"获得\s*(\d+)\s*积分"
+
+def get_homepage(session):
+    """流式获取首页头部，读到正文或找齐所需内容即停止"""
+    def fetch():
+        with metrics.span("homepage"):
+            return DEFAULT_POLICY.call(
+                lambda: fetch_until(session, HOME_URL, HOMEPAGE_PATTERNS, stop_at=rb'<div id="wp"', timeout=15)
+            )
+    return homepage_cache.get(session, HOME_URL, fetch)
+
 def get_formhash(session):
-    url = "https://www.ruike1.com/"
     try:
-        resp = session.get(url)
-        resp.encoding = "gbk"
-        match = re.search(r'name="formhash" value="([a-f0-9]{8})"', resp.text)
-        if match:
-            return match.group(1)
+        formhash = get_homepage(session).group("formhash")
+        if formhash:
+            return formhash
         else:
             print("❌ 无法提取 formhash")
             return None
@@ -89,24 +112,34 @@ def get_formhash(session):
         print(f"❌ 获取 formhash 出错: {e}")
         return None
 
-def login(username, password):
-    session = requests.Session()
-    session.headers.update({
+def is_logged_in(session):
+    """根据首页是否有退出链接判断登录状态"""
+    try:
+        return "logout" in get_homepage(session).found
+    except Exception as e:
+        print(f"❌ 获取登录状态出错: {e}")
+        return False
+
+def new_session():
+    return transport.session({
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36",
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
         "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
     })
+
+def login(username, password, session=None):
+    """登录；传入 session 时复用其已获取的首页（formhash 与该会话的 Cookie 绑定）"""
+    session = session or new_session()
     
     formhash = get_formhash(session)
     if not formhash:
         return None
 
-    url = "https://www.ruike1.com/member.php?mod=logging&action=login&loginsubmit=yes&infloat=yes&lssubmit=yes&inajax=1"
+    url = f"{BASE_URL}/member.php?mod=logging&action=login&loginsubmit=yes&infloat=yes&lssubmit=yes&inajax=1"
     headers = {
-        "Host": "www.ruike1.com",
         "Content-Type": "application/x-www-form-urlencoded",
-        "Origin": "https://www.ruike1.com",
-        "Referer": "https://www.ruike1.com/",
+        "Origin": BASE_URL,
+        "Referer": HOME_URL,
     }
     data = {
         "fastloginfield": "username",
@@ -119,8 +152,10 @@ def login(username, password):
     }
     
     try:
-        response = session.post(url, headers=headers, data=data)
+        with metrics.span("login_post"):
+            response = DEFAULT_POLICY.call(lambda: session.post(url, headers=headers, data=data, timeout=15))
         response.encoding = "gbk"
+        homepage_cache.invalidate(session, HOME_URL)
 
         if response.status_code == 200:
             if "window.location.href" in response.text:
@@ -142,21 +177,24 @@ def login(username, password):
     return None
 
 def sign_in(session):
+    if not is_logged_in(session):
+        print("🔁 当前未登录")
+        return False
     formhash = get_formhash(session)
     if not formhash:
         return False
 
-    url = f"https://www.ruike1.com/k_misign-sign.html?operation=qiandao&format=global_usernav_extra&formhash={formhash}&inajax=1&ajaxtarget=k_misign_topb"
+    url = f"{BASE_URL}/k_misign-sign.html?operation=qiandao&format=global_usernav_extra&formhash={formhash}&inajax=1&ajaxtarget=k_misign_topb"
     headers = {
-        "Host": "www.ruike1.com",
-        "Referer": "https://www.ruike1.com/",
+        "Referer": HOME_URL,
         "X-Requested-With": "XMLHttpRequest",
         "Accept": "*/*",
         "Accept-Language": "zh-CN,zh;q=0.9",
     }
 
     try:
-        response = session.get(url, headers=headers)
+        with metrics.span("sign"):
+            response = DEFAULT_POLICY.call(lambda: session.get(url, headers=headers, timeout=15))
         response.encoding = "gbk"
         
         if response.status_code == 200:
@@ -165,6 +203,7 @@ def sign_in(session):
                 return True
             elif "签到成功" in response.text or "已成功签到" in response.text:
                 print("🎉 签到成功！")
+                update_credit(session, response.text)
                 return True
             else:
                 # 尝试提取错误信息
@@ -180,28 +219,46 @@ def sign_in(session):
     
     return False
 
+def credit_text(page):
+    """首页积分栏文本（GBK）"""
+    text = page.group("credit")
+    return text.encode("latin-1").decode("gbk", errors="ignore").strip() if text is not None else None
+
+def update_credit(session, text):
+    """
+    签到成功后按响应更新缓存首页中的积分，之后读取积分无需再请求首页；
+    响应中既没有积分栏也没有奖励数值时清除缓存，之后重新获取
+    """
+    page = homepage_cache.peek(session, HOME_URL)
+    if page is None:
+        return
+    nav = re.search(NAV_CREDIT_PATTERN, text)
+    reward = re.search(REWARD_PATTERN, text)
+    credit = re.search(CREDIT_PATTERN, credit_text(page) or "")
+    if nav:
+        value = nav.group(1).strip()
+    elif reward and credit:
+        value = f"积分: {int(credit.group(1)) + int(reward.group(1))}"
+    else:
+        homepage_cache.invalidate(session, HOME_URL)
+        return
+    encoded = value.encode("gbk")
+    found = {**page.found, "credit": (encoded, (encoded,))}
+    homepage_cache.put(session, HOME_URL, StreamResult(page.status_code, found, page.body, page.complete))
+
 def get_credit(session):
-    url = "https://www.ruike1.com/"
     try:
-        response = session.get(url)
-        response.encoding = "gbk"
-
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
-            credit_tag = soup.find("a", id="extcreditmenu")
-            if credit_tag:
-                credit_text = credit_tag.text.strip()
-                match = re.search(r"积分[:：]\s*(\d+)", credit_text)
-                if match:
-                    credit = int(match.group(1))
-                    print(f"💰 当前积分: {credit}")
-                    return credit
-                else:
-                    print(f"⚠️ 未能提取积分: {credit_text}")
+        text = credit_text(get_homepage(session))
+        if text is not None:
+            match = re.search(CREDIT_PATTERN, text)
+            if match:
+                credit = int(match.group(1))
+                print(f"💰 当前积分: {credit}")
+                return credit
             else:
-                print("❌ 未找到积分信息")
+                print(f"⚠️ 未能提取积分: {text}")
         else:
-            print(f"❌ 获取积分失败，状态码: {response.status_code}")
+            print("❌ 未找到积分信息")
     except Exception as e:
         print(f"❌ 获取积分出错: {e}")
     
@@ -217,26 +274,30 @@ def process_account(account):
     print(f"🚀 处理账户 #{account_id}: {username}")
     print(f"{'='*50}")
     
-    session = requests.Session()
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-    })
+    session = new_session()
     
-    # 尝试使用Cookie登录
-    if load_cookies(session, username):
+    # 根据本地Cookie过期时间判断，已过期的直接重新登录
+    state = session_state(store.get(username)["cookies"])
+    if state == EXPIRED:
+        print("⌛ Cookie不存在或已过期，直接登录")
+    elif load_cookies(session, username):
         print("📦 使用保存的Cookie")
         if sign_in(session):
+            store.mark_success(username)
             get_credit(session)
+            # Cookie即将过期时提前重新登录
+            if state == EXPIRING:
+                print("⏰ Cookie即将过期，提前重新登录")
+                login(username, password)
             return True
         else:
             print("🔁 Cookie可能失效，尝试重新登录")
     
-    # 使用用户名密码登录
-    logged_in_session = login(username, password)
+    # 使用用户名密码登录，复用同一会话已获取的首页
+    logged_in_session = login(username, password, session)
     if logged_in_session:
         if sign_in(logged_in_session):
+            store.mark_success(username)
             get_credit(logged_in_session)
             return True
     
@@ -254,11 +315,17 @@ if __name__ == "__main__":
     
     # 处理每个账户
     success_count = 0
-    for account in accounts:
-        if process_account(account):
-            success_count += 1
-        print("\n" + "="*50 + "\n")  # 账户分隔线
-        time.sleep(1)  # 账户间短暂延迟
+    try:
+        for account in accounts:
+            with account_deadline():
+                if process_account(account):
+                    success_count += 1
+            print("\n" + "="*50 + "\n")  # 账户分隔线
+            with metrics.span("account_delay"):
+                time.sleep(1)  # 账户间短暂延迟
+    finally:
+        store.flush()
     
     print(f"\n📊 签到完成: 成功 {success_count}/{len(accounts)} 个账户")
+    metrics.close()
     print("="*50)
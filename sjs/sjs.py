@@ -1,5 +1,4 @@
 import os
-import requests
 from PIL import Image
 from io import BytesIO
 import base64
@@ -10,21 +9,48 @@ from bs4 import BeautifulSoup
 import json
 import sys
 
+# 公共模块 qlkit 位于仓库根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from qlkit.extract import Page
+from qlkit.metrics import Metrics
+from qlkit.ocr import OCR_BACKEND, OcrCache, create_ocr_client, image_key, rank_candidates
+from qlkit.ocr_pool import shared_pool, solve_workers
+from qlkit.pipeline import DONE, Job, Pipeline, Stage
+from qlkit.retry import PERMANENT, RetryPolicy, classify_exception, message_classifier
+from qlkit.runner import HostLimiter, run_accounts
+from qlkit.scheduler import Scheduler
+from qlkit.session import EXPIRED, EXPIRING, session_state
+from qlkit.store import SessionStore
+from qlkit.transport import POOL_SIZE, Transport
+
 # 所需依赖 requests pillow
 
 # 从环境变量获取配置
 ACCOUNTS = os.environ.get('XSJ_ACCOUNTS', '')  # 多账户配置
 OCR_SERVICE = os.environ.get('OCR_SERVICE', '')
-main_url = "https://xsijishe.com"
+# 站点地址，可指向本地模拟站点做压测
+main_url = os.environ.get('XSJ_BASE_URL', "https://xsijishe.com").rstrip("/")
 TIMEOUT = 10
 MAX_RETRY = 3
+CONCURRENCY = int(os.environ.get('XSJ_CONCURRENCY', '1'))  # 同时处理的账户数，1 为串行
+HOST_LIMIT = int(os.environ.get('XSJ_HOST_LIMIT', '0'))  # 单个主机的最大并发请求数，0 为不限制
+HOST_LIMITER = HostLimiter(HOST_LIMIT)
+metrics = Metrics("xsijishe")
+# 所有账户共用连接池，每个账户独立 Cookie
+transport = Transport(pool_size=max(POOL_SIZE, CONCURRENCY), limiter=HOST_LIMITER, metrics=metrics)
+# OCR服务可直接识别的原始图片格式，其余格式转为JPEG后再识别
+OCR_RAW_FORMATS = [f.strip() for f in os.environ.get('OCR_RAW_FORMATS', 'jpeg,png').split(',') if f.strip()]
+OCR_CACHE_SIZE = int(os.environ.get('OCR_CACHE_SIZE', '256'))
+# 每张验证码最多校验的候选数（识别结果未通过时依次校验备选结果），1 为只校验识别结果
+OCR_CANDIDATES = max(1, int(os.environ.get('XSJ_OCR_CANDIDATES', '3')))
 
 # 调试信息
 print(f"环境变量 XSJ_ACCOUNTS 长度: {len(ACCOUNTS)}")
 print(f"环境变量 OCR_SERVICE: {OCR_SERVICE}")
 
 # 检查环境变量是否设置
-if not ACCOUNTS.strip() or not OCR_SERVICE.strip():
+# 使用进程内 OCR（OCR_BACKEND=template/onnx）时不需要 OCR_SERVICE
+if not ACCOUNTS.strip() or (OCR_BACKEND == "http" and not OCR_SERVICE.strip()):
     print("❌ 错误：环境变量 XSJ_ACCOUNTS 或 OCR_SERVICE 未设置或为空")
     print("请确保在运行环境中正确设置了这两个环境变量")
     sys.exit(1)
@@ -32,6 +58,22 @@ if not ACCOUNTS.strip() or not OCR_SERVICE.strip():
 # 登录用到的参数
 sign_url = '/k_misign-sign.html'
 
+ocr_client = create_ocr_client(OCR_SERVICE, timeout=TIMEOUT, concurrency=1)
+# 设置 OCR_WORKERS 时在识别进程池中识别，所有账户共用
+ocr_pool = shared_pool(OCR_SERVICE, timeout=TIMEOUT, concurrency=1)
+ocr_cache = OcrCache(OCR_CACHE_SIZE)
+store = SessionStore("xsijishe").load()
+
+retry_policy = RetryPolicy(max_attempts=MAX_RETRY)
+# 登录失败提示分类：密码错误/错误次数过多时本次运行不再重试，操作频繁时延长等待
+classify_login_error = message_classifier(
+    permanent=("密码错误", "用户名无效", "错误次数过多"),
+    rate_limited=("过于频繁",),
+)
+
+# 签到状态，对应 get_user_info 中的 checkIn_content 下标
+SIGN_DONE, SIGN_SUCCESS, SIGN_FAILED, SIGN_EXPIRED = 0, 1, 2, 3
+
 def parse_accounts(accounts_str):
     """解析多账户配置"""
     accounts = []
@@ -84,68 +126,100 @@ def get_session_headers():
         "Referer": main_url
     }
 
-def recognize_captcha(base64_img):
-    """识别验证码"""
-    if "," in base64_img:
-        base64_img = base64_img.split(",", 1)[1]
+def save_cookies(session, username):
+    """保存登录后的Cookie（含过期时间）"""
+    store.save_cookies(username, session.cookies)
+
+def load_session(username):
+    """恢复已登录的会话，没有保存的Cookie时返回None"""
+    session = transport.session(get_session_headers())
+    if not store.load_cookies(username, session.cookies):
+        return None
+    return session
+
+@metrics.timer("captcha_encode")
+def encode_captcha(content, content_type):
+    """生成提交给OCR的base64图片，格式可直接识别时不再重新编码"""
+    if any(fmt in content_type for fmt in OCR_RAW_FORMATS):
+        return base64.b64encode(content).decode()
+    img = Image.open(BytesIO(content)).convert("RGB")
+    buffer = BytesIO()
+    img.save(buffer, format="JPEG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+def recognize_candidates(content, content_type="image/jpeg"):
+    """
+    识别验证码，返回按可能性排序的候选（识别结果、OCR给出的其他结果、形近字符变体），
+    相同图片直接复用缓存结果
+    """
+    key = image_key(content)
+    cached = ocr_cache.get(key)
+    if cached is not None:
+        print(f"🧠 命中验证码缓存: {', '.join(cached['result'])}")
+        return cached["result"]
     try:
-        resp = requests.post(OCR_SERVICE, json={"image": base64_img}, timeout=TIMEOUT)
-        if resp.ok:
-            # 确保验证码长度为4位
-            result = resp.json().get("result", "").strip()
-            # 过滤无效字符，只保留字母和数字
-            return re.sub(r'[^a-zA-Z0-9]', '', result)[:4]
-        return ""
+        # 进程内 OCR 直接解码原始图片，不需要 base64
+        image = content if ocr_client.in_process else encode_captcha(content, content_type)
+        res = ocr_pool.recognize(image) if ocr_pool is not None else ocr_client.recognize(image)
     except Exception as e:
         print(f"🤖 OCR识别错误: {e}")
-        return ""
+        return []
+    # 只保留4位字母数字，Discuz 校验验证码不区分大小写
+    candidates = rank_candidates(res, OCR_CANDIDATES, ignore_case=True)
+    if candidates:
+        ocr_cache.put(key, candidates)
+    return candidates
+
+def recognize_captcha(content, content_type="image/jpeg"):
+    """识别验证码，返回最可能的4位结果"""
+    candidates = recognize_candidates(content, content_type)
+    return candidates[0] if candidates else ""
 
 def get_form_info(session):
     """获取登录表单信息"""
-    for _ in range(MAX_RETRY):
+    for attempt in retry_policy.attempts():
         try:
             # 第一步：获取登录页面
             login_page_url = f"{main_url}/member.php?mod=logging&action=login"
-            r = session.get(login_page_url, timeout=TIMEOUT)
+            with metrics.span("login_page"):
+                r = session.get(login_page_url, timeout=attempt.timeout(TIMEOUT))
             r.raise_for_status()
             
-            soup = BeautifulSoup(r.text, 'html.parser')
+            page = Page(r.text)
             
             # 获取formhash
-            formhash_input = soup.find('input', {'name': 'formhash'})
-            formhash = formhash_input['value'] if formhash_input else None
+            formhash = page.input('formhash')
             
             # 获取referer
-            referer_input = soup.find('input', {'name': 'referer'})
-            referer = referer_input['value'] if referer_input else main_url
+            referer = page.input('referer') or main_url
             
             # 获取seccodehash
-            seccode_span = soup.find('span', id=re.compile(r'^seccode_'))
+            seccodehash = None
+            seccode_span = page.find('span', 'id', r'^seccode_', fallback=False)
             if seccode_span:
                 seccodehash = seccode_span['id'].replace('seccode_', '')
             else:
                 # 备选方案：从验证码图片URL中提取
-                captcha_img = soup.find('img', id=re.compile(r'^seccode_'))
-                if captcha_img and 'src' in captcha_img.attrs:
-                    src = captcha_img['src']
-                    match = re.search(r'idhash=([a-zA-Z0-9]+)', src)
+                captcha_img = page.find('img', 'id', r'^seccode_')
+                if captcha_img and 'src' in captcha_img:
+                    match = re.search(r'idhash=([a-zA-Z0-9]+)', captcha_img['src'])
                     seccodehash = match.group(1) if match else None
             
             # 获取登录表单的action URL
-            login_form = soup.find('form', {'id': 'loginform'})
-            login_action = login_form['action'] if login_form and 'action' in login_form.attrs else None
+            login_form = page.element('loginform')
+            login_action = login_form.get('action') if login_form else None
             
             if formhash and seccodehash and referer and login_action:
                 print(f"📝 获取登录参数成功: formhash={formhash}, seccodehash={seccodehash}")
                 return formhash, seccodehash, referer, login_action
             
             print("⚠️ 部分登录参数缺失，重试中...")
-            time.sleep(2)
+            attempt.fail(classify_login_error(r.text))
         except Exception as e:
             print(f"⚠️ 获取登录参数失败: {e}")
-            time.sleep(2)
+            attempt.fail(classify_exception(e))
     
-    print("❌ 无法获取登录参数，达到最大重试次数")
+    print("❌ 无法获取登录参数")
     return None, None, None, None
 
 def check_captcha(session, seccodehash, seccodeverify):
@@ -160,7 +234,8 @@ def check_captcha(session, seccodehash, seccodeverify):
         "secverify": seccodeverify
     }
     try:
-        r = session.get(url, params=params, timeout=TIMEOUT)
+        with metrics.span("captcha_check"):
+            r = session.get(url, params=params, timeout=TIMEOUT)
         # 更严格的验证码校验
         if "succeed" in r.text:
             return True
@@ -175,148 +250,209 @@ def check_captcha(session, seccodehash, seccodeverify):
         print(f"❌ 验证码校验异常: {e}")
         return False
 
-def login_account(username, password):
-    """登录账户"""
-    session = requests.Session()
-    session.headers.update(get_session_headers())
-    
-    print(f"\n🔐 开始登录账户: {username}")
+def stage_form(job):
+    """流水线阶段：获取登录参数"""
+    job.formhash, job.seccodehash, job.referer, job.login_action = get_form_info(job.session)
+    if not job.formhash or not job.seccodehash or not job.login_action:
+        print("❌ 缺少必要登录参数")
+        # get_form_info 已自行重试，这里不再重复
+        job.attempt.fail(PERMANENT)
+        return DONE
+
+def stage_captcha(job):
+    """流水线阶段：下载验证码"""
+    captcha_url = f"{main_url}/misc.php?mod=seccode&update={int(time.time())}&idhash={job.seccodehash}"
+    try:
+        with metrics.span("captcha_download"):
+            captcha_resp = job.session.get(captcha_url, timeout=job.attempt.timeout(TIMEOUT))
+        if "image" not in captcha_resp.headers.get("Content-Type", ""):
+            print("❗ 验证码图片响应异常")
+            job.attempt.fail(classify_login_error(captcha_resp.text))
+            return DONE
+    except Exception as e:
+        print(f"❌ 获取验证码失败: {e}")
+        job.attempt.fail(classify_exception(e))
+        return DONE
+    job.captcha = captcha_resp.content
+    job.captcha_type = captcha_resp.headers.get("Content-Type", "")
+
+def stage_solve(job):
+    """流水线阶段：识别验证码"""
+    job.candidates = recognize_candidates(job.captcha, job.captcha_type)
+    if not job.candidates:
+        print("🤖 验证码识别失败")
+        return DONE
+    others = f"，备选: {', '.join(job.candidates[1:])}" if len(job.candidates) > 1 else ""
+    print(f"✅ 验证码识别成功: {job.candidates[0]}{others}")
+
+def stage_verify(job):
+    """
+    流水线阶段：向站点校验验证码
+    识别结果未通过时，在同一张验证码上依次校验备选结果，避免重新获取登录页与验证码
+    """
+    key = image_key(job.captcha)
+    job.seccodeverify = None
+    for rank, candidate in enumerate(job.candidates):
+        if rank:
+            metrics.count("ocr_candidate_checks")
+        if check_captcha(job.session, job.seccodehash, candidate):
+            job.seccodeverify = candidate
+            break
+    passed = job.seccodeverify is not None
+    metrics.count("ocr_checked")
+    metrics.count("ocr_passed", int(passed and rank == 0))
+    if passed:
+        if rank:
+            print(f"🔁 备选结果 {job.seccodeverify} 校验通过")
+            metrics.count("ocr_rescued")
+        # 缓存中只保留通过校验的结果
+        ocr_cache.put(key, [job.seccodeverify])
+    ocr_cache.mark(key, passed)
+    if not passed:
+        print(f"❌ 验证码校验失败: {', '.join(job.candidates)}")
+        return DONE
+
+def stage_submit(job):
+    """流水线阶段：提交登录表单"""
+    username, session, attempt = job.username, job.session, job.attempt
+    # 构建登录请求
+    login_url = f"{main_url}{job.login_action}"
+    payload = {
+        "formhash": job.formhash,
+        "referer": job.referer,
+        "username": username,
+        "password": job.password,
+        "questionid": "0",
+        "answer": "",
+        "seccodehash": job.seccodehash,
+        "seccodemodid": "member::logging",
+        "seccodeverify": job.seccodeverify,
+        "loginsubmit": "true"
+    }
     
-    for attempt in range(1, MAX_RETRY + 1):
-        print(f"⏳ 尝试 #{attempt}")
-        
-        # 获取登录参数
-        formhash, seccodehash, referer, login_action = get_form_info(session)
-        if not formhash or not seccodehash or not login_action:
-            print("❌ 缺少必要登录参数")
-            continue
-            
-        # 获取验证码
-        captcha_url = f"{main_url}/misc.php?mod=seccode&update={int(time.time())}&idhash={seccodehash}"
-        try:
-            captcha_resp = session.get(captcha_url, timeout=TIMEOUT)
-            if "image" not in captcha_resp.headers.get("Content-Type", ""):
-                print("❗ 验证码图片响应异常")
-                time.sleep(2)
-                continue
-        except Exception as e:
-            print(f"❌ 获取验证码失败: {e}")
-            time.sleep(2)
-            continue
-        
-        # 识别验证码
-        img = Image.open(BytesIO(captcha_resp.content))
-        buffer = BytesIO()
-        img.save(buffer, format="JPEG")
-        base64_img = "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode()
-        
-        seccodeverify = recognize_captcha(base64_img)
-        if not seccodeverify or len(seccodeverify) != 4:
-            print(f"🤖 验证码识别失败: {seccodeverify}")
-            time.sleep(2)
-            continue
-        
-        print(f"✅ 验证码识别成功: {seccodeverify}")
-        
-        # 检查验证码
-        if not check_captcha(session, seccodehash, seccodeverify):
-            print(f"❌ 验证码校验失败: {seccodeverify}")
-            time.sleep(2)
-            continue
+    try:
+        # 添加登录来源字段
+        payload["cookietime"] = "2592000"
         
-        # 构建登录请求
-        login_url = f"{main_url}{login_action}"
-        payload = {
-            "formhash": formhash,
-            "referer": referer,
-            "username": username,
-            "password": password,
-            "questionid": "0",
-            "answer": "",
-            "seccodehash": seccodehash,
-            "seccodemodid": "member::logging",
-            "seccodeverify": seccodeverify,
-            "loginsubmit": "true"
-        }
+        with metrics.span("login_post"):
+            r = session.post(login_url, data=payload, timeout=attempt.timeout(15))
         
-        try:
-            # 添加登录来源字段
-            payload["cookietime"] = "2592000"
-            
-            r = session.post(login_url, data=payload, timeout=15)
-            
-            # 处理XML格式的响应
-            if "<?xml" in r.text:
-                # 从XML中提取错误信息
-                cdata_match = re.search(r'<!\[CDATA\[(.*?)\]\]>', r.text, re.DOTALL)
-                if cdata_match:
-                    error_content = cdata_match.group(1)
-                    if "欢迎您回来" in error_content or "登录成功" in error_content:
-                        print(f"🎉 账户 {username} 登录成功！")
-                        return session
-                    else:
-                        # 提取错误信息
-                        error_match = re.search(r'<font color="red">(.*?)</font>', error_content)
-                        if error_match:
-                            error_msg = error_match.group(1)
-                            print(f"❌ 登录失败: {error_msg}")
-                            # 检查是否账号密码错误
-                            if "密码错误" in error_msg or "用户名无效" in error_msg:
-                                print(f"❌ 账号或密码错误，停止重试")
-                                return None
-                        else:
-                            print(f"❌ 登录失败: {error_content[:100]}...")
-                else:
-                    print(f"❌ 登录失败，未知XML响应: {r.text[:100]}...")
-            else:
-                # 处理HTML格式的响应
-                if "欢迎您回来" in r.text or "登录成功" in r.text:
+        # 处理XML格式的响应
+        if "<?xml" in r.text:
+            # 从XML中提取错误信息
+            cdata_match = re.search(r'<!\[CDATA\[(.*?)\]\]>', r.text, re.DOTALL)
+            if cdata_match:
+                error_content = cdata_match.group(1)
+                if "欢迎您回来" in error_content or "登录成功" in error_content:
                     print(f"🎉 账户 {username} 登录成功！")
-                    return session
+                    save_cookies(session, username)
+                    job.result = session
+                    return DONE
                 else:
-                    # 尝试解析错误信息
-                    soup = BeautifulSoup(r.text, 'html.parser')
-                    error_msg = soup.find('div', class_='alert_error')
-                    if error_msg:
-                        error_text = error_msg.get_text(strip=True)
-                        print(f"❌ 登录失败: {error_text}")
+                    # 提取错误信息
+                    error_match = re.search(r'<font color="red">(.*?)</font>', error_content)
+                    if error_match:
+                        error_msg = error_match.group(1)
+                        print(f"❌ 登录失败: {error_msg}")
                         # 检查是否账号密码错误
-                        if "密码错误" in error_text or "用户名无效" in error_text:
+                        if attempt.fail(classify_login_error(error_msg)) == PERMANENT:
                             print(f"❌ 账号或密码错误，停止重试")
-                            return None
+                            return DONE
                     else:
-                        print(f"❌ 登录失败，未知响应: {r.text[:100]}...")
-        except Exception as e:
-            print(f"❌ 登录请求异常: {e}")
-        
-        time.sleep(3)
+                        print(f"❌ 登录失败: {error_content[:100]}...")
+            else:
+                print(f"❌ 登录失败，未知XML响应: {r.text[:100]}...")
+        else:
+            # 处理HTML格式的响应
+            if "欢迎您回来" in r.text or "登录成功" in r.text:
+                print(f"🎉 账户 {username} 登录成功！")
+                save_cookies(session, username)
+                job.result = session
+                return DONE
+            else:
+                # 尝试解析错误信息
+                soup = BeautifulSoup(r.text, 'html.parser')
+                error_msg = soup.find('div', class_='alert_error')
+                if error_msg:
+                    error_text = error_msg.get_text(strip=True)
+                    print(f"❌ 登录失败: {error_text}")
+                    # 检查是否账号密码错误
+                    if attempt.fail(classify_login_error(error_text)) == PERMANENT:
+                        print(f"❌ 账号或密码错误，停止重试")
+                        return DONE
+                else:
+                    print(f"❌ 登录失败，未知响应: {r.text[:100]}...")
+    except Exception as e:
+        print(f"❌ 登录请求异常: {e}")
+        attempt.fail(classify_exception(e))
+
+# 登录拆成五个阶段，开启 QL_PIPELINE 时各阶段由独立线程处理，多个账户的登录交错进行
+login_pipeline = Pipeline("xsijishe", [
+    Stage("form", stage_form, workers=4),
+    Stage("captcha", stage_captcha, workers=4),
+    Stage("solve", stage_solve, workers=solve_workers()),
+    Stage("verify", stage_verify, workers=4),
+    Stage("submit", stage_submit, workers=4),
+])
+
+def login_account(username, password):
+    """登录账户"""
+    session = transport.session(get_session_headers())
+    
+    print(f"\n🔐 开始登录账户: {username}")
+    
+    for attempt in retry_policy.attempts():
+        print(f"⏳ 尝试 #{attempt.number}")
+        # 每次尝试依次经过 表单 -> 验证码下载 -> 识别 -> 校验 -> 提交，失败时在本线程退避后重试
+        job = Job(attempt=attempt, username=username, password=password, session=session)
+        if login_pipeline.run(job):
+            return session
     
-    print(f"❌ 账户 {username} 登录失败，达到最大重试次数")
+    print(f"❌ 账户 {username} 登录失败")
     return None
 
+SIGN_INFO_KEYS = ("qiandao_num", "lxdays", "lxtdays", "lxlevel", "lxreward")
+
+def parse_sign_state(html, fallback=True):
+    """解析签到页面中的用户名与签到数据，缺失的字段为None"""
+    page = Page(html, fallback=fallback)
+    state = {"user_name": page.link_text(r'home.php\?mod=space')}
+    for key in SIGN_INFO_KEYS:
+        element = page.element(key, fallback=False)
+        state[key] = element.get('value') if element else None
+    return state
+
 def do_sign_in(session):
-    """执行签到操作"""
+    """
+    执行签到操作，返回 (签到状态, 签到页数据)
+    签到页数据在可直接复用时返回（已签到时的签到页、带有签到数据的签到响应），否则为None
+    """
     print("\n⏳ 开始签到流程...")
     
     # 访问签到页面获取formhash
     sign_page_url = f"{main_url}{sign_url}"
     try:
-        r = session.get(sign_page_url, timeout=TIMEOUT)
+        with metrics.span("sign_page"):
+            r = retry_policy.call(lambda: session.get(sign_page_url, timeout=TIMEOUT))
         r.raise_for_status()
+        sign_page = r.text
+        
+        # 页面没有退出链接说明登录状态已失效
+        if "action=logout" not in sign_page:
+            print("🔁 登录状态已失效")
+            return SIGN_EXPIRED, None
         
-        # 检查是否已签到
-        if "您今天已经签到过了" in r.text or "今日已签" in r.text:
+        # 检查是否已签到，此时签到页就是最新数据
+        if "您今天已经签到过了" in sign_page or "今日已签" in sign_page:
             print("✅ 今日已签到")
-            return 0  # 已签到状态
+            return 0, parse_sign_state(sign_page)  # 已签到状态
         
         # 解析formhash
-        soup = BeautifulSoup(r.text, 'html.parser')
-        formhash_input = soup.find('input', {'name': 'formhash'})
-        if not formhash_input:
+        formhash = Page(sign_page).input('formhash')
+        if not formhash:
             print("❌ 无法找到formhash")
-            return 2  # 失败状态
+            return 2, None  # 失败状态
         
-        formhash = formhash_input['value']
         print(f"📝 获取签到formhash: {formhash}")
         
         # 提交签到请求
@@ -329,61 +465,57 @@ def do_sign_in(session):
             "fastreply": "0"
         }
         
-        r = session.post(sign_action_url, data=sign_data, timeout=TIMEOUT)
+        # 重复提交只会得到“已签到”，可以安全重试
+        with metrics.span("sign_post"):
+            r = retry_policy.call(lambda: session.post(sign_action_url, data=sign_data, timeout=TIMEOUT))
         r.raise_for_status()
         
         # 检查签到结果
         if "签到成功" in r.text:
             print("🎉 签到成功")
-            return 1  # 成功状态
+            # 签到响应带有完整的签到数据时直接使用，否则之后重新获取签到页
+            state = parse_sign_state(r.text, fallback=False)
+            if any(state[key] is None for key in SIGN_INFO_KEYS):
+                state = None
+            return 1, state  # 成功状态
         elif "您今天已经签到过了" in r.text:
             print("✅ 今日已签到")
-            return 0  # 已签到状态
+            return 0, parse_sign_state(sign_page)  # 已签到状态
+        elif "请先登录" in r.text:
+            print("🔁 登录状态已失效")
+            return SIGN_EXPIRED, None
         else:
             print(f"❌ 签到失败: {r.text[:200]}")
-            return 2  # 失败状态
+            return 2, None  # 失败状态
     
     except Exception as e:
         print(f"❌ 签到过程中出错: {e}")
-        return 2  # 失败状态
+        return 2, None  # 失败状态
 
-def get_user_info(session, username, checkIn_status):
-    """获取用户信息"""
+def get_user_info(session, username, checkIn_status, sign_state=None):
+    """获取用户信息，sign_state 为 do_sign_in 返回的签到页数据，没有时重新获取签到页"""
     print("\n🔍 获取用户信息...")
     
-    # 访问签到页面获取用户数据
-    sign_page_url = f"{main_url}{sign_url}"
     try:
-        r = session.get(sign_page_url, timeout=TIMEOUT)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, 'html.parser')
+        if sign_state is None:
+            # 访问签到页面获取用户数据
+            with metrics.span("sign_page"):
+                r = session.get(f"{main_url}{sign_url}", timeout=TIMEOUT)
+            r.raise_for_status()
+            sign_state = parse_sign_state(r.text)
         
         # 获取用户信息
-        user_name = "未知用户"
-        user_link = soup.find('a', href=re.compile(r'home.php\?mod=space'))
-        if user_link:
-            user_name = user_link.get_text(strip=True)
+        user_name = sign_state["user_name"] or "未知用户"
         
         # 获取签到信息
-        sign_info = {
-            "qiandao_num": "未知",
-            "lxdays": "未知",
-            "lxtdays": "未知",
-            "lxlevel": "未知",
-            "lxreward": "未知"
-        }
-        
-        # 尝试从签到页面获取数据
-        for key in sign_info.keys():
-            element = soup.find('input', {'id': key})
-            if element and 'value' in element.attrs:
-                sign_info[key] = element['value']
+        sign_info = {key: sign_state.get(key) or "未知" for key in SIGN_INFO_KEYS}
         
         # 访问个人主页获取更多信息
         profile_url = f"{main_url}/home.php?mod=space"
-        r = session.get(profile_url, timeout=TIMEOUT)
+        with metrics.span("user_info"):
+            r = session.get(profile_url, timeout=TIMEOUT)
         r.raise_for_status()
-        profile_soup = BeautifulSoup(r.text, 'html.parser')
+        profile_page = Page(r.text)
         
         # 获取用户积分信息
         stats = {
@@ -394,13 +526,10 @@ def get_user_info(session, username, checkIn_status):
         }
         
         # 尝试查找积分信息
-        stats_container = profile_soup.find('ul', id='psts')
-        if stats_container:
-            for li in stats_container.find_all('li'):
-                text = li.get_text(strip=True)
-                for key in stats:
-                    if key in text:
-                        stats[key] = text.replace(key, "").strip()
+        for text in profile_page.items('psts'):
+            for key in stats:
+                if key in text:
+                    stats[key] = text.replace(key, "").strip()
         
         # 构建用户信息字符串
         checkIn_content = ["已签到", "签到成功", "签到失败"]
@@ -438,17 +567,37 @@ def process_account(account):
     print(f"🚀 开始处理账户: {username}")
     print(f"{'='*50}")
     
-    # 登录账户
-    session = login_account(username, password)
-    if not session:
-        print(f"❌ 账户 {username} 处理失败")
-        return False
+    # 优先使用保存的Cookie签到，本地判断已过期或签到时发现失效再走验证码登录
+    checkIn_status, sign_state = SIGN_EXPIRED, None
+    state = session_state(store.get(username)["cookies"])
+    session = load_session(username) if state != EXPIRED else None
+    if session:
+        print("📦 使用保存的Cookie")
+        checkIn_status, sign_state = do_sign_in(session)
+    else:
+        print("⌛ Cookie不存在或已过期，直接登录")
     
-    # 执行签到
-    checkIn_status = do_sign_in(session)
+    if checkIn_status == SIGN_EXPIRED:
+        session = login_account(username, password)
+        if not session:
+            print(f"❌ 账户 {username} 处理失败")
+            return False
+        
+        # 执行签到
+        checkIn_status, sign_state = do_sign_in(session)
+        if checkIn_status == SIGN_EXPIRED:
+            print(f"❌ 账户 {username} 登录后仍未获得登录状态")
+            return False
+    elif state == EXPIRING:
+        # Cookie即将过期，签到后提前重新登录
+        print("⏰ Cookie即将过期，提前重新登录")
+        session = login_account(username, password) or session
+    
+    if checkIn_status != SIGN_FAILED:
+        store.mark_success(username)
     
     # 获取用户信息
-    get_user_info(session, username, checkIn_status)
+    get_user_info(session, username, checkIn_status, sign_state)
     
     print(f"✅ 账户 {username} 处理完成\n")
     return True
@@ -462,13 +611,26 @@ if __name__ == "__main__":
         print(f"原始账户字符串: {ACCOUNTS[:50]}...")
         sys.exit(1)
     
-    print(f"🔍 找到 {len(accounts)} 个账户")
+    print(f"🔍 找到 {len(accounts)} 个账户，并发数: {CONCURRENCY}")
     
-    # 处理每个账户
-    success_count = 0
-    for account in accounts:
-        if process_account(account):
-            success_count += 1
-        time.sleep(random.uniform(1, 3))  # 账户间随机延迟
+    # 识别进程需在账户线程启动前创建
+    if ocr_pool is not None:
+        ocr_pool.start()
+
+    # 处理每个账户，串行模式下账户间随机延迟
+    try:
+        summary = run_accounts(
+            accounts, process_account, workers=CONCURRENCY, delay=(1, 3), scheduler=Scheduler(store)
+        )
+    finally:
+        store.flush()
+        if ocr_pool is not None:
+            ocr_pool.close()
+    login_pipeline.close()
+    summary.report()
+    login_pipeline.report()
+    metrics.close()
+    cache_stats = ocr_cache.stats()
+    print(f"🧠 验证码缓存: 命中 {cache_stats['hits']}，未命中 {cache_stats['misses']}，命中率 {cache_stats['hit_rate']:.0%}")
     
-    print(f"\n✅ 所有账户处理完成，成功: {success_count}/{len(accounts)}")
+    print(f"\n✅ 所有账户处理完成，成功: {len(summary.success)}/{len(accounts)}")
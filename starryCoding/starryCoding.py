@@ -1,6 +1,13 @@
-import requests
+import asyncio
 import time
 import os
+import sys
+
+# 公共模块 qlkit 位于仓库根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from qlkit.metrics import Metrics
+from qlkit.retry import ACCOUNT_BUDGET, DEFAULT_POLICY, RUN_DEADLINE, SIGN_POLICY, Deadline
+from qlkit.transport import POOL_SIZE, Transport
 
 # 从青龙环境变量获取TOKEN列表
 TOKENS = os.getenv('STARRY_TOKENS', '').split(',')
@@ -8,6 +15,9 @@ if not TOKENS or TOKENS == ['']:
     print("⚠️ 未检测到环境变量STARRY_TOKENS，请添加你的Token")
     exit(1)
 
+# 同时处理的账户数
+CONCURRENCY = int(os.getenv('STARRY_CONCURRENCY', '5'))
+
 # 基础配置
 BASE_URL = "https://api.starrycoding.com"
 HEADERS = {
@@ -16,73 +26,95 @@ HEADERS = {
     "Referer": "https://www.starrycoding.com/user/panel",
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Safari/537.36"
 }
+metrics = Metrics("starrycoding")
+# 所有账户共用连接池，每个账户同时有签到和用户信息两个请求
+transport = Transport(pool_size=max(POOL_SIZE, CONCURRENCY * 2), headers=HEADERS, metrics=metrics)
 
 
-def sign_in(token):
-    """执行签到操作"""
-    print("📡 正在尝试签到...")
+def sign_in(session, token, deadline=None):
+    """执行签到操作，返回 (是否获得星币, 输出内容)"""
     sign_url = f"{BASE_URL}/user/task/sign"
-    headers = {**HEADERS, "Token": token}
-    
+    headers = {"Token": token}
+
     try:
-        response = requests.post(sign_url, headers=headers, timeout=10)
+        with metrics.span("sign_post"):
+            response = SIGN_POLICY.call(lambda: session.post(sign_url, headers=headers, timeout=10), deadline)
         if response.status_code == 201:
             result = response.json()
             if "data" in result and "coin" in result["data"]:
                 coin = result["data"]["coin"]
-                print(f"✅ 签到成功，获得 {coin} 枚星币 🎉")
-                return True
+                return True, f"✅ 签到成功，获得 {coin} 枚星币 🎉"
             else:
-                print(f"⚠️ 无法获取coin，完整响应: {result}")
+                return False, f"⚠️ 无法获取coin，完整响应: {result}"
         elif response.status_code == 400:
-            print(f"⚠️ {response.json().get('msg', '今日已签到或请求异常')}")
+            return False, f"⚠️ {response.json().get('msg', '今日已签到或请求异常')}"
         else:
-            print(f"❌ 签到失败，状态码：{response.status_code}")
+            return False, f"❌ 签到失败，状态码：{response.status_code}"
     except Exception as e:
-        print(f"❌ 签到请求异常: {str(e)}")
-    return False
+        return False, f"❌ 签到请求异常: {str(e)}"
 
 
-def get_user_info(token):
-    """获取用户信息"""
-    print("\n📥 正在获取用户信息...")
+def get_user_info(session, token, deadline=None):
+    """获取用户信息，返回 (用户数据或 None, 错误信息)"""
     user_url = f"{BASE_URL}/user/token"
-    headers = {**HEADERS, "Token": token}
-    
+    headers = {"Token": token}
+
     try:
-        response = requests.get(user_url, headers=headers, timeout=10)
+        with metrics.span("user_info"):
+            response = DEFAULT_POLICY.call(lambda: session.get(user_url, headers=headers, timeout=10), deadline)
         if response.status_code == 200:
-            data = response.json().get("data", {})
-            print(f"""
+            return response.json().get("data", {}), None
+        return None, f"❌ 获取用户信息失败，状态码：{response.status_code}"
+    except Exception as e:
+        return None, f"❌ 获取用户信息异常: {str(e)}"
+
+
+def format_user_info(data):
+    return f"""
 👤 用户名：{data.get('username', '未知')}
 🪙 当前星币：{data.get('coin', 0)}
 🏅 排名：{data.get('rank', '未知')}
 📧 邮箱：{data.get('email', '未绑定')}
 🕰️ 创建时间：{data.get('createdAt', '未知')}
-            """)
-            return True
-    except Exception as e:
-        print(f"❌ 获取用户信息异常: {str(e)}")
-    return False
+            """
+
+
+async def process_token(index, token, semaphore):
+    """签到与获取用户信息同时进行；签到获得星币后再取一次用户信息以显示最新余额"""
+    async with semaphore:
+        started = time.time()
+        session = transport.session()
+        deadline = Deadline(ACCOUNT_BUDGET, parent=RUN_DEADLINE)
+        (signed, message), (data, error) = await asyncio.gather(
+            asyncio.to_thread(sign_in, session, token, deadline),
+            asyncio.to_thread(get_user_info, session, token, deadline),
+        )
+        if signed:
+            data, error = await asyncio.to_thread(get_user_info, session, token, deadline)
+        elapsed = time.time() - started
+        metrics.observe("account", elapsed)
+
+    # 一次性输出，避免多个账户的日志交错
+    lines = [f"🔄 账户 #{index}/{len(TOKENS)}", "📡 签到...", message, "\n📥 用户信息..."]
+    lines.append(format_user_info(data) if data is not None else error)
+    lines.append(f"⏱️ 耗时 {elapsed:.2f}s")
+    lines.append("-" * 40 + "\n")
+    print("\n".join(lines))
+    return signed
+
+
+async def main(tokens):
+    semaphore = asyncio.Semaphore(max(1, CONCURRENCY))
+    return await asyncio.gather(*(process_token(index, token, semaphore) for index, token in tokens))
 
 
 if __name__ == "__main__":
     print("🌟 StarryCoding 多账户签到脚本 🌟\n")
     print(f"🔑 检测到 {len(TOKENS)} 个账户\n")
-    
-    for index, token in enumerate(TOKENS, 1):
-        token = token.strip()
-        if not token:
-            continue
-            
-        print(f"🔄 开始处理账户 #{index}/{len(TOKENS)}")
-        sign_in(token)
-        get_user_info(token)
-        
-        # 账户间延迟防止请求过快
-        if index < len(TOKENS):
-            print("\n⏳ 等待3秒处理下一个账户...")
-            time.sleep(3)
-            print("-" * 40 + "\n")
-    
-    print("\n✨ 所有账户处理完成！")
+
+    tokens = [(index, token.strip()) for index, token in enumerate(TOKENS, 1) if token.strip()]
+    started = time.time()
+    results = asyncio.run(main(tokens))
+
+    metrics.close()
+    print(f"\n✨ 所有账户处理完成！本次签到获得星币 {sum(results)}/{len(tokens)} 个账户，总耗时 {time.time() - started:.2f}s")
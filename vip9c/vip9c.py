@@ -1,6 +1,14 @@
-import requests
 import os
-import hashlib
+import sys
+import time
+
+# 公共模块 qlkit 位于仓库根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from qlkit.metrics import Metrics
+from qlkit.retry import DEFAULT_POLICY, PERMANENT, SIGN_POLICY, account_deadline, classify_exception, message_classifier
+from qlkit.session import EXPIRED, EXPIRING, session_state
+from qlkit.store import SessionStore
+from qlkit.transport import Transport
 
 # 从青龙环境变量获取账户列表
 ACCOUNTS = os.getenv('VIP9_ACCOUNTS', '')
@@ -22,7 +30,6 @@ if not account_list:
 # 基础配置
 LOGIN_URL = "https://vipc9.com/wp-admin/admin-ajax.php"
 SIGN_URL = LOGIN_URL
-COOKIE_DIR = "./VIP9_cookies"
 HEADERS_BASE = {
     "Origin": "https://vipc9.com",
     "Referer": "https://vipc9.com/",
@@ -33,45 +40,28 @@ HEADERS_BASE = {
     "Accept-Language": "zh-CN,zh;q=0.9"
 }
 
-# 创建cookie目录
-if not os.path.exists(COOKIE_DIR):
-    os.makedirs(COOKIE_DIR)
-
+store = SessionStore("vipc9").load()
+metrics = Metrics("vipc9")
+# 所有账户共用连接池，每个账户独立 Cookie
+transport = Transport(headers=HEADERS_BASE, metrics=metrics)
+# 密码错误等提示无需重试
+classify_login_error = message_classifier(permanent=("密码错误", "用户名或密码", "不存在"))
 
-def get_cookie_file(username):
-    """生成基于用户名的cookie文件名"""
-    username_hash = hashlib.md5(username.encode()).hexdigest()
-    return os.path.join(COOKIE_DIR, f"{username_hash}.txt")
 
-
-def save_cookie(username, cookie_str):
-    """保存cookie到文件"""
-    cookie_file = get_cookie_file(username)
-    with open(cookie_file, 'w') as f:
-        f.write(cookie_str)
+def save_cookie(username, cookies):
+    """保存cookie（含过期时间）"""
+    store.save_cookies(username, cookies)
 
 
 def load_cookie(username):
-    """从文件加载cookie"""
-    cookie_file = get_cookie_file(username)
-    if os.path.exists(cookie_file):
-        with open(cookie_file, 'r') as f:
-            return f.read().strip()
-    return ""
-
-
-def cookie_str_to_dict(cookie_str):
-    """将cookie字符串转换为字典"""
-    cookies = {}
-    for item in cookie_str.split(';'):
-        if '=' in item:
-            k, v = item.strip().split('=', 1)
-            cookies[k] = v
-    return cookies
+    """加载cookie，返回带该账户Cookie的会话"""
+    session = transport.session()
+    store.load_cookies(username, session.cookies)
+    return session
 
 
 def login(username, password):
-    """执行登录操作"""
+    """执行登录操作，成功返回已登录的会话"""
     print(f"🔐 用户 {username} 尝试登录中...")
     data = {
         "action": "user_login",
@@ -79,31 +69,36 @@ def login(username, password):
         "password": password
     }
 
-    session = requests.Session()
-    try:
-        resp = session.post(LOGIN_URL, headers=HEADERS_BASE, data=data, timeout=10)
-        result = resp.json()
-    except Exception as e:
-        print(f"❌ 登录请求异常: {str(e)}")
-        return None
-
-    if result.get("status") == "1":
-        print(f"✅ 用户 {username} 登录成功，保存 Cookie")
-        cookie_str = "; ".join([f"{c.name}={c.value}" for c in session.cookies])
-        save_cookie(username, cookie_str)
-        return session.cookies
-    else:
-        print(f"❌ 用户 {username} 登录失败：{result.get('msg', '未知错误')}")
-        return None
-
-
-def sign_in(username, cookies_dict):
+    for attempt in DEFAULT_POLICY.attempts():
+        session = transport.session()
+        try:
+            with metrics.span("login_post"):
+                resp = session.post(LOGIN_URL, data=data, timeout=attempt.timeout(10))
+            result = resp.json()
+        except Exception as e:
+            print(f"❌ 登录请求异常: {str(e)}")
+            attempt.fail(classify_exception(e))
+            continue
+
+        if result.get("status") == "1":
+            print(f"✅ 用户 {username} 登录成功，保存 Cookie")
+            save_cookie(username, session.cookies)
+            return session
+        msg = result.get('msg', '未知错误')
+        print(f"❌ 用户 {username} 登录失败：{msg}")
+        if attempt.fail(classify_login_error(msg)) == PERMANENT:
+            break
+    return None
+
+
+def sign_in(username, session):
     """执行签到操作"""
     print(f"📩 用户 {username} 尝试签到中...")
     data = {"action": "user_qiandao"}
     
     try:
-        resp = requests.post(SIGN_URL, headers=HEADERS_BASE, cookies=cookies_dict, data=data, timeout=10)
+        with metrics.span("sign_post"):
+            resp = SIGN_POLICY.call(lambda: session.post(SIGN_URL, data=data, timeout=10))
         result = resp.json()
     except Exception as e:
         print(f"❌ 签到请求异常: {str(e)}")
@@ -122,31 +117,43 @@ def sign_in(username, cookies_dict):
 
 def process_account(username, password):
     """处理单个账户的签到流程"""
-    cookie_str = load_cookie(username)
-    cookies_dict = cookie_str_to_dict(cookie_str)
+    session = load_cookie(username)
     
-    # 尝试使用现有cookie签到
-    if cookies_dict:
-        if sign_in(username, cookies_dict):
-            return
+    # wordpress_logged_in 中带有过期时间，已过期的直接重新登录
+    state = session_state(store.get(username)["cookies"])
+    if state == EXPIRED:
+        print(f"⌛ 用户 {username} 的 Cookie 不存在或已过期")
+    elif sign_in(username, session):
+        store.mark_success(username)
+        # 即将过期时提前重新登录
+        if state == EXPIRING:
+            print(f"⏰ 用户 {username} 的 Cookie 即将过期，提前重新登录")
+            login(username, password)
+        return
     
-    # 登录并重新尝试签到
-    new_cookies = login(username, password)
-    if new_cookies:
-        cookies_dict = requests.utils.dict_from_cookiejar(new_cookies)
-        sign_in(username, cookies_dict)
+    # 登录并直接用登录后的会话签到
+    session = login(username, password)
+    if session:
+        if sign_in(username, session):
+            store.mark_success(username)
 
 
 if __name__ == "__main__":
     print(f"🌟 VIP9 多账户签到脚本开始，共 {len(account_list)} 个账户 🌟")
     
-    for idx, (username, password) in enumerate(account_list, 1):
-        print(f"\n🔰 处理账户 {idx}/{len(account_list)}: {username}")
-        process_account(username, password)
-        
-        # 账户间延迟
-        if idx < len(account_list):
-            print("\n⏳ 等待3秒处理下一个账户...")
-            time.sleep(3)
+    try:
+        for idx, (username, password) in enumerate(account_list, 1):
+            print(f"\n🔰 处理账户 {idx}/{len(account_list)}: {username}")
+            with account_deadline():
+                process_account(username, password)
+            
+            # 账户间延迟
+            if idx < len(account_list):
+                print("\n⏳ 等待3秒处理下一个账户...")
+                with metrics.span("account_delay"):
+                    time.sleep(3)
+    finally:
+        store.flush()
     
+    metrics.close()
     print("\n✨ 所有账户处理完成！")